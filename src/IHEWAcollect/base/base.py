@@ -247,6 +247,12 @@ class Base(object):
                     return True
                 else:
                     raise IHEStringError(vname) from None
+
+            if rtype == dict:
+                return True
+
+            if rtype == list:
+                return True
         else:
             raise IHETypeError(vname, rtype, vdata) from None
 
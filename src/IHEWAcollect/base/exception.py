@@ -132,3 +132,26 @@ class IHEPassError(Exception):
         # __str__() obviously expects a string to be returned,
         # so make sure not to send any other data types
         return repr(self.msg)
+
+
+class IHEGDALError(Exception):
+    """IHEGDALError Class
+
+    Args:
+        fun (str): GDAL function name.
+        file (str): Output file name.
+        msg (bool): Extra message.
+    """
+    def __init__(self, fun, file, msg=None):
+        self.msg = '"{f}" failed to create "{o}".'.format(
+            f=fun,
+            o=file)
+        if msg:
+            self.msg = '{m} {e}'.format(m=self.msg, e=msg)
+        self.fun = fun
+        self.file = file
+
+    def __str__(self):
+        # __str__() obviously expects a string to be returned,
+        # so make sure not to send any other data types
+        return repr(self.msg)
@@ -6,6 +6,7 @@ Before use this module, create ``accounts.yml`` file.
 And edit account information in the file.
 """
 # import shutil
+import csv
 import datetime
 import importlib
 import inspect
@@ -17,10 +18,10 @@ from pathlib import Path
 try:
     # IHEClassInitError, IHEStringError, IHETypeError, IHEKeyError, IHEFileError
     from .base.exception import IHEClassInitError,\
-        IHEKeyError
+        IHEKeyError, IHEFileError, IHETypeError
 except ImportError:
     from IHEWAcollect.base.exception import IHEClassInitError,\
-        IHEKeyError
+        IHEKeyError, IHEFileError, IHETypeError
 
 try:
     from .base.user import User
@@ -40,10 +41,50 @@ class Download(User):
         parameter (str): Parameter name.
         resolution (str): Resolution name.
         variable (str): Variable name.
-        bbox (dict): Spatial range, {'w':, 's':, 'e':, 'n':}.
+        bbox (dict): Spatial range, {'w':, 's':, 'e':, 'n':}, or list of
+          named regions, [{'name':, 'w':, 's':, 'e':, 'n':}, ...], a region
+          may give 'shape', path to a polygon shapefile, or 'polygon',
+          [[lon, lat], ...], instead of the spatial range. Each remote file
+          is downloaded and converted once for all regions, and every region
+          is written to its own folder, see ``_region``.
         period (dict): Time range, {'s':, 'e':}.
         nodata (int): -9999.
+        output (dict): Output options, {'grid':, 'tiff':, 'dtype':, 'nc':,
+          'zonal':, 'points':, 'aggregate':}.
+          'grid' is the target grid, path to a reference raster or
+          {'geo':, 'shape':, 'epsg':, 'method':}, every date is warped to
+          it with a cached warp plan, see
+          ``templates.collect.Get_target_grid``.
+          'tiff' is the GeoTIFF creation profile, see
+          ``templates.collect.TIFF_PROFILES``, None to skip GeoTIFFs,
+          the default if 'points' is given.
+          'dtype' is 'float32', or 'native' to store GeoTIFFs as integers
+          with scale where the catalog dtype allows, see
+          ``templates.collect.Get_dtype_policy``.
+          'nc' is True or a dict of ``templates.collect.Save_as_NC_slice``
+          options to append every date to one chunked netcdf cube.
+          'zonal' is a polygon shapefile, {'shape':, 'field':}, or True for
+          the regions of bbox, to add the mean, sum, min, max and count
+          of every zone and date to a csv table, see
+          ``templates.collect.Save_as_zonal_stats``.
+          'points' is a list of stations, [{'name':, 'lon':, 'lat':}, ...],
+          or a csv file with these columns, to add the station values of
+          every date to a csv table, see
+          ``templates.collect.Save_as_point_values``, bbox is the extent of
+          the stations if empty. Without other outputs only the raster
+          blocks of the stations are read, see
+          ``templates.collect.Get_point_read``.
+          'aggregate' is 'dekad', 'month', 'year', or {'freq':, 'how':,
+          'keep':}, to update running accumulators with every date and save
+          the 'how' statistics, ['sum', 'mean', 'max', 'count'], of every
+          period at the end, see ``templates.collect.Save_as_aggregate``.
+          'keep' False skips the outputs of the dates.
         is_status (bool): Is to print status message.
+        cache (dict): Shared raw-download cache, {'path':, 'size':}, or path.
+          Remote files are looked up by url in 'path' before the network
+          and stored there after download, evicting the least recently used
+          files above 'size' bytes, see ``templates.collect.Get_remote_file``.
+          None to not cache.
         kwargs (dict): Other arguments.
     """
     status = 'Global status.'
@@ -64,6 +105,7 @@ class Download(User):
         'is_save_temp': False,
         'is_save_remote': False,
         'is_save_list': True,
+        'cache': None,
         'time': {
             'start': None,
             'now': None,
@@ -89,6 +131,16 @@ class Download(User):
             'freq': '',
             'data': {}
         },
+        'output': {
+            'tiff': 'default',
+            'nc': False,
+            'regions': [],
+            'zonal': None,
+            'points': None,
+            'dtype': 'float32',
+            'aggregate': None,
+            'grid': None
+        },
         'folder': {
             'r': '',
             't': '',
@@ -110,8 +162,9 @@ class Download(User):
     def __init__(self, workspace='',
                  product='', version='', parameter='', resolution='', variable='',
                  acct_path=str(Path(__file__).parents[0]),
-                 bbox={}, period={}, nodata=-9999,
+                 bbox={}, period={}, nodata=-9999, output={},
                  is_status=True, is_save_temp=False, is_save_remote=False, is_save_list=False,
+                 cache=None,
                  **kwargs):
         """Class instantiation
         """
@@ -153,6 +206,16 @@ class Download(User):
         else:
             self.__status['code'] = 1
 
+        self.__conf['cache'] = None
+        if cache is not None:
+            if isinstance(cache, str):
+                cache = {'path': cache}
+            vname, rtype, vdata = 'cache', dict, cache
+            if self.check_input(vname, rtype, vdata):
+                self.__conf['cache'] = self._cache(vdata)
+            else:
+                self.__status['code'] = 1
+
         # Class self.__conf['path']
         vname, rtype, vdata = 'workspace', str, workspace
         if self.check_input(vname, rtype, vdata):
@@ -171,10 +234,54 @@ class Download(User):
             else:
                 self.__status['code'] = 1
 
+        regions = []
+        if isinstance(bbox, list):
+            vname, rtype, vdata = 'bbox', list, bbox
+            if self.check_input(vname, rtype, vdata):
+                bbox, regions = self._region(vdata)
+            else:
+                self.__status['code'] = 1
+
         self.__conf['product']['bbox'] = bbox
         self.__conf['product']['period'] = period
         self.__conf['product']['nodata'] = nodata
 
+        # Class self.__conf['output']
+        vname, rtype, vdata = 'output', dict, output
+        if self.check_input(vname, rtype, vdata):
+            conf_output = {
+                'tiff': 'default',
+                'nc': False,
+                'regions': regions,
+                'zonal': None,
+                'points': None,
+                'dtype': 'float32',
+                'aggregate': None,
+                'grid': None
+            }
+            for key, value in vdata.items():
+                if key in conf_output.keys():
+                    conf_output[key] = value
+                else:
+                    raise IHEKeyError(key, list(conf_output.keys())) from None
+            if conf_output['dtype'] not in ['float32', 'native']:
+                raise IHEKeyError(conf_output['dtype'],
+                                  ['float32', 'native']) from None
+            if conf_output['zonal'] is True and \
+                    len(conf_output['regions']) < 1:
+                # the zones of True are the regions of bbox
+                raise IHETypeError('bbox', list, bbox) from None
+            if conf_output['points'] is not None:
+                conf_output['points'] = self._point(conf_output['points'])
+                if 'tiff' not in vdata.keys():
+                    conf_output['tiff'] = None
+            if conf_output['aggregate'] is not None:
+                conf_output['aggregate'] = self._aggregate(
+                    conf_output['aggregate'])
+            self.__conf['output'] = conf_output
+        else:
+            self.__status['code'] = 1
+
         # super(Download, self).__init__(**kwargs)
         if self.__status['code'] == 0:
             User.__init__(self, acct_path, product, is_status, **kwargs)
@@ -193,6 +300,202 @@ class Download(User):
         else:
             raise IHEClassInitError('Download') from None
 
+    def _region(self, regions) -> tuple:
+        """Named regions
+
+        The spatial range of a region is read from its shapefile or polygon
+        if not given. The download bbox is the union of all regions.
+
+        Args:
+            regions (list): [{'name':, 'w':, 's':, 'e':, 'n':}, ...].
+
+        Returns:
+            tuple: (bbox, regions), union spatial range and regions.
+        """
+        if len(regions) < 1:
+            raise IHETypeError('bbox', dict, regions) from None
+
+        conf_regions = []
+        for region in regions:
+            if 'name' not in region.keys():
+                raise IHEKeyError('name', list(region.keys())) from None
+            region = dict(region)
+
+            if 'shape' in region.keys():
+                from osgeo import ogr
+
+                source_ds = ogr.Open(region['shape'])
+                if source_ds is None:
+                    raise IHEFileError(region['shape']) from None
+                extent = source_ds.GetLayer().GetExtent()
+                region.update({'w': extent[0], 'e': extent[1],
+                               's': extent[2], 'n': extent[3]})
+                source_ds = None
+            elif 'polygon' in region.keys():
+                vertices = [[float(v) for v in vertex]
+                            for vertex in region['polygon']]
+                region['polygon'] = vertices
+                region.update({'w': min(v[0] for v in vertices),
+                               'e': max(v[0] for v in vertices),
+                               's': min(v[1] for v in vertices),
+                               'n': max(v[1] for v in vertices)})
+
+            for key in ['w', 's', 'e', 'n']:
+                if key not in region.keys():
+                    raise IHEKeyError(key, list(region.keys())) from None
+            conf_regions.append(region)
+
+        bbox = {
+            'w': min(region['w'] for region in conf_regions),
+            's': min(region['s'] for region in conf_regions),
+            'e': max(region['e'] for region in conf_regions),
+            'n': max(region['n'] for region in conf_regions)
+        }
+        return bbox, conf_regions
+
+    def _point(self, points) -> list:
+        """Stations
+
+        Args:
+            points (list): [{'name':, 'lon':, 'lat':}, ...], or path to a
+              csv file with the columns name, lon, lat.
+
+        Returns:
+            list: Stations, [{'name':, 'lon':, 'lat':}, ...].
+        """
+        if isinstance(points, str):
+            if not os.path.exists(points):
+                raise IHEFileError(points) from None
+            with open(points, newline='') as fp:
+                points = list(csv.DictReader(fp))
+
+        conf_points = []
+        for point in points:
+            for key in ['name', 'lon', 'lat']:
+                if key not in point.keys():
+                    raise IHEKeyError(key, list(point.keys())) from None
+            conf_points.append({'name': str(point['name']),
+                                'lon': float(point['lon']),
+                                'lat': float(point['lat'])})
+        if len(conf_points) < 1:
+            raise IHETypeError('points', list, points) from None
+        return conf_points
+
+    def _point_bbox(self) -> dict:
+        """Extent of the stations
+
+        The bbox, if empty, is the extent of the stations, padded by half a
+        pixel of the product, so every station pixel is downloaded.
+
+        Returns:
+            dict: bbox.
+        """
+        bbox = self.__conf['product']['bbox']
+        points = self.__conf['output']['points']
+
+        if self.__status['code'] == 0:
+            if points is not None and len(bbox) == 0:
+                data = self.__conf['product']['data']
+                lat_pad = abs(float(data['lat']['r'])) / 2.0
+                lon_pad = abs(float(data['lon']['r'])) / 2.0
+
+                bbox = {
+                    'w': min(point['lon'] for point in points) - lon_pad,
+                    's': min(point['lat'] for point in points) - lat_pad,
+                    'e': max(point['lon'] for point in points) + lon_pad,
+                    'n': max(point['lat'] for point in points) + lat_pad
+                }
+                self.__conf['product']['bbox'] = bbox
+        return bbox
+
+    def _aggregate(self, aggregate) -> dict:
+        """Temporal aggregation
+
+        Args:
+            aggregate (dict): 'dekad', 'month', 'year', or
+              {'freq':, 'how':, 'keep':}.
+
+        Returns:
+            dict: Aggregation, {'freq':, 'how':, 'keep':}.
+        """
+        try:
+            from .templates.collect import AGGREGATE_FREQS, AGGREGATE_STATS
+        except ImportError:
+            from IHEWAcollect.templates.collect import AGGREGATE_FREQS, \
+                AGGREGATE_STATS
+
+        if isinstance(aggregate, str):
+            aggregate = {'freq': aggregate}
+        conf_aggregate = {
+            'freq': 'month',
+            'how': ['sum', 'mean'],
+            'keep': True
+        }
+        for key, value in aggregate.items():
+            if key in conf_aggregate.keys():
+                conf_aggregate[key] = value
+            else:
+                raise IHEKeyError(key, list(conf_aggregate.keys())) from None
+
+        if conf_aggregate['freq'] not in AGGREGATE_FREQS:
+            raise IHEKeyError(conf_aggregate['freq'],
+                              AGGREGATE_FREQS) from None
+        if isinstance(conf_aggregate['how'], str):
+            conf_aggregate['how'] = [conf_aggregate['how']]
+        for stat in conf_aggregate['how']:
+            if stat not in AGGREGATE_STATS:
+                raise IHEKeyError(stat, AGGREGATE_STATS) from None
+        return conf_aggregate
+
+    def _aggregate_save(self):
+        """Save the aggregates of the download
+        """
+        if self.__conf['output']['aggregate'] is not None:
+            try:
+                from .templates.collect import Save_as_aggregate
+            except ImportError:
+                from IHEWAcollect.templates.collect import Save_as_aggregate
+
+            Save_as_aggregate(self.__conf)
+
+    def _tables_save(self):
+        """Sort the csv tables of the download
+        """
+        try:
+            from .templates.collect import Save_as_csv_tables
+        except ImportError:
+            from IHEWAcollect.templates.collect import Save_as_csv_tables
+
+        Save_as_csv_tables(self.__conf)
+
+    def _cache(self, cache) -> dict:
+        """Shared raw-download cache
+
+        Args:
+            cache (dict): {'path':, 'size':}.
+
+        Returns:
+            dict: Cache, {'path':, 'size':}.
+        """
+        conf_cache = {
+            'path': '',
+            'size': 10 * 1024 ** 3
+        }
+        for key, value in cache.items():
+            if key in conf_cache.keys():
+                conf_cache[key] = value
+            else:
+                raise IHEKeyError(key, list(conf_cache.keys())) from None
+
+        if not isinstance(conf_cache['path'], str) or conf_cache['path'] == '':
+            raise IHETypeError('cache', str, conf_cache['path']) from None
+        conf_cache['path'] = os.path.abspath(
+            os.path.expanduser(conf_cache['path']))
+        conf_cache['size'] = int(conf_cache['size'])
+        if not os.path.exists(conf_cache['path']):
+            os.makedirs(conf_cache['path'])
+        return conf_cache
+
     def _set_status(self, fun='', prt=False, ext=''):
         """Set status
 
@@ -215,6 +518,7 @@ class Download(User):
         self._time()
         self._account()
         self._product()
+        self._point_bbox()
         return status
 
     def _download_prepare(self) -> int:
@@ -250,6 +554,8 @@ class Download(User):
             int: Status.
         """
         status = -1
+        self._aggregate_save()
+        self._tables_save()
         self._log_close()
         # self._folder_clean()
 
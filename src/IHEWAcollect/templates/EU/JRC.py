@@ -20,18 +20,20 @@ import requests
 # IHEWAcollect Modules
 try:
     from ..collect import \
+        Get_remote_file, \
         Clip_Dataset_GDAL, Merge_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff
+        Open_array_info, Open_tiff_array, Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
+        Get_remote_file, \
         Clip_Dataset_GDAL, Merge_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff
+        Open_array_info, Open_tiff_array, Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -301,24 +303,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lon_w),
-        (x_id[1] * prod_lat_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (prod_lat_n - y_id[1] * prod_lat_size),
-        (prod_lat_n - y_id[0] * prod_lat_size)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,s]--[e,s]
     #   |      |
@@ -416,7 +405,8 @@ def start_download(args) -> int:
             # ------------- #
             # Download data #
             # ------------- #
-            if is_download:
+            def download():
+                remote_file_status = 0
                 url = '{sr}{dr}{fl}'.format(sr=url_server,
                                             dr=url_dir,
                                             fl=remote_fnames[ifile])
@@ -443,8 +433,14 @@ def start_download(args) -> int:
                         fp.write(conn.content)
                         conn.close()
                         remote_file_status += 0
-            else:
-                remote_file_status += 0
+                return remote_file_status
+
+            url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                              dr=url_dir,
+                                              fn=remote_fnames[ifile])
+            remote_file_status += Get_remote_file(
+                url_cache, remote_files[ifile], __this.conf, download,
+                is_download)
 
         # ---------------- #
         # Download success #
@@ -619,19 +615,18 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonmerge[0] - geo_trans[1], geo_trans[1], 0,
            latmerge[1] - geo_trans[5] / 2., 0, geo_trans[5]]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
@@ -28,14 +28,16 @@ except ImportError:
 try:
     from ..collect import \
         Extract_Data_gz, Open_tiff_array, Save_as_tiff, \
-        Extract_Data_zip, Convert_adf_to_tiff, Convert_bil_to_tiff, Open_array_info, Clip_Data
+        Get_archive_path, Convert_adf_to_tiff, Convert_bil_to_tiff, Open_array_info, \
+        Mosaic_tiles
     from ..gis import GIS
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
         Extract_Data_gz, Open_tiff_array, Save_as_tiff, \
-        Extract_Data_zip, Convert_adf_to_tiff, Convert_bil_to_tiff, Open_array_info, Clip_Data
+        Get_archive_path, Convert_adf_to_tiff, Convert_bil_to_tiff, Open_array_info, \
+        Mosaic_tiles
     from IHEWAcollect.templates.gis import GIS
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
@@ -102,10 +104,6 @@ def DownloadData(status, conf) -> int:
     if resolution == '3s':
         name, rangeLon, rangeLat = Find_Document_Names(latlim, lonlim, parameter)
 
-        # Memory for the map x and y shape (starts with zero)
-        size_X_tot = 0
-        size_Y_tot = 0
-
     if resolution == '15s' or resolution == '30s':
         name = Find_Document_names_15s_30s(latlim, lonlim, parameter, resolution)
 
@@ -124,9 +122,6 @@ def DownloadData(status, conf) -> int:
                                                    output_folder_trash, parameter,
                                                    para_name, resolution)
 
-            # extract zip data
-            Extract_Data_zip(output_file, output_folder_trash)
-
             # Converts the data with a adf extention to a tiff extension.
             # The input is the file name and in which directory the data must be stored
             file_name_tiff = file_name.split('.')[0] + '_trans_temporary.tif'
@@ -141,8 +136,11 @@ def DownloadData(status, conf) -> int:
 
             output_tiff = os.path.join(output_folder_trash, file_name_tiff)
 
-            input_adf = os.path.join(output_folder_trash, file_name_extract2,
-                                     file_name_extract2, 'hdr.adf')
+            # read the ESRI grid in place from the zip archive
+            input_adf = Get_archive_path(output_file,
+                                         '/'.join([file_name_extract2,
+                                                   file_name_extract2,
+                                                   'hdr.adf']))
             output_tiff = Convert_adf_to_tiff(input_adf, output_tiff)
 
             geo_out, proj, size_X, size_Y = Open_array_info(output_tiff)
@@ -231,177 +229,47 @@ def DownloadData(status, conf) -> int:
                 print('no 15s data is in dataset')
 
         if resolution == '3s':
-
-            # clip data
-            Data, Geo_data = Clip_Data(output_tiff, latlim, lonlim)
-            size_Y_out = int(np.shape(Data)[0])
-            size_X_out = int(np.shape(Data)[1])
-
-            # Total size of the product so far
-            size_Y_tot = int(size_Y_tot + size_Y_out)
-            size_X_tot = int(size_X_tot + size_X_out)
-
-            if nameFile is name[0]:
-                Geo_x_end = Geo_data[0]
-                Geo_y_end = Geo_data[3]
-            else:
-                Geo_x_end = np.min([Geo_x_end, Geo_data[0]])
-                Geo_y_end = np.max([Geo_y_end, Geo_data[3]])
-
-            # create name for chunk
-            FileNameEnd = "%s_temporary.tif" % (nameFile)
-            nameForEnd = os.path.join(output_folder_trash, FileNameEnd)
-            nameResults.append(str(nameForEnd))
-
-            # save chunk as tiff file
-            Save_as_tiff(name=nameForEnd, data=Data, geo=Geo_data, projection="WGS84")
-
-    if resolution == '3s':
-        # size_X_end = int(size_X_tot) #!
-        # size_Y_end = int(size_Y_tot) #!
-
-        size_X_end = int(size_X_tot / len(rangeLat)) + 1  # !
-        size_Y_end = int(size_Y_tot / len(rangeLon)) + 1  # !
-
-        # Define the georeference of the end matrix
-        geo_out = [Geo_x_end, Geo_data[1], 0, Geo_y_end, 0, Geo_data[5]]
-
-        latlim_out = [geo_out[3] + geo_out[5] * size_Y_end, geo_out[3]]
-        lonlim_out = [geo_out[0], geo_out[0] + geo_out[1] * size_X_end]
-
-        # merge chunk together resulting in 1 tiff map
-        datasetTot = Merge_DEM(latlim_out, lonlim_out, nameResults, size_Y_end,
-                               size_X_end)
-
-        datasetTot[datasetTot < -9999] = -9999
+            nameResults.append(str(output_tiff))
 
     if resolution == '15s' or resolution == '30s':
-        output_file_merged = os.path.join(output_folder_trash, 'merged.tif')
-        datasetTot, geo_out = Merge_DEM_15s_30s(name, output_folder_trash, output_file_merged,
-                                                latlim, lonlim, resolution)
+        nameResults = [os.path.join(output_folder_trash,
+                                    f.replace('.zip', '_trans_temporary.tif'))
+                       for f in name]
+        nameResults = [f for f in nameResults if os.path.exists(f)]
 
     # name of the end result
     output_DEM_name = "%s_HydroShed_%s_%s.tif" % (para_name, unit, resolution)
 
     Save_name = os.path.join(output_folder, output_DEM_name)
 
-    # Make geotiff file
-    Save_as_tiff(name=Save_name, data=datasetTot, geo=geo_out, projection="WGS84")
+    # merge the tiles block by block into the geotiff, clipped to the bbox
+    Merge_DEM(latlim, lonlim, nameResults, Save_name,
+              profile=conf['output']['tiff'])
     os.chdir(output_folder)
 
     # Delete the temporary folder
     # shutil.rmtree(output_folder_trash)
 
 
-def Merge_DEM_15s_30s(file_names, output_folder_trash, output_file_merged, latlim, lonlim,
-                      resolution):
-
-    tiff_files = [os.path.join(output_folder_trash,
-                               f.replace('.zip','_trans_temporary.tif')) for f in file_names]
-    
-    latmin, latmax, lonmin, lonmax, resolution_geo = fullpixel_clipping_limits_tifflist(latlim, lonlim, tiff_files)
-    size_x_tot = int(np.round((lonmax - lonmin) / resolution_geo))
-    size_y_tot = int(np.round((latmax - latmin) / resolution_geo))
-
-    data_tot = np.ones([size_y_tot, size_x_tot]) * -9999.
-
-    for inFile in tiff_files:
-        geo, proj, size_X, size_Y = Open_array_info(inFile)
-        resolution_geo = geo[1]
-    
-        lonmin_one = geo[0]
-        lonmax_one = geo[0] + size_X * geo[1]
-        latmin_one = geo[3] + size_Y * geo[5]
-        latmax_one = geo[3]
-
-        
-        if lonmin_one < lonmin:
-            lonmin_clip = lonmin
-        else:
-            lonmin_clip = lonmin_one
-    
-        if lonmax_one > lonmax:
-            lonmax_clip = lonmax
-        else:
-            lonmax_clip = lonmax_one
-    
-        if latmin_one < latmin:
-            latmin_clip = latmin
-        else:
-            latmin_clip = latmin_one
-    
-        if latmax_one > latmax:
-            latmax_clip = latmax
-        else:
-            latmax_clip = latmax_one
-        
-        size_x_clip = int(np.round((lonmax_clip - lonmin_clip) / resolution_geo))
-        size_y_clip = int(np.round((latmax_clip - latmin_clip) / resolution_geo))
-    
-        geo, proj, size_X, size_Y = Open_array_info(inFile)
-        data_tmp = Open_tiff_array(inFile)
-        if isinstance(data_tmp, np.ma.MaskedArray):
-            Data = data_tmp.filled()
-        else:
-            Data = np.asarray(data_tmp)
-    
-        lonmin_tiff = geo[0]
-        latmax_tiff = geo[3]
-        lon_tiff_position = int(np.round((lonmin_clip - lonmin_tiff) / resolution_geo))
-        lat_tiff_position = int(np.round((latmax_tiff - latmax_clip) / resolution_geo))
-        lon_data_tot_position = int(np.round((lonmin_clip - lonmin) / resolution_geo))
-        lat_data_tot_position = int(np.round((latmax - latmax_clip) / resolution_geo))
-    
-        # Data[Data < -9999.] = -9999.
-        Data = np.where(Data < -9999.0, -9999.0, Data)
-        
-        data_tot[lat_data_tot_position:lat_data_tot_position + size_y_clip,
-        lon_data_tot_position:lon_data_tot_position + size_x_clip][
-            data_tot[lat_data_tot_position:lat_data_tot_position + size_y_clip,
-            lon_data_tot_position:lon_data_tot_position + size_x_clip] == -9999] = \
-        Data[lat_tiff_position:lat_tiff_position + size_y_clip,
-        lon_tiff_position:lon_tiff_position + size_x_clip][
-            data_tot[lat_data_tot_position:lat_data_tot_position + size_y_clip,
-            lon_data_tot_position:lon_data_tot_position + size_x_clip] == -9999]
-
-    geo_out = [lonmin, resolution_geo, 0.0, latmax, 0.0, -1 * resolution_geo]
-    geo_out = tuple(geo_out)
-    # data_tot[data_tot < -9999.] = -9999.
-    data_tot = np.where(data_tot < -9999.0, -9999.0, data_tot)
-
-    return (data_tot, geo_out)
-
-
-def Merge_DEM(latlim, lonlim, nameResults, size_Y_tot, size_X_tot):
+def Merge_DEM(latlim, lonlim, nameResults, output_name, profile='tiled'):
     """
-    This function will merge the tiles
+    This function will merge the tiles, block by block into the output file
 
     Keyword arguments:
     latlim -- [ymin, ymax], (values must be between -50 and 50)
     lonlim -- [xmin, xmax], (values must be between -180 and 180)
     nameResults -- ['string'], The directories of the tiles which must be
                    merged
-    size_Y_tot -- integer, the width of the merged array
-    size_X_tot -- integer, the length of the merged array
+    output_name -- string, the directory of the merged file
+    profile -- string or dictionary, creation profile of the merged file
     """
-    # Define total size of end dataset and create zero array
-    datasetTot = np.ones([size_Y_tot, size_X_tot]) * -9999.
-
-    # Put all the files in the datasetTot (1 by 1)
-    for nameTot in nameResults:
-        f = gdal.Open(nameTot)
-        dataset = np.array(f.GetRasterBand(1).ReadAsArray())
-        dataset = np.flipud(dataset)
-        geo_out = f.GetGeoTransform()
-        BoundChunk1 = int(round((geo_out[0] - lonlim[0]) / geo_out[1]))
-        BoundChunk2 = BoundChunk1 + int(dataset.shape[1])
-        BoundChunk4 = size_Y_tot + int(round((geo_out[3] -
-                                              latlim[1]) / geo_out[1]))
-        BoundChunk3 = BoundChunk4 - int(dataset.shape[0])
-        datasetTot[BoundChunk3:BoundChunk4, BoundChunk1:BoundChunk2] = dataset
-        f = None
-    datasetTot = np.flipud(datasetTot)
-    return (datasetTot)
+    if profile is None:
+        profile = 'tiled'
+
+    geo_out = Mosaic_tiles(nameResults, output_name, latlim, lonlim,
+                           ndv=-9999, valid_range=[-9999, np.inf],
+                           profile=profile)
+    return (geo_out)
 
 
 def Find_Document_Names(latlim, lonlim, parameter):
@@ -20,16 +20,20 @@ import pandas as pd
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        Extract_Data_gz, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Extract_Data_gz, Open_tiff_array, Get_point_read, \
+        Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        Extract_Data_gz, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Extract_Data_gz, Open_tiff_array, Get_point_read, \
+        Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -366,24 +370,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lon_w),
-        (x_id[1] * prod_lat_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (prod_lat_n - y_id[1] * prod_lat_size),
-        (prod_lat_n - y_id[0] * prod_lat_size)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,s]--[e,s]
     #   |      |
@@ -476,7 +467,8 @@ def start_download(args) -> int:
         # ------------- #
         # Download data #
         # ------------- #
-        if is_download:
+        def download():
+            remote_file_status = 0
             url_parse = urlparse(url_server)
             url_host = url_parse.hostname
             # url_port = url_parse.port
@@ -508,8 +500,14 @@ def start_download(args) -> int:
                     conn.retrbinary("RETR " + remote_fname, fp.write)
                     conn.close()
                     remote_file_status += 0
-        else:
-            remote_file_status += 0
+            return remote_file_status
+
+        url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                          dr=url_dir,
+                                          fn=remote_fname)
+        remote_file_status += Get_remote_file(url_cache, remote_file,
+                                              __this.conf, download,
+                                              is_download)
 
         # ---------------- #
         # Download success #
@@ -567,14 +565,24 @@ def convert_data(args):
         # Generate temporary files
         Extract_Data_gz(remote_file, temp_file_part)
 
-        data_raw = np.fromfile(temp_file_part, dtype="<f4")
-        data_raw = np.resize(data_raw, [pixel_h, pixel_w])
-        data_raw = np.flipud(data_raw)
+        # rows are stored south to north, read the rows of the window only
+        row_size = pixel_w * np.dtype("<f4").itemsize
+        if os.stat(temp_file_part).st_size == pixel_h * row_size:
+            data_raw = np.fromfile(temp_file_part, dtype="<f4",
+                                   count=(y_id[1] - y_id[0]) * pixel_w,
+                                   offset=(pixel_h - y_id[1]) * row_size)
+            data_raw = np.flipud(np.reshape(data_raw, [-1, pixel_w]))
+        else:
+            data_raw = np.fromfile(temp_file_part, dtype="<f4")
+            data_raw = np.resize(data_raw, [pixel_h, pixel_w])
+            data_raw = np.flipud(data_raw)[y_id[0]:y_id[1], :]
+        data_raw = data_raw[:, x_id[0]:x_id[1]]
 
         # data = np.flipud(data_tmp[y_id[0]:y_id[1], x_id[0]:x_id[1]])
     if product['resolution'] == "weekly":
         # From downloaded remote file
-        data_raw = Open_tiff_array(remote_file)
+        data_raw = Open_tiff_array(remote_file, window=[y_id, x_id],
+                                   points=Get_point_read(__this.conf))
 
         # From generated temporary file
         # Generate temporary files
@@ -588,8 +596,8 @@ def convert_data(args):
     # --------- #
     # Clip data #
     # --------- #
-    # get data to 2D matrix
-    data_tmp = data_raw[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+    # get data to 2D matrix, read by window
+    data_tmp = data_raw
 
     # check data type
     # filled numpy.ma.MaskedArray as numpy.ndarray
@@ -625,19 +633,19 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    data = np.where(data < 0.0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                valid_range=[0, np.inf],
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonlim[0], pixel_size, 0,
            latlim[1], 0, -pixel_size]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
@@ -13,23 +13,30 @@ from urllib.parse import urlparse
 import numpy as np
 import pandas as pd
 
+try:
+    from osgeo import gdal
+except ImportError:
+    import gdal
+
 # from joblib import Parallel, delayed
 
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        reproject_MODIS, Clip_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        reproject_MODIS, Clip_Dataset_GDAL, Get_memory_path, \
+        Open_array_info, Open_tiff_array, Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        reproject_MODIS, Clip_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        reproject_MODIS, Clip_Dataset_GDAL, Get_memory_path, \
+        Open_array_info, Open_tiff_array, Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -299,24 +306,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lon_w),
-        (x_id[1] * prod_lat_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (prod_lat_n - y_id[1] * prod_lat_size),
-        (prod_lat_n - y_id[0] * prod_lat_size)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,s]--[e,s]
     #   |      |
@@ -409,7 +403,8 @@ def start_download(args) -> int:
         # ------------- #
         # Download data #
         # ------------- #
-        if is_download:
+        def download():
+            remote_file_status = 0
             url_parse = urlparse(url_server)
             url_host = url_parse.hostname
             # url_port = url_parse.port
@@ -441,8 +436,14 @@ def start_download(args) -> int:
                     conn.retrbinary("RETR " + remote_fname, fp.write)
                     conn.close()
                     remote_file_status += 0
-        else:
-            remote_file_status += 0
+            return remote_file_status
+
+        url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                          dr=url_dir,
+                                          fn=remote_fname)
+        remote_file_status += Get_remote_file(url_cache, remote_file,
+                                              __this.conf, download,
+                                              is_download)
 
         # ---------------- #
         # Download success #
@@ -500,9 +501,11 @@ def convert_data(args):
     # --------- #
     # From downloaded remote file
 
-    # From generated temporary file
-    temp_file_part = temp_file.format(dtime=date, ipart=0)
-    temp_file_part_4326 = temp_file.format(dtime=date, ipart='{}_4326'.format(0))
+    # From generated temporary file, kept in memory
+    temp_file_part = Get_memory_path(
+        temp_file.format(dtime=date, ipart=0))
+    temp_file_part_4326 = Get_memory_path(
+        temp_file.format(dtime=date, ipart='{}_4326'.format(0)))
 
     # Generate temporary files
     reproject_MODIS(remote_file, temp_file_part_4326, '4326')
@@ -544,6 +547,8 @@ def convert_data(args):
     latmerge = [lat_min_merge, lat_max_merge]
 
     data_tmp = Open_tiff_array(temp_file_part)
+    gdal.Unlink(temp_file_part)
+    gdal.Unlink(temp_file_part_4326)
 
     # check data type
     # filled numpy.ma.MaskedArray as numpy.ndarray
@@ -579,19 +584,18 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonmerge[0] - geo_trans[1] / 2., geo_trans[1], 0,
            latmerge[1] - geo_trans[5] / 2., 0, geo_trans[5]]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
@@ -6,17 +6,109 @@ import os
 
 import numpy as np
 
+from joblib import Parallel, delayed
+
 try:
     # from osgeo import gdal, osr, gdalconst
     from osgeo import gdal
 except ImportError:
     import gdal
 
+# IHEWAcollect Modules
+try:
+    from ..collect import \
+        Get_tiff_options, Get_tiff_profile
+except ImportError:
+    from IHEWAcollect.templates.collect import \
+        Get_tiff_options, Get_tiff_profile
+
 
-def main():
+def create_month(output_folder, year, month, profile=None):
+    """
+    **create_month**
+
+    Mosaic the 1200x1200 h/v tiles of one month into one GeoTIFF. Every tile
+    is written straight into its window of the tiled output, tiles do not
+    have to be held in memory together. Negative values are nodata.
+
+    Args:
+        output_folder (str): Folder of the tiles and of the output.
+        year (int): Year.
+        month (int): Month.
+        profile (str|dict): GeoTIFF creation profile, default DEFLATE with
+          400x400 blocks, aligned with the tiles.
+    """
+    Distance = 926.625
+    ndv = -9999
+    size_tile = 1200
+
+    if profile is None:
+        profile = {'profile': 'deflate', 'blocksize': [400, 400]}
+    conf = Get_tiff_profile(profile)
+
+    file_name = "ET_ETmonitor_mm-month_%d_%02d_01.tif" % (year, month)
+    file_dir_out = os.path.join(output_folder, file_name)
+
+    # Make geotiff file, blocks that are not written are nodata
+    driver = gdal.GetDriverByName("GTiff")
+    dst_ds = driver.Create(file_dir_out, (33 - 7) * size_tile, 15 * size_tile,
+                           1, gdal.GDT_Float32,
+                           Get_tiff_options(conf, np.float32))
+
+    proj = 'PROJCS["unnamed",' \
+           'GEOGCS["Unknown datum based upon the custom spheroid",' \
+           'DATUM["Not specified (based on custom spheroid)",' \
+           'SPHEROID["Custom spheroid",6371007.181,0]],' \
+           'PRIMEM["Greenwich",0],' \
+           'UNIT["degree",0.0174532925199433]],' \
+           'PROJECTION["Sinusoidal"],' \
+           'PARAMETER["longitude_of_center",0],' \
+           'PARAMETER["false_easting",0],' \
+           'PARAMETER["false_northing",0],' \
+           'UNIT["Meter",1]]'
+    x1 = (7 - 18) * size_tile * Distance
+    x4 = (0 - 9) * size_tile * -1 * Distance
+    geo = [x1, Distance, 0.0, x4, 0.0, -Distance]
+    geo_t = tuple(geo)
+    dst_ds.SetProjection(proj)
+    dst_ds.SetGeoTransform(geo_t)
+
+    dst_band = dst_ds.GetRasterBand(1)
+    dst_band.SetNoDataValue(ndv)
+
+    for htile in range(7, 33):
+        for vtile in range(0, 15):
+            file_name = "ETmonitor_%d_%02d_h%02dv%02d.tif" % (
+                year, month, htile, vtile)
+            total_name = os.path.join(output_folder, file_name)
+            if os.path.exists(total_name):
+                dest = gdal.Open(total_name)
+                data = dest.GetRasterBand(1).ReadAsArray().astype(np.float32)
+                dest = None
+
+                data[~(data >= 0)] = ndv
+                data[data != ndv] *= 0.1
+
+                Hstart = (htile - 7) * size_tile
+                Vstart = vtile * size_tile
+                dst_band.WriteArray(data, Hstart, Vstart)
+
+    dst_band = None
+    dst_ds = None
+    return file_dir_out
+
+
+def main(output_folder=r"J:\Tim\ETmonitor", cores=1):
     """
     **main**
 
+    Mosaic the tiles of every month of 2008 to 2013, see create_month.
+
+    Args:
+        output_folder (str): Folder of the tiles and of the output.
+        cores (int): Number of parallel jobs of joblib, months are
+          independent, each writes its own file.
+
     **Examples:**
     ::
 
@@ -48,51 +140,8 @@ def main():
         process = subprocess.Popen(fullCmd)
         process.wait()
     """
-    output_folder = r"J:\Tim\ETmonitor"
-    for year in range(2008, 2014):
-        ETmonitor_tot = np.ones([18000, 31200]) * np.nan
-        Distance = 926.625
-        for month in range(1, 12):
-            for htile in range(7, 33):
-                for vtile in range(0, 15):
-                    file_name = "ETmonitor_%d_%02d_h%02dv%02d.tif" % (
-                        year, month, htile, vtile)
-                    total_name = os.path.join(output_folder, file_name)
-                    if os.path.exists(total_name):
-                        dest = gdal.Open(total_name)
-                        data = dest.GetRasterBand(1).ReadAsArray()
-                        Hstart = (htile - 7) * 1200
-                        Vstart = vtile * 1200
-                        ETmonitor_tot[Vstart:Vstart + 1200, Hstart:Hstart + 1200] = data
-
-            ETmonitor_tot[ETmonitor_tot < 0] = np.nan
-            file_name = "ET_ETmonitor_mm-month_%d_%02d_01.tif" % (year, month)
-            file_dir_out = os.path.join(output_folder, file_name)
-
-            # Make geotiff file
-            driver = gdal.GetDriverByName("GTiff")
-            dst_ds = driver.Create(file_dir_out, ETmonitor_tot.shape[1],
-                                   ETmonitor_tot.shape[0], 1, gdal.GDT_Float32,
-                                   ['COMPRESS=LZW'])
-
-            proj = 'PROJCS["unnamed",' \
-                   'GEOGCS["Unknown datum based upon the custom spheroid",' \
-                   'DATUM["Not specified (based on custom spheroid)",' \
-                   'SPHEROID["Custom spheroid",6371007.181,0]],' \
-                   'PRIMEM["Greenwich",0],' \
-                   'UNIT["degree",0.0174532925199433]],' \
-                   'PROJECTION["Sinusoidal"],' \
-                   'PARAMETER["longitude_of_center",0],' \
-                   'PARAMETER["false_easting",0],' \
-                   'PARAMETER["false_northing",0],' \
-                   'UNIT["Meter",1]]'
-            x1 = (7 - 18) * 1200 * Distance
-            x4 = (0 - 9) * 1200 * -1 * Distance
-            geo = [x1, Distance, 0.0, x4, 0.0, -Distance]
-            geo_t = tuple(geo)
-            dst_ds.SetProjection(proj)
-
-            dst_ds.GetRasterBand(1).SetNoDataValue(-9999)
-            dst_ds.SetGeoTransform(geo_t)
-            dst_ds.GetRasterBand(1).WriteArray(0.1 * ETmonitor_tot)
-            dst_ds = None
+    # months are independent, each writes its own file
+    Parallel(n_jobs=cores)(
+        delayed(create_month)(output_folder, year, month)
+        for year in range(2008, 2014)
+        for month in range(1, 13))
@@ -20,16 +20,18 @@ import scipy.io as spio
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        Save_as_tiff
+        Get_remote_file, \
+        Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        Save_as_tiff
+        Get_remote_file, \
+        Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -299,24 +301,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lon_w),
-        (x_id[1] * prod_lat_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (prod_lat_n - y_id[1] * prod_lat_size),
-        (prod_lat_n - y_id[0] * prod_lat_size)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,s]--[e,s]
     #   |      |
@@ -409,7 +398,8 @@ def start_download(args) -> int:
         # ------------- #
         # Download data #
         # ------------- #
-        if is_download:
+        def download():
+            remote_file_status = 0
             url_parse = urlparse(url_server)
             url_host = url_parse.hostname
             # url_port = url_parse.port
@@ -441,8 +431,14 @@ def start_download(args) -> int:
                     conn.retrbinary("RETR " + remote_fname, fp.write)
                     conn.close()
                     remote_file_status += 0
-        else:
-            remote_file_status += 0
+            return remote_file_status
+
+        url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                          dr=url_dir,
+                                          fn=remote_fname)
+        remote_file_status += Get_remote_file(url_cache, remote_file,
+                                              __this.conf, download,
+                                              is_download)
 
         # ---------------- #
         # Download success #
@@ -493,7 +489,11 @@ def convert_data(args):
     # Load data #
     # --------- #
     # From downloaded remote file
-    data_raw = spio.loadmat(remote_file)[data_variable]
+    # only the variable is decoded, and its window kept, MAT files have no
+    # windowed read
+    data_raw = spio.loadmat(remote_file,
+                            variable_names=[data_variable])[data_variable]
+    data_raw = np.array(data_raw[y_id[0]:y_id[1], x_id[0]:x_id[1]])
 
     # From generated temporary file
     # Generate temporary files
@@ -507,8 +507,8 @@ def convert_data(args):
     # --------- #
     # Clip data #
     # --------- #
-    # get data to 2D matrix
-    data_tmp = data_raw[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+    # get data to 2D matrix, read by window
+    data_tmp = data_raw
 
     # check data type
     # filled numpy.ma.MaskedArray as numpy.ndarray
@@ -544,19 +544,17 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    # data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonlim[0], pixel_size, 0,
            latlim[1], 0, -pixel_size]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
@@ -9,13 +9,11 @@ import datetime
 # General modules
 import inspect
 import os
-import re
 import sys
 from io import BytesIO
 import numpy as np
 import pandas as pd
 import pycurl
-from bs4 import BeautifulSoup
 # import requests
 # # from requests.auth import HTTPBasicAuth => .netrc
 from joblib import Parallel, delayed
@@ -30,20 +28,25 @@ except ImportError:
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Get_listing_intervals, Group_listing_dates, \
+        Open_tiff_array, Get_point_read, Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Get_listing_intervals, Group_listing_dates, \
+        Open_tiff_array, Get_point_read, Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
 __this = sys.modules[__name__]
+__this.RASTERS = {}
 
 
 def _init(status, conf):
@@ -211,12 +214,18 @@ def download_product(latlim, lonlim, dates,
     #                     prefix='Progress:', suffix='Complete',
     #                     length=50)
 
-    if not cores:
-        for date in dates:
-            args = get_download_args(latlim, lonlim, date,
-                                     account, folder, product)
+    # Scan the listing once, and group the dates by the file covering them,
+    # so each file is downloaded and read once
+    args = [get_download_args(latlim, lonlim, date,
+                              account, folder, product) for date in dates]
+    groups = {}
+    if len(args) > 0:
+        groups = Group_listing_dates(start_download_scan(args[0]), dates)
 
-            status_cod = start_download(args)
+    if not cores:
+        for ctime, ids in groups.items():
+            status_cod = start_download_group(
+                list(ctime), [args[i] for i in ids])
 
             # Update waitbar
             # if is_waitbar == 1:
@@ -226,11 +235,9 @@ def download_product(latlim, lonlim, dates,
             #                     length=50)
     else:
         status_cod = Parallel(n_jobs=cores)(
-            delayed(
-                start_download)(
-                get_download_args(
-                    latlim, lonlim, date,
-                    account, folder, product)) for date in dates)
+            delayed(start_download_group)(
+                list(ctime), [args[i] for i in ids])
+            for ctime, ids in groups.items())
 
     return status_cod
 
@@ -324,24 +331,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lon_w),
-        (x_id[1] * prod_lat_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (prod_lat_n - y_id[1] * prod_lat_size),
-        (prod_lat_n - y_id[0] * prod_lat_size)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,s]--[e,s]
     #   |      |
@@ -389,8 +383,52 @@ def get_download_args(latlim, lonlim, date,
         data_ndv, data_type, data_multiplier, data_variable
 
 
-def start_download(args) -> int:
+def start_download_group(ctime, group) -> int:
+    """Retrieves the dates of a file
+
+    The dates share one download and one read of the file, ctime, the remote
+    and temporary folders are cleaned after the last date.
+    """
+    status_cod = 0
+    for args in group:
+        status_cod += start_download(args, ctime)
+
+    if len(__this.RASTERS) > 0:
+        __this.RASTERS.clear()
+
+    # Unpack the arguments
+    latlim, lonlim, date, \
+        product, \
+        username, password, apitoken, \
+        url_server, url_dir, \
+        remote_fname, temp_fname, local_fname, \
+        remote_file, temp_file, local_file, \
+        y_id, x_id, pixel_size, pixel_w, pixel_h, \
+        data_ndv, data_type, data_multiplier, data_variable = group[-1]
+
+    if __this.conf['is_save_remote']:
+        pass
+    else:
+        path = os.path.dirname(os.path.realpath(remote_file))
+        if 'remote' != path[-6:]:
+            path = os.path.join(path, 'remote')
+        clean(path)
+    if __this.conf['is_save_temp']:
+        pass
+    else:
+        path = os.path.dirname(os.path.realpath(temp_file))
+        if 'temporary' != path[-9:]:
+            path = os.path.join(path, 'temporary')
+        clean(path)
+
+    return status_cod
+
+
+def start_download(args, ctime) -> int:
     """Retrieves data
+
+    ctime is the file time, [start, end], of the date, see
+    start_download_scan.
     """
     # Unpack the arguments
     latlim, lonlim, date, \
@@ -430,12 +468,6 @@ def start_download(args) -> int:
         # Download the data from server if the file not exists
         remote_files = []
         remote_fnames = []
-        url = '{sr}{dr}'.format(sr=url_server, dr=url_dir)
-        file = os.path.join(__this.path, '{p}-{v}.html'.format(
-            p=product['name'],
-            v=product['version']
-        ))
-        ctime = start_download_scan(url, file, username, password, date)
         if len(ctime) == 2:
             remote_files.append(remote_file.format(
                 dtime_s=ctime[0],
@@ -463,7 +495,8 @@ def start_download(args) -> int:
                 # ------------- #
                 # Download data #
                 # ------------- #
-                if is_download:
+                def download():
+                    remote_file_status = 0
                     url = '{sr}{dr}{fl}'.format(sr=url_server,
                                                 dr=url_dir,
                                                 fl=remote_fnames[ifile])
@@ -502,6 +535,14 @@ def start_download(args) -> int:
                     #         fp.write(conn.content)
                     #         conn.close()
                     #         remote_file_status += 0
+                    return remote_file_status
+
+                url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                                  dr=url_dir,
+                                                  fn=remote_fnames[ifile])
+                remote_file_status += Get_remote_file(
+                    url_cache, remote_files[ifile], __this.conf, download,
+                    is_download)
         else:
             remote_file_status += 0
 
@@ -510,7 +551,7 @@ def start_download(args) -> int:
         # ---------------- #
         if len(remote_fnames) > 0:
             if remote_file_status == 0:
-                local_file_status += convert_data(args)
+                local_file_status += convert_data(args, ctime)
         else:
             msg = 'No tiles found!'
             print('{}'.format(msg))
@@ -532,45 +573,36 @@ def start_download(args) -> int:
     return status_cod
 
 
-def start_download_scan(url, file, username, password, date) -> tuple:
-    """Scan tile name
+def start_download_scan(args) -> tuple:
+    """Scan file time
+
+    The listing is downloaded, with is_save_list, and parsed once per
+    download into the start and end dates of the files, see
+    Get_listing_intervals.
     """
-    ctime = []
+    # Unpack the arguments
+    latlim, lonlim, date, \
+        product, \
+        username, password, apitoken, \
+        url_server, url_dir, \
+        remote_fname, temp_fname, local_fname, \
+        remote_file, temp_file, local_file, \
+        y_id, x_id, pixel_size, pixel_w, pixel_h, \
+        data_ndv, data_type, data_multiplier, data_variable = args
 
-    # Connect to server
+    url = ''
     if __this.conf['is_save_list']:
         # Scan available data on the server
         # Curl or Menually to GFZ-v3.1.html
-        with open(file, 'wb') as fp:
-            conn = pycurl.Curl()
-            conn.setopt(conn.URL, url)
-            conn.setopt(conn.USERPWD, '%s:%s' % (username, password))
-            conn.setopt(conn.WRITEDATA, fp)
-            conn.perform()
-            conn.close()
-
-    # Scan available data on local drive
-    conn = open(file, 'r', encoding='UTF8')
-    soup = BeautifulSoup(conn, "html.parser")
-
-    for ele in soup.findAll('a', attrs={'href': re.compile('(?i)(tif)$')}):
-        # print('{dtime}'.format(dtime=ele['href'].split('/')[-1]))
-        fname = ele['href'].split('/')[-1]
-        date_s = pd.to_datetime(fname.split('-')[1][2:], format='%Y%j')
-        date_e = pd.to_datetime(fname.split('-')[2][:7], format='%Y%j')
-        date_r = pd.date_range(date_s, date_e, freq='D')
-
-        if date in date_r:
-            ctime = [
-                pd.to_datetime(date_s, format='%Y%j'),
-                pd.to_datetime(date_e, format='%Y%j')
-            ]
-            # print(ctime)
-
-    return ctime
+        url = '{sr}{dr}'.format(sr=url_server, dr=url_dir)
+    file = os.path.join(__this.path, '{p}-{v}.html'.format(
+        p=product['name'],
+        v=product['version']
+    ))
+    return Get_listing_intervals(file, url, username, password)
 
 
-def convert_data(args):
+def convert_data(args, ctime):
     """
     """
     # Unpack the arguments
@@ -597,17 +629,14 @@ def convert_data(args):
     # Load data #
     # --------- #
     # From downloaded remote file
-    url = '{sr}{dr}'.format(sr=url_server, dr=url_dir)
-    file = os.path.join(__this.path, '{p}-{v}.html'.format(
-        p=product['name'],
-        v=product['version']
-    ))
-    ctime = start_download_scan(url, file, username, password, date)
-
-    data_raw = Open_tiff_array(remote_file.format(
-            dtime_s=ctime[0],
-            dtime_e=ctime[1]
-        ))
+    # read once for all dates of the file, see start_download_group
+    file = remote_file.format(dtime_s=ctime[0], dtime_e=ctime[1])
+    key = (file, tuple(y_id), tuple(x_id))
+    if key not in __this.RASTERS.keys():
+        points = Get_point_read(__this.conf)
+        __this.RASTERS[key] = Open_tiff_array(file, window=[y_id, x_id],
+                                              points=points)
+    data_raw = __this.RASTERS[key].copy()
 
     # From generated temporary file
     # Generate temporary files
@@ -621,8 +650,8 @@ def convert_data(args):
     # --------- #
     # Clip data #
     # --------- #
-    # get data to 2D matrix
-    data_tmp = data_raw[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+    # get data to 2D matrix, only the bbox window has been read
+    data_tmp = data_raw
 
     # check data type
     # filled numpy.ma.MaskedArray as numpy.ndarray
@@ -658,34 +687,18 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonlim[0], pixel_size, 0,
            latlim[1], 0, -pixel_size]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
-
-    if __this.conf['is_save_remote']:
-        pass
-    else:
-        path = os.path.dirname(os.path.realpath(remote_file))
-        if 'remote' != path[-6:]:
-            path = os.path.join(path, 'remote')
-        clean(path)
-    if __this.conf['is_save_temp']:
-        pass
-    else:
-        path = os.path.dirname(os.path.realpath(temp_file))
-        if 'temporary' != path[-9:]:
-            path = os.path.join(path, 'temporary')
-        clean(path)
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     status_cod = 0
     return status_cod
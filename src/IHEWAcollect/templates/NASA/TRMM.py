@@ -19,16 +19,20 @@ from joblib import Parallel, delayed
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        Convert_hdf5_to_tiff, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Convert_hdf5_to_tiff, Open_tiff_array, Get_point_read, \
+        Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        Convert_hdf5_to_tiff, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Convert_hdf5_to_tiff, Open_tiff_array, Get_point_read, \
+        Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -342,24 +346,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,s]--[w,n]
     #   |      |
     # [e,s]--[e,n]
-    y_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((latlim[0] - prod_lat_s) / prod_lat_size),
-        np.ceil((latlim[1] - prod_lat_s) / prod_lat_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'], orient='s', transpose=True)
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (y_id[0] * prod_lon_size + prod_lon_w),
-        (y_id[1] * prod_lon_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lat_s),
-        (x_id[1] * prod_lat_size + prod_lat_s)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
     
 
     return latlim, lonlim, date, \
@@ -427,7 +418,8 @@ def start_download(args) -> int:
         # ------------- #
         # Download data #
         # ------------- #
-        if is_download:
+        def download():
+            remote_file_status = 0
             url = '{sr}{dr}{fl}'.format(sr=url_server,
                                         dr=url_dir,
                                         fl=remote_fname)
@@ -454,8 +446,14 @@ def start_download(args) -> int:
                     fp.write(conn.content)
                     conn.close()
                     remote_file_status += 0
-        else:
-            remote_file_status += 0
+            return remote_file_status
+
+        url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                          dr=url_dir,
+                                          fn=remote_fname)
+        remote_file_status += Get_remote_file(url_cache, remote_file,
+                                              __this.conf, download,
+                                              is_download)
 
         # ---------------- #
         # Download success #
@@ -515,7 +513,9 @@ def convert_data(args):
     Convert_hdf5_to_tiff(remote_file, temp_file_part,
                          data_variable)
 
-    data_raw = Open_tiff_array(temp_file_part)
+    points = Get_point_read(__this.conf)
+    data_raw = Open_tiff_array(temp_file_part, window=[y_id, x_id],
+                               points=points)
 
     # Convert meta data to float
     # if np.logical_or(isinstance(data_raw_missing, str),
@@ -526,8 +526,8 @@ def convert_data(args):
     # --------- #
     # Clip data #
     # --------- #
-    # get data to 2D matrix
-    data_tmp = data_raw[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+    # get data to 2D matrix, only the bbox window has been read
+    data_tmp = data_raw
 
     # check data type
     # filled numpy.ma.MaskedArray as numpy.ndarray
@@ -563,19 +563,18 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonlim[0], pixel_size, 0,
            latlim[1], 0, -pixel_size]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
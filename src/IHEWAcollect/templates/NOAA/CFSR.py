@@ -18,16 +18,18 @@ from netCDF4 import Dataset
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        Convert_grb2_to_nc, Save_as_tiff
+        Get_remote_file, \
+        Convert_grb2_to_nc, Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        Convert_grb2_to_nc, Save_as_tiff
+        Get_remote_file, \
+        Convert_grb2_to_nc, Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -322,24 +324,14 @@ def get_download_args(latlim, lonlim, date,
     # [w,s]--[e,s]
     #   |      |
     # [w,n]--[e,n]
-    y_id = np.array([
-        np.floor((latlim[0] - prod_lat_s) / prod_lat_size),
-        np.ceil((latlim[1] - prod_lat_s) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lat_w_shift) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lat_w_shift) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'], orient='s',
+                                 lon={'w': prod_lat_w_shift,
+                                      'e': prod_lat_w_shift + prod_lon_e - prod_lon_w,
+                                      'r': prod_lon_size})
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lon_size + prod_lat_w_shift),
-        (x_id[1] * prod_lon_size + prod_lat_w_shift)
-    ], dtype=np.float)
-    latlim = np.array([
-        (y_id[0] * prod_lat_size + prod_lat_s),
-        (y_id[1] * prod_lat_size + prod_lat_s)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,n]--[w,s]
     #   |      |
@@ -420,7 +412,8 @@ def start_download(args) -> int:
         # ------------- #
         # Download data #
         # ------------- #
-        if is_download:
+        def download():
+            remote_file_status = 0
             url = '{sr}{dr}{fn}'.format(sr=url_server,
                                         dr=url_dir,
                                         fn=remote_fname)
@@ -453,8 +446,14 @@ def start_download(args) -> int:
                     fp.write(conn.content)
                     conn.close()
                     remote_file_status += 0
-        else:
-            remote_file_status += 0
+            return remote_file_status
+
+        url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                          dr=url_dir,
+                                          fn=remote_fname)
+        remote_file_status += Get_remote_file(url_cache, remote_file,
+                                              __this.conf, download,
+                                              is_download)
 
         # ---------------- #
         # Download success #
@@ -516,7 +515,10 @@ def convert_data(args):
         Convert_grb2_to_nc(remote_file, temp_file_part, temp_file_band)
     # Generate temporary files
     data_variable = 'Band1'
-    data_sum = np.zeros([y_id[1] - y_id[0], x_id[1] - x_id[0]])
+    data_sum = np.zeros([y_id[1] - y_id[0], x_id[1] - x_id[0]],
+                        dtype=np.float32)
+    # columns of the window in the file, which starts at 0 degree
+    data_cols = (np.arange(x_id[0], x_id[1]) + int(pixel_w / 2)) % pixel_w
     for i in range(0, nparts):
         temp_file_part = temp_file.format(dtime=date, ipart=str(i + 1))
 
@@ -551,11 +553,9 @@ def convert_data(args):
         # Clip data #
         # --------- #
         # get data to 2D matrix
-        data_raw_tmp = np.zeros([pixel_h, pixel_w])
-        data_raw_tmp[:, 0:int(pixel_w / 2)] = data_raw[:, int(pixel_w / 2):pixel_w]
-        data_raw_tmp[:, int(pixel_w / 2):pixel_w] = data_raw[:, 0:int(pixel_w / 2)]
-
-        data_tmp = data_raw_tmp[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+        # read the rows of the window, then its columns shifted by 180 degree
+        data_raw.set_auto_maskandscale(False)
+        data_tmp = np.take(data_raw[y_id[0]:y_id[1], :], data_cols, axis=1)
         # data_tmp = np.squeeze(data_tmp, axis=0)
 
         # check data type
@@ -592,22 +592,24 @@ def convert_data(args):
         # ------- #
         # Convert #
         # ------- #
-        # scale, units
-        data = np.where(data == data_raw_missing, np.nan, data)
-        data = data * data_raw_scale * data_multiplier
-
-        # novalue data
-        data = np.where(np.isnan(data), data_ndv, data)
+        # scale, units, novalue data
+        data = Convert_nodata_scale(data,
+                                    missing=data_raw_missing,
+                                    scale=data_raw_scale,
+                                    multiplier=data_multiplier,
+                                    ndv=data_ndv)
 
-        data_sum = data_sum + data
+        data_sum += data
 
     # calculate the average
-    data = data_sum / float(nparts)
+    data = data_sum
+    data /= float(nparts)
 
     # Save as GTiff
     geo = [lonlim[0], pixel_size, 0,
            latlim[1], 0, -pixel_size]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
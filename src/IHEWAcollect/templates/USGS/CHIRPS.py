@@ -17,16 +17,20 @@ from joblib import Parallel, delayed
 # IHEWAcollect Modules
 try:
     from ..collect import \
-        Extract_Data_gz, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Get_archive_path, Open_tiff_array, Get_point_read, \
+        Save_as_output, Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
-        Extract_Data_gz, Open_tiff_array, Save_as_tiff
+        Get_remote_file, \
+        Get_archive_path, Open_tiff_array, Get_point_read, \
+        Save_as_output, Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -305,24 +309,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lon_size + prod_lon_w),
-        (x_id[1] * prod_lon_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (-y_id[1] * prod_lat_size + prod_lat_n),
-        (-y_id[0] * prod_lat_size + prod_lat_n)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
 
     # [w,s]--[e,s]
     #   |      |
@@ -415,7 +406,8 @@ def start_download(args) -> int:
         # ------------- #
         # Download data #
         # ------------- #
-        if is_download:
+        def download():
+            remote_file_status = 0
             url_parse = urlparse(url_server)
             url_host = url_parse.hostname
             # url_port = url_parse.port
@@ -450,13 +442,25 @@ def start_download(args) -> int:
                         fp.close()
                         remote_file_status += 0
                 except Exception as k:
+                    msg = 'Not able to download {fn}, from {sr}{dr}'.format(
+                        sr=url_server,
+                        dr=url_dir,
+                        fn=remote_fname)
                     # print('\33[91m{}\n{}\33[0m'.format(msg, str(k)))
                     __this.Log.write(datetime.datetime.now(),
                         msg='{}\n{}'.format(msg, str(k)))
+                    # not cached, nor converted
+                    remote_file_status += 1
                 finally:
                     conn.quit()
-        else:
-            remote_file_status += 0
+            return remote_file_status
+
+        url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                          dr=url_dir,
+                                          fn=remote_fname)
+        remote_file_status += Get_remote_file(url_cache, remote_file,
+                                              __this.conf, download,
+                                              is_download)
 
         # ---------------- #
         # Download success #
@@ -508,12 +512,10 @@ def convert_data(args):
     # --------- #
     # From downloaded remote file
 
-    # From generated temporary file
-    temp_file_part = temp_file.format(dtime=date)
-    # Generate temporary files
-    Extract_Data_gz(remote_file, temp_file_part)
-
-    data_raw = Open_tiff_array(temp_file_part)
+    # Read in place from the gz archive, no temporary file
+    points = Get_point_read(__this.conf)
+    data_raw = Open_tiff_array(Get_archive_path(remote_file),
+                               window=[y_id, x_id], points=points)
 
     # Convert meta data to float
     # if np.logical_or(isinstance(data_raw_missing, str),
@@ -524,8 +526,8 @@ def convert_data(args):
     # --------- #
     # Clip data #
     # --------- #
-    # get data to 2D matrix
-    data_tmp = data_raw[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+    # get data to 2D matrix, only the bbox window has been read
+    data_tmp = data_raw
 
     # check data type
     # filled numpy.ma.MaskedArray as numpy.ndarray
@@ -561,19 +563,19 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(data < 0, np.nan, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                valid_range=[0, np.inf],
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonlim[0], pixel_size, 0,
            latlim[1], 0, -pixel_size]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
@@ -22,25 +22,29 @@ from joblib import Parallel, delayed
 # IHEWAcollect Modules
 try:
     from ..collect import \
+        Get_remote_file, \
         Convert_hdf5_to_tiff, reproject_MODIS, Clip_Dataset_GDAL, Merge_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff, Merge_and_reproject_Dataset_GDAL,Convert_hdf5_to_tiff_merg_clip
+        Open_array_info, Open_tiff_array, Save_as_output, Merge_and_reproject_Dataset_GDAL,Convert_hdf5_to_tiff_merg_clip, \
+        Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
     from ..download_tiles_test import start_download_tiles, start_download_scan,Get_tiles_from_txt, \
-        Tiles_to_download
+        Tiles_to_download, Get_listing_dir
 except ImportError:
     from IHEWAcollect.templates.collect import \
+        Get_remote_file, \
         Convert_hdf5_to_tiff, reproject_MODIS, Clip_Dataset_GDAL, Merge_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff, Merge_and_reproject_Dataset_GDAL,Convert_hdf5_to_tiff_merg_clip
+        Open_array_info, Open_tiff_array, Save_as_output, Merge_and_reproject_Dataset_GDAL,Convert_hdf5_to_tiff_merg_clip, \
+        Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
     from IHEWAcollect.templates.download_tiles_test import start_download_tiles, start_download_scan, Get_tiles_from_txt, \
-        Tiles_to_download
+        Tiles_to_download, Get_listing_dir
 
 __this = sys.modules[__name__]
 
@@ -253,14 +257,8 @@ def product_details(latlim, lonlim, account, product)-> tuple:
     pixel_size = max(prod_lat_size, prod_lon_size)
 
     # Calculate arg_IDs
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
 
     return  product, \
@@ -378,7 +376,8 @@ def start_download(args) -> int:
                                                                    username, password,
                                                                    latlim, lonlim,
                                                                    remote_fname,
-                                                                   remote_file, save_list, current_path)
+                                                                   remote_file, save_list,
+                                                                   Get_listing_dir(current_conf))
         
         arg2 = [remote_fnames, remote_files]
         # print(remote_fnames)
@@ -400,9 +399,8 @@ def start_download(args) -> int:
             # ------------- #
             # Download data #
             # ------------- #
-            
-            
-            if is_download:
+            def download():
+                remote_file_status = 0
                 url = '{sr}{dr}{fl}'.format(sr=url_server,
                                             dr=url_dir,
                                             fl=remote_fnames[ifile])
@@ -430,8 +428,14 @@ def start_download(args) -> int:
                         fp.write(conn.content)
                         conn.close()
                         remote_file_status += 0
-            else:
-                remote_file_status += 0
+                return remote_file_status
+
+            url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                              dr=url_dir,
+                                              fn=remote_fnames[ifile])
+            remote_file_status += Get_remote_file(
+                url_cache, remote_files[ifile], __this.conf, download,
+                is_download)
           
         # ---------------- #
         # Download success #
@@ -601,19 +605,18 @@ def convert_data(args, arg2):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonmerge[0] - geo_trans[1] / 2., geo_trans[1], 0,
            latmerge[1] - geo_trans[5] / 2., 0, geo_trans[5]]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
     
     part_file_name = 'A{dtime:%Y%j}'.format(dtime=date)
     if current_conf['is_save_remote']:
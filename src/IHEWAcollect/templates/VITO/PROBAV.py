@@ -16,23 +16,32 @@ from bs4 import BeautifulSoup
 from joblib import Parallel, delayed
 from requests.auth import HTTPBasicAuth
 
+try:
+    from osgeo import gdal
+except ImportError:
+    import gdal
+
 # from netCDF4 import Dataset
 
 # IHEWAcollect Modules
 try:
     from ..collect import \
+        Get_remote_file, \
         Convert_hdf5_to_tiff, Clip_Dataset_GDAL, Merge_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff
+        Get_memory_path, Open_array_info, Open_tiff_array, Save_as_output, \
+        Convert_nodata_scale
 
-    from ..gis import GIS
+    from ..gis import GIS, GridSpec
     from ..dtime import Dtime
     from ..util import Log
 except ImportError:
     from IHEWAcollect.templates.collect import \
+        Get_remote_file, \
         Convert_hdf5_to_tiff, Clip_Dataset_GDAL, Merge_Dataset_GDAL, \
-        Open_array_info, Open_tiff_array, Save_as_tiff
+        Get_memory_path, Open_array_info, Open_tiff_array, Save_as_output, \
+        Convert_nodata_scale
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
     from IHEWAcollect.templates.dtime import Dtime
     from IHEWAcollect.templates.util import Log
 
@@ -311,24 +320,11 @@ def get_download_args(latlim, lonlim, date,
     # [w,n]--[e,n]
     #   |      |
     # [w,s]--[e,s]
-    y_id = np.array([
-        np.floor((prod_lat_n - latlim[1]) / prod_lat_size),
-        np.ceil((prod_lat_n - latlim[0]) / prod_lat_size)
-    ], dtype=np.int)
-    x_id = np.array([
-        np.floor((lonlim[0] - prod_lon_w) / prod_lon_size),
-        np.ceil((lonlim[1] - prod_lon_w) / prod_lon_size)
-    ], dtype=np.int)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 
     # Adjust the lon, lat limits based on the grids of the data
-    lonlim = np.array([
-        (x_id[0] * prod_lat_size + prod_lon_w),
-        (x_id[1] * prod_lat_size + prod_lon_w)
-    ], dtype=np.float)
-    latlim = np.array([
-        (prod_lat_n - y_id[1] * prod_lat_size),
-        (prod_lat_n - y_id[0] * prod_lat_size)
-    ], dtype=np.float)
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
     # [w,s]--[e,s]
     #   |      |
     # [w,n]--[e,n]
@@ -438,7 +434,8 @@ def start_download(args) -> int:
             # ------------- #
             # Download data #
             # ------------- #
-            if is_download:
+            def download():
+                remote_file_status = 0
                 url = '{sr}{dr}{fl}'.format(sr=url_server,
                                             dr=url_dir,
                                             fl=remote_fnames[ifile])
@@ -473,8 +470,14 @@ def start_download(args) -> int:
                         fp.write(conn.content)
                         conn.close()
                         remote_file_status += 0
-            else:
-                remote_file_status += 0
+                return remote_file_status
+
+            url_cache = '{sr}{dr}{fn}'.format(sr=url_server,
+                                              dr=url_dir,
+                                              fn=remote_fnames[ifile])
+            remote_file_status += Get_remote_file(
+                url_cache, remote_files[ifile], __this.conf, download,
+                is_download)
 
         # ---------------- #
         # Download success #
@@ -612,11 +615,11 @@ def convert_data(args):
     for ifile in range(len(remote_fnames)):
         # From downloaded remote file
 
-        # From generated temporary file
-        temp_file_part.append(
-            temp_file.format(dtime=date, ipart=str(ifile + 1)))
-        temp_file_part_4326.append(
-            temp_file.format(dtime=date, ipart='{}_4326'.format(str(ifile + 1))))
+        # From generated temporary file, kept in memory
+        temp_file_part.append(Get_memory_path(
+            temp_file.format(dtime=date, ipart=str(ifile + 1))))
+        temp_file_part_4326.append(Get_memory_path(
+            temp_file.format(dtime=date, ipart='{}_4326'.format(str(ifile + 1)))))
 
         # Generate temporary files
         geo = {
@@ -626,12 +629,13 @@ def convert_data(args):
         }
 
         Convert_hdf5_to_tiff(remote_files[ifile], temp_file_part_4326[ifile],
-                             data_variable, geo=geo)
+                             data_variable, geo=geo, dtype=None)
 
         # reproject_MODIS(temp_file_part[ifile], temp_file_part_4326[ifile], '4326')
 
         Clip_Dataset_GDAL(temp_file_part_4326[ifile], temp_file_part[ifile],
-                          latlim, lonlim)
+                          latlim, lonlim, dtype=None)
+        gdal.Unlink(temp_file_part_4326[ifile])
 
         # geo_trans, geo_proj, \
         #     size_x, size_y = Open_array_info(temp_file_part_4326[ifile])
@@ -654,6 +658,8 @@ def convert_data(args):
 
     temp_file_part_all = temp_file.format(dtime=date, ipart=0)
     Merge_Dataset_GDAL(temp_file_part, temp_file_part_all)
+    for temp_file_part_one in temp_file_part:
+        gdal.Unlink(temp_file_part_one)
 
     # get data to 2D matrix
     geo_trans, geo_proj, \
@@ -702,19 +708,18 @@ def convert_data(args):
     # ------- #
     # Convert #
     # ------- #
-    # scale, units
-    # data = np.where(data < 0, np.nan, data)
-    data = data * data_multiplier
-
-    # novalue data
-    data = np.where(np.isnan(data), data_ndv, data)
+    # scale, units, novalue data
+    data = Convert_nodata_scale(data,
+                                multiplier=data_multiplier,
+                                ndv=data_ndv)
 
     # ------------ #
     # Saveas GTiff #
     # ------------ #
     geo = [lonmerge[0] - geo_trans[1] / 5. * 4., geo_trans[1], 0,
            latmerge[1] - geo_trans[5] / 3. * 2., 0, geo_trans[5]]
-    Save_as_tiff(name=local_file, data=data, geo=geo, projection="WGS84")
+    Save_as_output(name=local_file, data=data, geo=geo, projection="WGS84",
+                   ndv=data_ndv, date=date, conf=__this.conf)
 
     if __this.conf['is_save_remote']:
         pass
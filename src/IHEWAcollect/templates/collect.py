@@ -1,24 +1,52 @@
 # -*- coding: utf-8 -*-
+import contextlib
+import datetime
 import glob
 import gzip
+import hashlib
+import json
 import os
+import re
+import shutil
 import subprocess
 import sys
 import tarfile
+import threading
 import time
+import warnings
 import zipfile
+from urllib.parse import urlsplit, urlunsplit
 
 import netCDF4
 import numpy as np
 import pandas as pd
+import pycurl
 import scipy.interpolate
+import scipy.ndimage
+from bs4 import BeautifulSoup
+from joblib import Parallel, delayed
 from pyproj import Proj, transform
 
 try:
     import gdal
+    import gdal_array
     import osr
 except ImportError:
-    from osgeo import gdal, osr
+    from osgeo import gdal, gdal_array, osr
+
+try:
+    from ..base.exception import IHEFileError, IHEGDALError, IHEKeyError, \
+        IHETypeError
+except ImportError:
+    from IHEWAcollect.base.exception import IHEFileError, IHEGDALError, \
+        IHEKeyError, IHETypeError
+
+try:
+    from .gis import GridSpec
+    from .util import Log
+except ImportError:
+    from IHEWAcollect.templates.gis import GridSpec
+    from IHEWAcollect.templates.util import Log
 
 
 def Convert_nc_to_tiff(input_nc, output_folder):
@@ -71,30 +99,19 @@ def Convert_nc_to_tiff(input_nc, output_folder):
 
 
 def Convert_grb2_to_nc(input_wgrib, output_nc, band, scale=1.0):
-    # Get environmental variable
-    # WA_env_paths = os.environ["GDAL_DRIVER"].split(';')
-    # GDAL_env_path = WA_env_paths[0]
-    # GDAL_TRANSLATE_PATH = os.path.join(GDAL_env_path, 'gdal_translate.exe')
-    GDAL_TRANSLATE_PATH = 'gdal_translate.exe'
-
-    # Create command
-    FullCmd = '{exe} ' \
-              '-a_scale {scale} ' \
-              '-of netcdf ' \
-              '-b {band} ' \
-              '"{file_i}" ' \
-              '"{file_o}"'.format(
-                  exe=GDAL_TRANSLATE_PATH,
-                  scale=scale,
-                  band=band,
-                  file_i=input_wgrib.replace('"', '""'),
-                  file_o=output_nc.replace('"', '""'))
-    # FullCmd = ' '.join(
-    #     [
-    #         '%s -of netcdf -b %d' % (GDAL_TRANSLATE_PATH, band),
-    #         input_wgrib, output_nc
-    #     ])  # -r {nearest}
-    Run_command_window(FullCmd)
+    """
+    This function converts one band of the grib2 file into a netcdf file
+
+    Keyword Arguments:
+    input_wgrib -- name, name of the grib2 file
+    output_nc -- name, name of the output nc file
+    band -- integer, band number of the grib2 file
+    scale -- float, scale factor written to the output metadata
+    """
+    Run_gdal_function(gdal.Translate, output_nc, input_wgrib,
+                      options=['-a_scale', str(scale)],
+                      format='netCDF',
+                      bandList=[int(band)])
 
     return ()
 
@@ -107,30 +124,14 @@ def Convert_adf_to_tiff(input_adf, output_tiff, scale=1.0):
     input_adf -- name, name of the adf file
     output_tiff -- Name of the output tiff file
     """
-    # Get environmental variable
-    # WA_env_paths = os.environ["GDAL_DRIVER"].split(';')
-    # GDAL_env_path = WA_env_paths[0]
-    # GDAL_TRANSLATE_PATH = os.path.join(GDAL_env_path, 'gdal_translate.exe')
-    GDAL_TRANSLATE_PATH = 'gdal_translate.exe'
-
     # convert data from ESRI GRID to GeoTIFF
-    FullCmd = '{exe} ' \
-              '-co COMPRESS=DEFLATE ' \
-              '-co PREDICTOR=1 ' \
-              '-co ZLEVEL=1 ' \
-              '-a_scale {scale} ' \
-              '-ot Float32 ' \
-              '-of GTiff ' \
-              '"{file_i}" ' \
-              '"{file_o}"'.format(
-                  exe=GDAL_TRANSLATE_PATH,
-                  scale=scale,
-                  file_i=input_adf.replace('"', '""'),
-                  file_o=output_tiff.replace('"', '""'))
-    # FullCmd = ('"%s" -co COMPRESS=DEFLATE -co PREDICTOR=1 -co '
-    #            'ZLEVEL=1 -of GTiff %s %s') % (
-    #           GDAL_TRANSLATE_PATH, input_adf, output_tiff)
-    Run_command_window(FullCmd)
+    Run_gdal_function(gdal.Translate, output_tiff, input_adf,
+                      options=['-a_scale', str(scale)],
+                      format='GTiff',
+                      outputType=gdal.GDT_Float32,
+                      creationOptions=['COMPRESS=DEFLATE',
+                                       'PREDICTOR=1',
+                                       'ZLEVEL=1'])
 
     return (output_tiff)
 
@@ -222,7 +223,8 @@ def Convert_bil_to_tiff(input_bil, output_tiff):
 #     return ()
 
 
-def Convert_hdf5_to_tiff(inputname_hdf, Filename_tiff_end, Band, scale=1.0, geo=None):
+def Convert_hdf5_to_tiff(inputname_hdf, Filename_tiff_end, Band, scale=1.0, geo=None,
+                         dtype=np.float32):
     """
     This function converts the hdf5 files into tiff files
 
@@ -233,6 +235,7 @@ def Convert_hdf5_to_tiff(inputname_hdf, Filename_tiff_end, Band, scale=1.0, geo=
     scaling_factor -- factor multipied by data is the output array
     geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
             pixelsize], (geospatial dataset)
+    dtype -- numpy dtype of the tiff, None for the hdf data type
     """
     # Open the hdf file
     g = gdal.Open(inputname_hdf, gdal.GA_ReadOnly)
@@ -251,39 +254,37 @@ def Convert_hdf5_to_tiff(inputname_hdf, Filename_tiff_end, Band, scale=1.0, geo=
                 # print(Band, g.GetSubDatasets()[i][0].split(':')[-1], Band_number)
 
     name_in = g.GetSubDatasets()[Band_number][0]
+    g = None
 
-    # Get environmental variable
-    # WA_env_paths = os.environ["GDAL_DRIVER"].split(';')
-    # GDAL_env_path = WA_env_paths[0]
-    # GDAL_TRANSLATE_PATH = os.path.join(GDAL_env_path, 'gdal_translate.exe')
-    GDAL_TRANSLATE_PATH = 'gdal_translate.exe'
-
-    # run gdal translate command
-    # os.path.join
-    FullCmd = '{exe} ' \
-              '-a_scale {scale} ' \
-              '-ot Float32 ' \
-              '-of GTiff ' \
-              '"{file_i}" ' \
-              '"{file_o}"'.format(
-                  exe=GDAL_TRANSLATE_PATH,
-                  scale=scale,
-                  file_i=name_in.replace('"', '""'),
-                  file_o=Filename_tiff_end.replace('"', '""'))
-    # FullCmd = '%s -of GTiff %s %s' % (GDAL_TRANSLATE_PATH, name_in, Filename_tiff_end)
-    Run_command_window(FullCmd)
+    # run gdal translate
+    kwargs = {}
+    if dtype is not None:
+        kwargs['outputType'] = gdal_array.NumericTypeCodeToGDALTypeCode(
+            np.dtype(dtype).type)
+    Run_gdal_function(gdal.Translate, Filename_tiff_end, name_in,
+                      options=['-a_scale', str(scale)],
+                      format='GTiff', **kwargs)
 
     if isinstance(geo, dict):
-        # Get the data array
-        dest = gdal.Open(Filename_tiff_end)
-        Data = dest.GetRasterBand(1).ReadAsArray()
-        dest = None
+        if geo['scaling_factor'] == 1.0:
+            # Set the georeference in place, the data is not changed
+            dest = gdal.Open(Filename_tiff_end, gdal.GA_Update)
+            srse = osr.SpatialReference()
+            srse.SetWellKnownGeogCS("WGS84")
+            dest.SetProjection(srse.ExportToWkt())
+            dest.SetGeoTransform(geo['transform'])
+            dest = None
+        else:
+            # Get the data array
+            dest = gdal.Open(Filename_tiff_end)
+            Data = dest.GetRasterBand(1).ReadAsArray().astype(np.float32)
+            dest = None
 
-        # If the band data is not SM change the DN values into PROBA-V values and write into the spectral_reflectance_PROBAV
-        Data_scaled = Data * geo['scaling_factor']
+            # If the band data is not SM change the DN values into PROBA-V values and write into the spectral_reflectance_PROBAV
+            Data *= geo['scaling_factor']
 
-        # Save the PROBA-V as a tif file
-        Save_as_tiff(Filename_tiff_end, Data_scaled, geo['transform'], "WGS84")
+            # Save the PROBA-V as a tif file
+            Save_as_tiff(Filename_tiff_end, Data, geo['transform'], "WGS84")
 
     return ()
 
@@ -300,22 +301,15 @@ def Convert_hdf5_to_tiff_merg_clip(inputname_hdf, Filename_tiff_end, Band, latli
     g = None
 
     for i, fin in enumerate(inputname_hdf):
-        fout = '/vsimem/fromhdf'+str(i)+'.tif'
         g = gdal.Open(fin, gdal.GA_ReadOnly)
 
         name_in = g.GetSubDatasets()[Band_number][0]
-        ds = gdal.Open(name_in, gdal.GA_ReadOnly)
-        gdal.Translate(fout, ds)
-        tifs_from_hdf.append(fout)
-        ds = None
+        tifs_from_hdf.append(name_in)
         g = None
 
-    # # ## Merge and reproject
-    gdal.Warp('/vsimem/merged.tif', tifs_from_hdf,  format="GTiff",
-        options="-overwrite -multi -wm 80% -t_srs EPSG:4326 -co TILED=YES -co BIGTIFF=YES -co COMPRESS=DEFLATE -co NUM_THREADS=ALL_CPUS")
-
-    # clip the merged raster
-    gdal.Translate(Filename_tiff_end, '/vsimem/merged.tif', projWin = [lonlim[0], latlim[1], lonlim[1], latlim[0]])
+    # # ## Merge, reproject and clip, chunk by chunk into the output
+    Merge_and_reproject_Dataset_GDAL(tifs_from_hdf, Filename_tiff_end, '4326',
+                                     latlim=latlim, lonlim=lonlim)
 
     return ()
 # def Convert_hdf5_to_tiff(inputname_hdf, Filename_tiff_end, Band, scale=1.0, geo=None):
@@ -409,7 +403,7 @@ def Convert_hdf5_to_tiff_merg_clip(inputname_hdf, Filename_tiff_end, Band, latli
 
     return ()
 
-def Extract_Data_zip(input_file, output_folder):
+def Extract_Data_zip(input_file, output_folder, member=None):
     """
     This function extract the zip files
 
@@ -417,10 +411,14 @@ def Extract_Data_zip(input_file, output_folder):
     output_file -- name, name of the file that must be unzipped
     output_folder -- Dir, directory where the unzipped data must be
                            stored
+    member -- name, only extract this file from the zip (default extracts all)
     """
     # extract the data
     z = zipfile.ZipFile(input_file, 'r')
-    z.extractall(output_folder)
+    if member is None:
+        z.extractall(output_folder)
+    else:
+        z.extract(member, output_folder)
     z.close()
 
 
@@ -443,7 +441,7 @@ def Extract_Data_gz(zip_filename, outfilename):
     # os.remove(zip_filename)
 
 
-def Extract_Data_tar_gz(zip_filename, output_folder):
+def Extract_Data_tar_gz(zip_filename, output_folder, member=None):
     """
     This function extract the tar.gz files
 
@@ -451,29 +449,415 @@ def Extract_Data_tar_gz(zip_filename, output_folder):
     zip_filename -- name, name of the file that must be unzipped
     output_folder -- Dir, directory where the unzipped data must be
                            stored
+    member -- name, only extract this file from the tar (default extracts all)
     """
 
     # os.chdir(output_folder)
     tar = tarfile.open(zip_filename, "r:gz")
-    tar.extractall(output_folder)
+    if member is None:
+        tar.extractall(output_folder)
+    else:
+        tar.extract(member, output_folder)
     tar.close()
 
 
-def Save_as_tiff(name, data, geo, projection):
+def Get_archive_path(input_file, member=''):
     """
-    This function save the array as a geotiff
+    This function returns the GDAL virtual file system path of a raster
+    inside a gz, zip or tar(.gz) archive. GDAL reads the raster in place,
+    so the archive does not need to be extracted to the temporary folder.
+
+    Keyword Arguments:
+    input_file -- name, name of the archive file
+    member -- name, path of the raster inside the archive (not used for gz)
+    """
+    name = input_file.lower()
+
+    if name.endswith('.zip'):
+        vsi = '/vsizip/'
+    elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+        vsi = '/vsitar/'
+    elif name.endswith('.gz'):
+        return '/vsigzip/{f}'.format(f=input_file)
+    else:
+        raise ValueError('Not supported archive "{f}"'.format(f=input_file))
+
+    return '{vsi}{f}/{m}'.format(vsi=vsi, f=input_file, m=member.lstrip('/'))
+
+
+def Convert_nodata_scale(data, missing=None, valid_range=None,
+                         scale=1.0, multiplier=1.0, ndv=None,
+                         dtype=np.float32, block_size=2 ** 20):
+    """
+    This function converts raw data to output data in one pass, block by
+    block. Fill value, valid range, scale factor, unit multiplier and output
+    nodata are applied together, so no full size temporary arrays are
+    created. The input array is reused as output if it has the output dtype.
+
+    Keyword Arguments:
+    data -- [array], raw data, 2D or 3D array
+    missing -- number, raw fill value, set to nodata
+    valid_range -- [min, max], raw values outside the range are set to nodata
+    scale -- number, scale factor of the raw data
+    multiplier -- number, unit multiplier
+    ndv -- number, output nodata value (default is np.nan)
+    dtype -- numpy dtype, output data type
+    block_size -- integer, number of pixels converted per block
+    """
+    # filled numpy.ma.MaskedArray as numpy.ndarray
+    if isinstance(data, np.ma.MaskedArray):
+        data = data.filled()
+    data = np.asarray(data)
+
+    dtype = np.dtype(dtype)
+    if ndv is None:
+        if not np.issubdtype(dtype, np.floating):
+            raise ValueError('ndv is required for dtype "{}"'.format(dtype))
+        ndv = np.nan
+
+    # working data type of the block
+    work_type = np.result_type(data.dtype, dtype, np.float32)
+    if not np.issubdtype(work_type, np.floating):
+        work_type = np.dtype(np.float64)
+
+    factor = float(scale) * float(multiplier)
+    if missing is not None:
+        missing = float(missing)
+    if valid_range is not None:
+        range_min = float(np.min(valid_range))
+        range_max = float(np.max(valid_range))
+
+    if data.dtype == dtype and data.flags.writeable:
+        data_out = data
+    else:
+        data_out = np.empty(data.shape, dtype=dtype)
+
+    # convert per block of rows
+    if data.ndim > 1:
+        row_size = int(np.prod(data.shape[1:]))
+    else:
+        row_size = 1
+    nrows = data.shape[0] if data.ndim > 0 else 1
+    block_rows = max(1, int(block_size // max(row_size, 1)))
+
+    for row_s in range(0, nrows, block_rows):
+        row_e = min(row_s + block_rows, nrows)
+        if data.ndim > 0:
+            block = np.array(data[row_s:row_e], dtype=work_type)
+        else:
+            block = np.array(data, dtype=work_type)
+
+        # nodata mask, on raw values
+        mask = np.isnan(block)
+        if missing is not None:
+            mask |= block == missing
+        if valid_range is not None:
+            mask |= block < range_min
+            mask |= block > range_max
+
+        # scale, units
+        if factor != 1.0:
+            block *= factor
+
+        # novalue data
+        block[mask] = ndv
+
+        if data.ndim > 0:
+            data_out[row_s:row_e] = block
+        else:
+            data_out[...] = block
+
+    return data_out
+
+
+# GeoTIFF creation profiles of Save_as_tiff
+# dtype -- output data type, integer types store (data - offset) / scale
+# scale, offset -- band scale and offset metadata of integer output
+# tiled, blocksize -- tiled blocks, [x, y] size in pixels
+# compress, level -- compression method and level
+# predictor -- True, 1, 2 or 3, True selects 3 for float and 2 for integer
+# threads -- NUM_THREADS of compression, integer or "ALL_CPUS"
+# bigtiff -- "YES", "NO", "IF_NEEDED" or "IF_SAFER"
+# options -- list of extra GDAL creation options
+# cog -- Cloud Optimized GeoTIFF, overviews stored in front of the data
+# overviews -- list of overview factors, or "AUTO" down to one block
+# resampling -- overview resampling, "NEAREST", "AVERAGE", "MODE", ...
+TIFF_PROFILES = {
+    'default': {
+        'dtype': 'float32',
+        'scale': 1.0,
+        'offset': 0.0,
+        'tiled': False,
+        'blocksize': [256, 256],
+        'compress': 'LZW',
+        'level': None,
+        'predictor': False,
+        'threads': None,
+        'bigtiff': None,
+        'options': [],
+        'cog': False,
+        'overviews': 'AUTO',
+        'resampling': 'AVERAGE'
+    },
+    'tiled': {
+        'tiled': True,
+        'compress': 'LZW',
+        'predictor': True,
+        'threads': 'ALL_CPUS',
+        'bigtiff': 'IF_SAFER'
+    },
+    'deflate': {
+        'tiled': True,
+        'compress': 'DEFLATE',
+        'level': 6,
+        'predictor': True,
+        'threads': 'ALL_CPUS',
+        'bigtiff': 'IF_SAFER'
+    },
+    'zstd': {
+        'tiled': True,
+        'compress': 'ZSTD',
+        'level': 9,
+        'predictor': True,
+        'threads': 'ALL_CPUS',
+        'bigtiff': 'IF_SAFER'
+    },
+    'cog': {
+        'tiled': True,
+        'blocksize': [512, 512],
+        'compress': 'DEFLATE',
+        'level': 6,
+        'predictor': True,
+        'threads': 'ALL_CPUS',
+        'bigtiff': 'IF_SAFER',
+        'cog': True
+    }
+}
+
+
+def Get_tiff_profile(profile=None) -> dict:
+    """
+    This function returns the full GeoTIFF creation profile. A profile is
+    the name of a profile in TIFF_PROFILES, or a dictionary that updates the
+    profile named by its "profile" key ("default" if not given).
+
+    Keyword Arguments:
+    profile -- string or dictionary, creation profile
+    """
+    conf = dict(TIFF_PROFILES['default'])
+
+    if profile is None or profile == '':
+        return conf
+
+    if isinstance(profile, str):
+        profile = {'profile': profile}
+    if not isinstance(profile, dict):
+        raise IHETypeError('profile', dict, profile) from None
+
+    name = profile.get('profile', 'default')
+    if name not in TIFF_PROFILES:
+        raise IHEKeyError(name, list(TIFF_PROFILES.keys())) from None
+
+    conf.update(TIFF_PROFILES[name])
+    conf.update({key: value for key, value in profile.items()
+                 if key != 'profile'})
+    return conf
+
+
+DTYPE_POLICY = {
+    'ubyte': 'int16',
+    'uint8': 'int16',
+    'int8': 'int16',
+    'int16': 'int16',
+    'uint16': 'int32',
+    'int32': 'int32'
+}
+
+
+def Get_dtype_policy(data_conf, ndv=-9999) -> dict:
+    """
+    This function returns the storage data type of a product variable from
+    its catalog "dtype" and "units" entries. Integer local or remote data is
+    stored as native integers, with the catalog multiplier as scale, in the
+    smallest signed type of DTYPE_POLICY that holds the data and ndv.
+    Everything else is stored as float32.
+
+    Keyword Arguments:
+    data_conf -- dictionary, product variable, conf['product']['data']
+    ndv -- number, nodata value
+
+    Returns:
+    policy -- dictionary, {'dtype':, 'scale':, 'offset':}
+    """
+    policy = {'dtype': 'float32', 'scale': 1.0, 'offset': 0.0}
+
+    dtypes = data_conf.get('dtype') or {}
+    units = data_conf.get('units') or {}
+    try:
+        multiplier = float(units.get('m', 1.0))
+    except (TypeError, ValueError):
+        return policy
+
+    if dtypes.get('l') in DTYPE_POLICY:
+        dtype, scale = DTYPE_POLICY[dtypes['l']], 1.0
+    elif dtypes.get('r') in DTYPE_POLICY:
+        dtype, scale = DTYPE_POLICY[dtypes['r']], multiplier
+    else:
+        return policy
+
+    dtype_info = np.iinfo(dtype)
+    if scale == 0.0 or not np.isfinite(scale) or ndv is None or \
+            not dtype_info.min <= ndv <= dtype_info.max:
+        return policy
+
+    policy.update({'dtype': dtype, 'scale': scale, 'offset': 0.0})
+    return policy
+
+
+def Get_output_profile(ndv, conf) -> dict:
+    """
+    This function returns the GeoTIFF creation profile of a product. With
+    conf['output']['dtype'] "native" and a float profile, the profile takes
+    the integer type and scale of Get_dtype_policy. The policy only depends
+    on the catalog and ndv, so every date of a series has the same type.
+    Values out of the range of the type are saved as ndv, values finer
+    than the scale are rounded, both with a warning, see Pack_integer.
+
+    Keyword Arguments:
+    ndv -- number, nodata value of data
+    conf -- dictionary, download configuration
+    """
+    profile = Get_tiff_profile(conf['output']['tiff'])
+    if conf['output'].get('dtype') != 'native' or \
+            np.dtype(profile['dtype']).kind != 'f':
+        return profile
+
+    profile.update(Get_dtype_policy(conf['product']['data'], ndv))
+    return profile
+
+
+def Get_tiff_options(conf, dtype=np.float32) -> list:
+    """
+    This function returns the GDAL GTiff creation options of a profile
+
+    Keyword Arguments:
+    conf -- dictionary, creation profile from Get_tiff_profile
+    dtype -- numpy dtype, output data type
+    """
+    options = []
+
+    if conf['tiled']:
+        options += ['TILED=YES',
+                    'BLOCKXSIZE={}'.format(int(conf['blocksize'][0])),
+                    'BLOCKYSIZE={}'.format(int(conf['blocksize'][1]))]
+
+    compress = str(conf['compress']).upper() if conf['compress'] else 'NONE'
+    options.append('COMPRESS={}'.format(compress))
+
+    level_keys = {
+        'DEFLATE': 'ZLEVEL',
+        'ZSTD': 'ZSTD_LEVEL',
+        'LZMA': 'LZMA_PRESET',
+        'JPEG': 'JPEG_QUALITY'
+    }
+    if conf['level'] is not None and compress in level_keys:
+        options.append('{k}={v}'.format(k=level_keys[compress],
+                                        v=int(conf['level'])))
+
+    if conf['predictor'] and compress in ['LZW', 'DEFLATE', 'ZSTD']:
+        if conf['predictor'] is True:
+            if np.issubdtype(np.dtype(dtype), np.floating):
+                predictor = 3
+            else:
+                predictor = 2
+        else:
+            predictor = int(conf['predictor'])
+        options.append('PREDICTOR={}'.format(predictor))
+
+    if conf['threads']:
+        options.append('NUM_THREADS={}'.format(conf['threads']))
+
+    if conf['bigtiff']:
+        options.append('BIGTIFF={}'.format(str(conf['bigtiff']).upper()))
+
+    if conf['cog']:
+        if not conf['tiled']:
+            options.append('TILED=YES')
+        options.append('COPY_SRC_OVERVIEWS=YES')
+
+    options += list(conf['options'])
+    return options
+
+
+def Get_overview_levels(conf, xsize, ysize) -> list:
+    """
+    This function returns the overview factors of a profile. "AUTO" halves
+    the raster until it fits in one block.
+
+    Keyword Arguments:
+    conf -- dictionary, creation profile from Get_tiff_profile
+    xsize -- integer, raster width
+    ysize -- integer, raster height
+    """
+    if conf['overviews'] is None:
+        return []
+
+    if isinstance(conf['overviews'], str):
+        if conf['overviews'].upper() != 'AUTO':
+            raise IHEKeyError(conf['overviews'], ['AUTO']) from None
+
+        levels = []
+        factor = 2
+        block = min(int(conf['blocksize'][0]), int(conf['blocksize'][1]))
+        while max(xsize, ysize) / (factor / 2) > block:
+            levels.append(factor)
+            factor *= 2
+        return levels
+
+    return sorted(int(factor) for factor in conf['overviews']
+                  if int(factor) > 1)
+
+
+def Save_as_COG(name, dataset, profile='cog'):
+    """
+    This function saves a gdal dataset as a Cloud Optimized GeoTIFF, tiled,
+    with internal overviews stored in front of the full resolution data
 
     Keyword arguments:
     name -- string, directory name
-    data -- [array], dataset of the geotiff
-    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
-            pixelsize], (geospatial dataset)
-    projection -- integer, the EPSG code
+    dataset -- gdal dataset, e.g. from Save_as_MEM, overviews are added to it
+    profile -- string or dictionary, creation profile, see Get_tiff_profile
     """
-    # save as a geotiff
+    conf = Get_tiff_profile(profile)
+    conf['cog'] = True
+    dtype = gdal.GetDataTypeName(dataset.GetRasterBand(1).DataType)
+
+    levels = Get_overview_levels(conf,
+                                 dataset.RasterXSize, dataset.RasterYSize)
+    if len(levels) > 0:
+        if dataset.BuildOverviews(str(conf['resampling']).upper(),
+                                  levels) != 0:
+            raise IHEGDALError('BuildOverviews', name,
+                               gdal.GetLastErrorMsg()) from None
+
     driver = gdal.GetDriverByName("GTiff")
-    dst_ds = driver.Create(name, int(data.shape[1]), int(data.shape[0]), 1,
-                           gdal.GDT_Float32, ['COMPRESS=LZW'])
+    dst_ds = driver.CreateCopy(name, dataset, 0,
+                               Get_tiff_options(conf, dtype.lower()))
+    if dst_ds is None:
+        raise IHEGDALError('CreateCopy', name,
+                           gdal.GetLastErrorMsg()) from None
+    dst_ds = None
+    return ()
+
+
+def Get_spatial_reference(projection):
+    """
+    This function returns the osr.SpatialReference of a projection
+
+    Keyword arguments:
+    projection -- string or integer, "WGS84", the EPSG code or WKT,
+                  WGS84 if ''
+    """
     srse = osr.SpatialReference()
     if projection == '':
         srse.SetWellKnownGeogCS("WGS84")
@@ -492,11 +876,142 @@ def Save_as_tiff(name, data, geo, projection):
                 srse.ImportFromEPSG(int(projection))
             except:
                 srse.ImportFromWkt(projection)
+    return srse
+
+
+def Pack_integer(data, dtype, scale=1.0, offset=0.0, ndv=-9999) -> tuple:
+    """
+    This function packs an array as integers, (data - offset) / scale
+    rounded to the nearest integer. NaN and ndv are packed as ndv, values
+    out of the range of dtype too, instead of being clipped to its limits.
+
+    Keyword arguments:
+    data -- [array], data to pack
+    dtype -- numpy dtype, integer output data type, holds ndv
+    scale -- number, scale of the packed integers
+    offset -- number, offset of the packed integers
+    ndv -- number, nodata value of data and of the output
+
+    Returns:
+    packed -- [array], packed data of dtype
+    count_range -- integer, number of values out of range, set to ndv
+    count_round -- integer, number of values rounded by more than 0.1 %
+                   of the scale and the float precision of data
+    """
+    dtype = np.dtype(dtype)
+    dtype_info = np.iinfo(dtype)
+
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.floating):
+        eps = 2.0 * float(np.finfo(data.dtype).eps)
+    else:
+        eps = 0.0
+    block = np.array(data, dtype=np.float64)
+    mask = np.isnan(block) | (block == ndv)
+
+    block -= offset
+    block /= scale
+    packed = np.rint(block)
+    error = np.abs(packed - block)
+    error[mask] = 0.0
+    count_round = int(np.count_nonzero(error > 1e-3 + eps * np.abs(block)))
+
+    outside = (packed < dtype_info.min) | (packed > dtype_info.max)
+    outside &= ~mask
+    count_range = int(np.count_nonzero(outside))
+
+    packed[mask | outside] = ndv
+    return packed.astype(dtype), count_range, count_round
+
+
+def Save_as_tiff(name, data, geo, projection, ndv=-9999, profile=None):
+    """
+    This function save the array as a geotiff
+
+    Keyword arguments:
+    name -- string, directory name
+    data -- [array], dataset of the geotiff
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    projection -- integer, the EPSG code
+    ndv -- number, nodata value of data and of the geotiff
+    profile -- string or dictionary, creation profile, see Get_tiff_profile
+    """
+    gdal_types = {
+        'uint8': gdal.GDT_Byte,
+        'uint16': gdal.GDT_UInt16,
+        'int16': gdal.GDT_Int16,
+        'uint32': gdal.GDT_UInt32,
+        'int32': gdal.GDT_Int32,
+        'float32': gdal.GDT_Float32,
+        'float64': gdal.GDT_Float64
+    }
+
+    conf = Get_tiff_profile(profile)
+    dtype = np.dtype(conf['dtype'])
+    if dtype.name not in gdal_types:
+        raise IHEKeyError(dtype.name, list(gdal_types.keys())) from None
+
+    is_int = np.issubdtype(dtype, np.integer)
+    scale = float(conf['scale'])
+    offset = float(conf['offset'])
+    if is_int:
+        dtype_info = np.iinfo(dtype)
+        if ndv is None or np.isnan(ndv) or \
+                not dtype_info.min <= ndv <= dtype_info.max:
+            raise ValueError('ndv "{v}" out of range of dtype "{t}"'.format(
+                v=ndv, t=dtype.name))
 
+    # save as a geotiff
+    if conf['cog']:
+        # build in memory, then copy with overviews to the cog
+        driver = gdal.GetDriverByName("MEM")
+        dst_ds = driver.Create('', int(data.shape[1]), int(data.shape[0]), 1,
+                               gdal_types[dtype.name])
+    else:
+        driver = gdal.GetDriverByName("GTiff")
+        dst_ds = driver.Create(name, int(data.shape[1]), int(data.shape[0]),
+                               1, gdal_types[dtype.name],
+                               Get_tiff_options(conf, dtype))
+    srse = Get_spatial_reference(projection)
     dst_ds.SetProjection(srse.ExportToWkt())
-    dst_ds.GetRasterBand(1).SetNoDataValue(-9999)
     dst_ds.SetGeoTransform(geo)
-    dst_ds.GetRasterBand(1).WriteArray(data)
+
+    band = dst_ds.GetRasterBand(1)
+    if ndv is not None:
+        band.SetNoDataValue(ndv)
+
+    if is_int:
+        band.SetScale(scale)
+        band.SetOffset(offset)
+
+        # pack per block of rows, nodata stays nodata
+        if conf['tiled']:
+            block_rows = int(conf['blocksize'][1])
+        else:
+            block_rows = max(1, 2 ** 20 // max(int(data.shape[1]), 1))
+        count_range, count_round = 0, 0
+        for row_s in range(0, int(data.shape[0]), block_rows):
+            block, count_block_range, count_block_round = Pack_integer(
+                data[row_s:row_s + block_rows], dtype, scale, offset, ndv)
+            count_range += count_block_range
+            count_round += count_block_round
+
+            band.WriteArray(block, 0, row_s)
+
+        if count_range > 0:
+            warnings.warn('"{f}" {n} values out of range of "{t}" with scale '
+                          '{s}, saved as nodata'.format(
+                              f=name, n=count_range, t=dtype.name, s=scale))
+        if count_round > 0:
+            warnings.warn('"{f}" {n} values rounded to scale {s}'.format(
+                f=name, n=count_round, s=scale))
+    else:
+        band.WriteArray(data)
+
+    band = None
+    if conf['cog']:
+        Save_as_COG(name, dst_ds, conf)
     dst_ds = None
     return ()
 
@@ -617,18 +1132,1246 @@ def Save_as_NC(namenc, DataCube, Var, Reference_filename, Startdate='', Enddate=
         preco.grid_mapping = 'crs'
         preco.set_auto_maskandscale(False)
 
-        # Set the lat/lon variable
-        lono[:] = lon
-        lato[:] = lat
+        # Set the lat/lon variable
+        lono[:] = lon
+        lato[:] = lat
+
+        # Set the data variable
+        if Startdate != '':
+            for i in range(len(Dates)):
+                preco[i, :, :] = DataCube[i, :, :] * 1. / np.float(Scaling_factor)
+        else:
+            preco[:, :] = DataCube[:, :] * 1. / np.float(Scaling_factor)
+
+        nco.close()
+    return ()
+
+
+@contextlib.contextmanager
+def File_lock(name, timeout=600):
+    """
+    This function locks a file for parallel writers with the "name.lock"
+    file. The writer touches the lock every timeout / 4 seconds while it
+    holds it, so a lock that is older than timeout seconds is left by a
+    killed writer and is removed
+
+    Keyword arguments:
+    name -- string, complete path of the locked file
+    timeout -- number, seconds since the last touch before a lock is stale
+    """
+    lock = '{}.lock'.format(name)
+    while True:
+        try:
+            lock_fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            pass
+
+        # stale lock, left by a killed writer
+        try:
+            if time.time() - os.stat(lock).st_mtime > timeout:
+                os.remove(lock)
+                continue
+        except FileNotFoundError:
+            # released meanwhile
+            continue
+        time.sleep(0.1)
+
+    # keep the lock fresh while it is held
+    is_held = threading.Event()
+
+    def touch():
+        while not is_held.wait(timeout / 4.0):
+            try:
+                os.utime(lock)
+            except FileNotFoundError:
+                pass
+
+    toucher = threading.Thread(target=touch, daemon=True)
+    toucher.start()
+    try:
+        yield lock
+    finally:
+        is_held.set()
+        toucher.join()
+        os.close(lock_fd)
+        os.remove(lock)
+
+
+def Get_cache_url(url):
+    """
+    This function returns the canonical url of a remote file, the key of the
+    shared raw-download cache: lower case scheme and host, no user
+    information, no repeated slashes in the path
+
+    Keyword arguments:
+    url -- string, url of the remote file
+    """
+    url = urlsplit(url)
+    host = url.hostname if url.hostname is not None else ''
+    if url.port is not None:
+        host = '{h}:{p}'.format(h=host, p=url.port)
+    path = '/'.join(part for part in url.path.split('/') if part != '')
+    if url.path.startswith('/') or url.scheme != '':
+        path = '/' + path
+    return urlunsplit((url.scheme.lower(), host.lower(), path, url.query, ''))
+
+
+def Get_cache_index(cache):
+    """
+    This function reads the index of the shared raw-download cache,
+    {url: {'hash':, 'size':, 'atime':}}, the files are stored by content
+    hash in cache['path']/ab/abcdef..., call it under File_lock
+
+    Keyword arguments:
+    cache -- dict, {'path':, 'size':}, see Download
+    """
+    name = os.path.join(cache['path'], 'index.json')
+    if not os.path.exists(name):
+        return {}
+    try:
+        with open(name, 'r') as fp:
+            return json.load(fp)
+    except ValueError:
+        # index of a killed writer, the files are found again by later runs
+        return {}
+
+
+def Save_cache_index(cache, index):
+    """
+    This function writes the index of the shared raw-download cache, and
+    removes the least recently used files until the cache is within
+    cache['size'] bytes, call it under File_lock
+
+    Keyword arguments:
+    cache -- dict, {'path':, 'size':}, see Download
+    index -- dict, {url: {'hash':, 'size':, 'atime':}}
+    """
+    # a file shared by urls is used when any of them is
+    blobs = {}
+    for url, entry in index.items():
+        blob = blobs.setdefault(entry['hash'], {'size': entry['size'],
+                                                'atime': 0.0,
+                                                'urls': []})
+        blob['atime'] = max(blob['atime'], entry['atime'])
+        blob['urls'].append(url)
+
+    size = sum(blob['size'] for blob in blobs.values())
+    for key in sorted(blobs.keys(), key=lambda k: blobs[k]['atime']):
+        if size <= cache['size']:
+            break
+        try:
+            os.remove(os.path.join(cache['path'], key[:2], key))
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # open by a reader on Windows, evicted by a later writer
+            continue
+        for url in blobs[key]['urls']:
+            index.pop(url)
+        size -= blobs[key]['size']
+
+    name = os.path.join(cache['path'], 'index.json')
+    name_tmp = '{n}.{p}'.format(n=name, p=os.getpid())
+    with open(name_tmp, 'w') as fp:
+        json.dump(index, fp)
+    os.replace(name_tmp, name)
+
+
+def Get_cache_file(url, file, cache):
+    """
+    This function copies a remote file from the shared raw-download cache,
+    so workspaces, basins and variables that need the same file go to the
+    network once. It returns True if the file was in the cache
+
+    Keyword arguments:
+    url -- string, url of the remote file
+    file -- string, complete path of the remote file in the workspace
+    cache -- dict, {'path':, 'size':}, see Download, None to not cache
+    """
+    if cache is None:
+        return False
+
+    url = Get_cache_url(url)
+    with File_lock(os.path.join(cache['path'], 'index.json')):
+        index = Get_cache_index(cache)
+        if url not in index.keys():
+            return False
+
+        entry = index[url]
+        blob = os.path.join(cache['path'], entry['hash'][:2], entry['hash'])
+        try:
+            # the open file is kept by an eviction while copying
+            fp_blob = open(blob, 'rb')
+        except FileNotFoundError:
+            fp_blob = None
+        if fp_blob is None or \
+                os.fstat(fp_blob.fileno()).st_size != entry['size']:
+            if fp_blob is not None:
+                fp_blob.close()
+            index.pop(url)
+            Save_cache_index(cache, index)
+            return False
+
+        entry['atime'] = time.time()
+        Save_cache_index(cache, index)
+
+    # copied outside of the lock, other workers use the cache meanwhile
+    file_tmp = '{n}.{p}'.format(n=file, p=os.getpid())
+    with fp_blob, open(file_tmp, 'wb') as fp:
+        shutil.copyfileobj(fp_blob, fp, 1024 * 1024)
+    os.replace(file_tmp, file)
+    return True
+
+
+def Put_cache_file(url, file, cache):
+    """
+    This function stores a downloaded remote file in the shared raw-download
+    cache, by the sha256 of its content, and evicts the least recently used
+    files above cache['size'] bytes
+
+    Keyword arguments:
+    url -- string, url of the remote file
+    file -- string, complete path of the remote file in the workspace
+    cache -- dict, {'path':, 'size':}, see Download, None to not cache
+    """
+    if cache is None or not os.path.exists(file):
+        return
+    size = os.stat(file).st_size
+    if size == 0 or size > cache['size']:
+        return
+
+    url = Get_cache_url(url)
+    with File_lock(os.path.join(cache['path'], 'index.json')):
+        index = Get_cache_index(cache)
+        if url in index.keys():
+            entry = index[url]
+            blob = os.path.join(cache['path'], entry['hash'][:2], entry['hash'])
+            if os.path.exists(blob) and entry['size'] == size:
+                # copied by Get_cache_file
+                entry['atime'] = time.time()
+                Save_cache_index(cache, index)
+                return
+
+    sha = hashlib.sha256()
+    with open(file, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            sha.update(chunk)
+    key = sha.hexdigest()
+
+    blob = os.path.join(cache['path'], key[:2], key)
+    if not os.path.exists(blob):
+        if not os.path.exists(os.path.dirname(blob)):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+        blob_tmp = '{n}.{p}'.format(n=blob, p=os.getpid())
+        shutil.copyfile(file, blob_tmp)
+        os.replace(blob_tmp, blob)
+
+    with File_lock(os.path.join(cache['path'], 'index.json')):
+        index = Get_cache_index(cache)
+        index[url] = {'hash': key, 'size': size, 'atime': time.time()}
+        Save_cache_index(cache, index)
+
+
+def Get_remote_file(url, file, conf, download, is_download=True) -> int:
+    """
+    This function gets a remote file through the shared raw-download cache.
+    The file is copied from the cache if it holds url, else it is saved by
+    download. A downloaded or existing file is stored in the cache. It
+    returns the status of download, 0 if the file is there
+
+    Keyword arguments:
+    url -- string, url of the remote file
+    file -- string, complete path of the remote file in the workspace
+    conf -- dictionary, download configuration, conf['cache'] is None to
+            not cache
+    download -- function, saves file and returns 0, or 1 if it failed
+    is_download -- boolean, False if file already exists
+    """
+    status = 0
+    if is_download:
+        if Get_cache_file(url, file, conf['cache']):
+            msg = 'Cached "{f}"'.format(f=file)
+            Log(conf['log']).write(datetime.datetime.now(), msg=msg)
+            return status
+
+        status = download()
+
+    if status == 0:
+        Put_cache_file(url, file, conf['cache'])
+    return status
+
+
+def Get_listing_intervals(file, url='', username='', password='') -> tuple:
+    """
+    This function returns the time intervals of the files of a GRACE
+    listing, the html index of the GeoTIFFs "GRD-3_{%Y%j}-{%Y%j}_*.tif" on
+    the server, as start and end dates sorted by start. The listing is
+    downloaded to file first if url is given. A download calls it once, see
+    Group_listing_dates.
+
+    Keyword arguments:
+    file -- string, complete path of the listing with .html extension
+    url -- string, url of the listing, '' to use the saved file
+    username -- string, user name of url
+    password -- string, password of url
+
+    Returns:
+    dates_s -- pandas.DatetimeIndex, start date of every file
+    dates_e -- pandas.DatetimeIndex, end date of every file
+    """
+    if url != '':
+        with open(file, 'wb') as fp:
+            conn = pycurl.Curl()
+            conn.setopt(conn.URL, url)
+            conn.setopt(conn.USERPWD, '%s:%s' % (username, password))
+            conn.setopt(conn.WRITEDATA, fp)
+            conn.perform()
+            conn.close()
+
+    with open(file, 'r', encoding='UTF8') as conn:
+        soup = BeautifulSoup(conn, "html.parser")
+
+    dates_s = []
+    dates_e = []
+    for ele in soup.findAll('a', attrs={'href': re.compile('(?i)(tif)$')}):
+        fname = ele['href'].split('/')[-1]
+        dates_s.append(fname.split('-')[1][2:])
+        dates_e.append(fname.split('-')[2][:7])
+    dates_s = pd.to_datetime(dates_s, format='%Y%j')
+    dates_e = pd.to_datetime(dates_e, format='%Y%j')
+
+    order = np.argsort(dates_s.values, kind='stable')
+    return dates_s[order], dates_e[order]
+
+
+def Get_listing_ctime(intervals, date) -> list:
+    """
+    This function returns the file time, [start, end], of the file covering
+    a date, [] if no file covers it. Intervals may overlap, every file
+    starting on or before the date is checked, and the one starting last is
+    taken.
+
+    Keyword arguments:
+    intervals -- (dates_s, dates_e) of Get_listing_intervals
+    date -- pandas.Timestamp, date
+    """
+    dates_s, dates_e = intervals
+
+    # files starting on or before the date
+    i = dates_s.searchsorted(date, side='right')
+    covers = np.flatnonzero(dates_e[:i] >= date)
+    if covers.size > 0:
+        return [dates_s[covers[-1]], dates_e[covers[-1]]]
+    return []
+
+
+def Group_listing_dates(intervals, dates) -> dict:
+    """
+    This function groups dates by the file covering them, so a file is
+    downloaded and read once for all its dates.
+
+    Keyword arguments:
+    intervals -- (dates_s, dates_e) of Get_listing_intervals
+    dates -- list of pandas.Timestamp
+
+    Returns:
+    groups -- dictionary, {(start, end): [index of date, ...]}, () for the
+              dates without file
+    """
+    groups = {}
+    for i, date in enumerate(dates):
+        ctime = Get_listing_ctime(intervals, date)
+        groups.setdefault(tuple(ctime), []).append(i)
+    return groups
+
+
+def Save_as_NC_slice(namenc, data, geo, date, Var, ndv=-9999,
+                     projection='WGS84', chunks=(32, 64, 64), complevel=4,
+                     dtype='f4'):
+    """
+    This function writes one date of a 2D array to a chunked, compressed
+    time x y x x netcdf cube. The cube is created by the first slice, later
+    slices are appended to the unlimited time dimension, so the cube is
+    never held in memory. Slices are never moved: the time axis is in the
+    order of writing, which is the date order when the dates arrive in
+    order, and the "time_order" variable holds the indices of the slices
+    sorted by date, e.g. cube[time_order[:]]. A slice of an existing date
+    is overwritten. The cube has latitude/longitude
+    coordinates in a geographic projection, y/x coordinates otherwise, and
+    the WKT of the projection in the crs variable. Parallel writers wait
+    for the "namenc.lock" file.
+
+    Keyword arguments:
+    namenc -- string, complete path of the output file with .nc extension
+    data -- [array], 2D data of the date, same size as the cube
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    date -- pandas.Timestamp or datetime, date of the slice
+    Var -- string, the name of the variable
+    ndv -- number, nodata value of data and of the cube
+    projection -- string or integer, projection of the cube, see
+                  Get_spatial_reference
+    chunks -- (time, y, x) chunk sizes
+    complevel -- integer, zlib compression level
+    dtype -- string, netcdf data type of the variable
+    """
+    # Import modules
+    from netCDF4 import Dataset, date2num
+
+    time_units = 'days since 1900-01-01 00:00:00'
+    time_value = date2num(pd.Timestamp(date).to_pydatetime(), time_units,
+                          calendar='standard')
+    size_Y, size_X = int(data.shape[0]), int(data.shape[1])
+
+    with File_lock(namenc):
+        if not os.path.exists(namenc):
+            srse = Get_spatial_reference(projection)
+
+            # Create the y/x rasters
+            x = np.arange(size_X) * geo[1] + geo[0] + 0.5 * geo[1]
+            y = np.arange(size_Y) * geo[5] + geo[3] + 0.5 * geo[5]
+
+            # Create the nc file
+            nco = Dataset(namenc, 'w', format='NETCDF4')
+            nco.description = '%s data' % Var
+
+            # Create dimensions, variables and attributes:
+            if srse.IsGeographic():
+                name_y, name_x = 'latitude', 'longitude'
+            else:
+                name_y, name_x = 'y', 'x'
+            nco.createDimension('time', None)
+            nco.createDimension(name_y, size_Y)
+            nco.createDimension(name_x, size_X)
+
+            timeo = nco.createVariable('time', 'f8', ('time',))
+            timeo.units = time_units
+            timeo.calendar = 'standard'
+            timeo.standard_name = 'time'
+
+            ordero = nco.createVariable('time_order', 'i4', ('time',))
+            ordero.long_name = 'indices of the time steps sorted by time'
+
+            # Create the x and y variables
+            xo = nco.createVariable(name_x, 'f8', (name_x,))
+            xo.pixel_size = geo[1]
+            yo = nco.createVariable(name_y, 'f8', (name_y,))
+            yo.pixel_size = geo[5]
+
+            # Create container variable for CRS
+            crso = nco.createVariable('crs', 'i4')
+            if srse.IsGeographic():
+                xo.standard_name = 'longitude'
+                xo.units = 'degrees_east'
+                yo.standard_name = 'latitude'
+                yo.units = 'degrees_north'
+
+                crso.long_name = 'Lon/Lat Coords in {}'.format(
+                    srse.GetAttrValue('GEOGCS'))
+                crso.grid_mapping_name = 'latitude_longitude'
+                crso.longitude_of_prime_meridian = 0.0
+            else:
+                xo.standard_name = 'projection_x_coordinate'
+                xo.units = srse.GetLinearUnitsName()
+                yo.standard_name = 'projection_y_coordinate'
+                yo.units = srse.GetLinearUnitsName()
+
+                crso.long_name = 'X/Y Coords in {}'.format(
+                    srse.GetAttrValue('PROJCS'))
+            crso.projection = '{}'.format(projection)
+            crso.semi_major_axis = srse.GetSemiMajor()
+            crso.inverse_flattening = srse.GetInvFlattening()
+            crso.crs_wkt = srse.ExportToWkt()
+            crso.spatial_ref = srse.ExportToWkt()
+            crso.geo_reference = geo
+
+            # Create the data variable, chunked for time series access
+            chunksizes = (max(1, int(chunks[0])),
+                          max(1, min(int(chunks[1]), size_Y)),
+                          max(1, min(int(chunks[2]), size_X)))
+            preco = nco.createVariable('%s' % Var, dtype,
+                                       ('time', name_y, name_x),
+                                       zlib=True, complevel=complevel,
+                                       shuffle=True, chunksizes=chunksizes,
+                                       fill_value=ndv)
+            preco.grid_mapping = 'crs'
+
+            # Set the y/x variable
+            xo[:] = x
+            yo[:] = y
+        else:
+            nco = Dataset(namenc, 'r+')
+
+        timeo = nco.variables['time']
+        ordero = nco.variables['time_order']
+        preco = nco.variables['%s' % Var]
+        shape = preco.shape[1:]
+        if shape != (size_Y, size_X):
+            nco.close()
+            raise ValueError('"{f}" has shape {c}, received {s}'.format(
+                f=namenc, c=shape, s=data.shape))
+
+        # Find the date, or append it and update the sort index
+        times = np.asarray(timeo[:])
+        index = np.flatnonzero(times == time_value)
+        if len(index) > 0:
+            index = int(index[0])
+        else:
+            index = len(times)
+            timeo[index] = time_value
+            ordero[:] = np.argsort(np.append(times, time_value),
+                                   kind='stable').astype(np.int32)
+
+        # Set the data variable, NaN is masked to the fill value ndv
+        preco[index, :, :] = np.ma.masked_invalid(data, copy=False)
+
+        nco.close()
+    return ()
+
+
+REGION_MASKS = {}
+RASTERIZE_OPTIONS = ['ALL_TOUCHED=TRUE']
+
+
+def Get_region_window(geo, shape, bbox, wrap=True) -> tuple:
+    """
+    This function returns the pixel window of a bbox in a north up raster,
+    snapped to the pixel edges and clipped to the raster, see
+    gis.GridSpec.get_index
+
+    Keyword arguments:
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    shape -- (ysize, xsize), size of the raster
+    bbox -- dictionary, spatial range, {'w':, 's':, 'e':, 'n':}
+    wrap -- boolean, longitudes are shifted into the raster, False for
+            projected rasters
+
+    Returns:
+    window -- [[row start, row end], [col start, col end]]
+    geo_out -- geospatial dataset of the window
+    """
+    grid = GridSpec.from_geo(geo, shape, wrap)
+    y_id, x_id = grid.get_index([bbox['s'], bbox['n']],
+                                [bbox['w'], bbox['e']])
+
+    geo_out = [geo[0] + x_id[0] * geo[1], geo[1], geo[2],
+               geo[3] + y_id[0] * geo[5], geo[4], geo[5]]
+    return [[int(y_id[0]), int(y_id[1])], [int(x_id[0]), int(x_id[1])]], \
+        geo_out
+
+
+def Get_region_mask(region, geo, shape):
+    """
+    This function rasterises the polygon of a region, its 'shape' shapefile
+    or its 'polygon' vertices, on a raster grid, every pixel touched by the
+    polygon is inside, see RASTERIZE_OPTIONS. The masks are cached per
+    region and grid, every date of a product reuses the mask.
+
+    Keyword arguments:
+    region -- dictionary, {'name':, 'shape':} or {'name':, 'polygon':}
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    shape -- (ysize, xsize), size of the raster
+
+    Returns:
+    mask -- [array], True inside the polygon, None if the region is a bbox
+    """
+    if 'shape' not in region.keys() and 'polygon' not in region.keys():
+        return None
+
+    key = (region['name'], tuple(geo), tuple(shape))
+    if key in REGION_MASKS.keys():
+        return REGION_MASKS[key]
+
+    from osgeo import ogr
+
+    if 'shape' in region.keys():
+        source_ds = ogr.Open(region['shape'])
+        if source_ds is None:
+            raise IHEFileError(region['shape']) from None
+        source_layer = source_ds.GetLayer()
+    else:
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for lon, lat in region['polygon']:
+            ring.AddPoint_2D(lon, lat)
+        ring.CloseRings()
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(ring)
+
+        source_ds = ogr.GetDriverByName('Memory').CreateDataSource('')
+        source_layer = source_ds.CreateLayer(region['name'],
+                                             geom_type=ogr.wkbPolygon)
+        feature = ogr.Feature(source_layer.GetLayerDefn())
+        feature.SetGeometry(polygon)
+        source_layer.CreateFeature(feature)
+        feature = None
+
+    target_ds = gdal.GetDriverByName('MEM').Create(
+        '', int(shape[1]), int(shape[0]), 1, gdal.GDT_Byte)
+    target_ds.SetGeoTransform(geo)
+    gdal.RasterizeLayer(target_ds, [1], source_layer, burn_values=[1],
+                        options=RASTERIZE_OPTIONS)
+    mask = target_ds.GetRasterBand(1).ReadAsArray().astype(bool)
+
+    target_ds = None
+    source_ds = None
+
+    REGION_MASKS[key] = mask
+    return mask
+
+
+ZONE_LABELS = {}
+
+
+def Get_zone_labels(zones, geo, shape) -> tuple:
+    """
+    This function rasterises zones on a raster grid, to a label array with
+    the zone number of every pixel, 0 outside all zones. The pixels of a
+    zone are the pixels of its region mask, see Get_region_mask; a pixel
+    touched by two zones is in the later one. The labels are cached per
+    zones and grid, every date of a product reuses them.
+
+    Keyword arguments:
+    zones -- string, path to a polygon shapefile, one zone per feature,
+             or dictionary, {'shape':, 'field':}, 'field' is the attribute of
+             the zone names, the feature id if not given,
+             or list of named regions, see Download, one zone per region
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    shape -- (ysize, xsize), size of the raster
+
+    Returns:
+    labels -- [array], int32 zone number of every pixel
+    names -- list, name of zone 1, 2, ...
+    """
+    if isinstance(zones, str):
+        zones = {'shape': zones}
+
+    if isinstance(zones, dict):
+        zones_key = (zones['shape'], zones.get('field'))
+    else:
+        if not isinstance(zones, list) or len(zones) < 1:
+            raise IHETypeError('zones', list, zones) from None
+        zones_key = tuple(region['name'] for region in zones)
+    key = (zones_key, tuple(geo), tuple(shape))
+    if key in ZONE_LABELS.keys():
+        return ZONE_LABELS[key]
+
+    from osgeo import ogr
+
+    def _open_layer(shapefile):
+        source_ds = ogr.Open(shapefile)
+        if source_ds is None:
+            raise IHEFileError(shapefile) from None
+        return source_ds, source_ds.GetLayer()
+
+    # Copy the zones to one layer with the zone number attribute
+    zone_ds = ogr.GetDriverByName('Memory').CreateDataSource('')
+    zone_layer = zone_ds.CreateLayer('zones', geom_type=ogr.wkbUnknown)
+    zone_layer.CreateField(ogr.FieldDefn('zone', ogr.OFTInteger))
+
+    def _add_zone(geometry, number):
+        feature = ogr.Feature(zone_layer.GetLayerDefn())
+        feature.SetGeometry(geometry)
+        feature.SetField('zone', number)
+        zone_layer.CreateFeature(feature)
+
+    names = []
+    if isinstance(zones, dict):
+        source_ds, source_layer = _open_layer(zones['shape'])
+        for feature in source_layer:
+            if zones.get('field') is None:
+                names.append(feature.GetFID())
+            else:
+                names.append(feature.GetField(zones['field']))
+            _add_zone(feature.GetGeometryRef().Clone(), len(names))
+        source_ds = None
+    else:
+        for region in zones:
+            names.append(region['name'])
+            if 'shape' in region.keys():
+                source_ds, source_layer = _open_layer(region['shape'])
+                for feature in source_layer:
+                    _add_zone(feature.GetGeometryRef().Clone(), len(names))
+                source_ds = None
+                continue
+
+            if 'polygon' in region.keys():
+                vertices = region['polygon']
+            else:
+                vertices = [[region['w'], region['s']],
+                            [region['e'], region['s']],
+                            [region['e'], region['n']],
+                            [region['w'], region['n']]]
+            ring = ogr.Geometry(ogr.wkbLinearRing)
+            for lon, lat in vertices:
+                ring.AddPoint_2D(lon, lat)
+            ring.CloseRings()
+            polygon = ogr.Geometry(ogr.wkbPolygon)
+            polygon.AddGeometry(ring)
+            _add_zone(polygon, len(names))
+
+    target_ds = gdal.GetDriverByName('MEM').Create(
+        '', int(shape[1]), int(shape[0]), 1, gdal.GDT_Int32)
+    target_ds.SetGeoTransform(geo)
+    gdal.RasterizeLayer(target_ds, [1], zone_layer,
+                        options=RASTERIZE_OPTIONS + ['ATTRIBUTE=zone'])
+    labels = target_ds.GetRasterBand(1).ReadAsArray().astype(np.int32)
+
+    target_ds = None
+    zone_ds = None
+
+    ZONE_LABELS[key] = (labels, names)
+    return labels, names
+
+
+def Zonal_statistics(data, labels, nzones, ndv=None) -> dict:
+    """
+    This function computes the mean, sum, min, max and count of the valid
+    pixels of every zone in one pass over the array
+
+    Keyword arguments:
+    data -- [array], 2D data
+    labels -- [array], zone number of every pixel, 0 outside all zones
+    nzones -- integer, number of zones
+    ndv -- number, nodata value of data, NaN is always nodata
+
+    Returns:
+    stats -- dictionary, {'mean':, 'sum':, 'min':, 'max':, 'count':}, arrays
+             of the zones 1, 2, ..., NaN for zones without valid pixels
+    """
+    valid = np.logical_and(labels > 0, np.isfinite(data))
+    if ndv is not None:
+        valid &= data != ndv
+
+    label = labels[valid]
+    value = data[valid].astype(np.float64)
+
+    count = np.bincount(label, minlength=nzones + 1)
+    total = np.bincount(label, weights=value, minlength=nzones + 1)
+    vmin = np.full(nzones + 1, np.nan)
+    vmax = np.full(nzones + 1, np.nan)
+    if label.size > 0:
+        order = np.argsort(label, kind='mergesort')
+        label = label[order]
+        value = value[order]
+        starts = np.flatnonzero(np.r_[True, label[1:] != label[:-1]])
+        vmin[label[starts]] = np.minimum.reduceat(value, starts)
+        vmax[label[starts]] = np.maximum.reduceat(value, starts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+    total = np.where(count > 0, total, np.nan)
+
+    return {'mean': mean[1:], 'sum': total[1:], 'min': vmin[1:],
+            'max': vmax[1:], 'count': count[1:]}
+
+
+def Save_as_zonal_stats(namecsv, data, geo, date, zones, ndv=None):
+    """
+    This function adds the zonal statistics of one date to a csv table,
+    with the columns date, zone, mean, sum, min, max, count. A date that is
+    in the table already is replaced at the end of the download, see
+    Save_as_csv_rows.
+
+    Keyword arguments:
+    namecsv -- string, complete path of the output file with .csv extension
+    data -- [array], 2D data of the date
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    date -- pandas.Timestamp or datetime, date of data
+    zones -- zones of Get_zone_labels
+    ndv -- number, nodata value of data
+    """
+    labels, names = Get_zone_labels(zones, geo, data.shape)
+    stats = Zonal_statistics(data, labels, len(names), ndv)
+
+    table = pd.DataFrame({
+        'date': pd.Timestamp(date).strftime('%Y-%m-%d %H:%M:%S'),
+        'zone': names,
+        'mean': stats['mean'],
+        'sum': stats['sum'],
+        'min': stats['min'],
+        'max': stats['max'],
+        'count': stats['count']
+    })
+
+    Save_as_csv_rows(namecsv, table, CSV_KEYS['zonal'])
+    return ()
+
+
+AGGREGATE_FREQS = ['dekad', 'month', 'year']
+AGGREGATE_STATS = ['sum', 'mean', 'max', 'count']
+
+
+def Get_aggregate_period(date, freq) -> pd.Timestamp:
+    """
+    This function returns the first date of the dekad, month or year of a
+    date
+
+    Keyword arguments:
+    date -- pandas.Timestamp or datetime, date
+    freq -- string, 'dekad', 'month' or 'year'
+    """
+    date = pd.Timestamp(date)
+    if freq == 'dekad':
+        day = min(1 + 10 * ((date.day - 1) // 10), 21)
+        return pd.Timestamp(year=date.year, month=date.month, day=day)
+    if freq == 'month':
+        return pd.Timestamp(year=date.year, month=date.month, day=1)
+    if freq == 'year':
+        return pd.Timestamp(year=date.year, month=1, day=1)
+    raise IHEKeyError(freq, AGGREGATE_FREQS) from None
+
+
+def Get_aggregate_path(folder, freq) -> str:
+    """
+    This function returns the folder of the aggregates of a frequency, the
+    running accumulators are in its ".accumulators" sub folder
+
+    Keyword arguments:
+    folder -- string, output folder
+    freq -- string, 'dekad', 'month' or 'year'
+    """
+    return os.path.join(folder, 'aggregate.{}'.format(freq))
+
+
+def Update_aggregate(folder, data, geo, date, ndv, freq,
+                     projection='WGS84'):
+    """
+    This function adds one date to the running sum, count and max of its
+    period. The accumulators are memory mapped .npy files, so parallel
+    writers, waiting for the lock of the period, and later downloads update
+    the same period. A date is added once. Accumulators of another grid,
+    a download with another bbox, grid or nodata value, are reset.
+
+    Keyword arguments:
+    folder -- string, output folder
+    data -- [array], 2D data of the date
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    date -- pandas.Timestamp or datetime, date of data
+    ndv -- number, nodata value of data
+    freq -- string, 'dekad', 'month' or 'year'
+    projection -- string or integer, projection of geo, see
+                  Get_spatial_reference
+    """
+    period = Get_aggregate_period(date, freq)
+    path = os.path.join(Get_aggregate_path(folder, freq), '.accumulators')
+    if not os.path.exists(path):
+        os.makedirs(path, exist_ok=True)
+    name = os.path.join(path, '{:%Y.%m.%d}'.format(period))
+
+    with File_lock(name):
+        shape = tuple(int(i) for i in data.shape)
+        grid = np.asarray(list(geo) + [ndv], dtype=np.float64)
+        wkt = Get_spatial_reference(projection).ExportToWkt()
+        if os.path.exists('{}.sum.npy'.format(name)):
+            grid_acc = np.load('{}.geo.npy'.format(name))
+            wkt_acc = Get_spatial_reference('WGS84').ExportToWkt()
+            if os.path.exists('{}.prj'.format(name)):
+                with open('{}.prj'.format(name)) as fp:
+                    wkt_acc = fp.read()
+            shape_acc = np.load('{}.sum.npy'.format(name),
+                                mmap_mode='r').shape
+            if shape_acc != shape or wkt_acc != wkt or \
+                    not np.array_equal(grid_acc, grid, equal_nan=True):
+                for ext in ['sum.npy', 'count.npy', 'max.npy', 'geo.npy',
+                            'prj', 'dates.txt']:
+                    if os.path.exists('{n}.{e}'.format(n=name, e=ext)):
+                        os.remove('{n}.{e}'.format(n=name, e=ext))
+
+        date_key = '{:%Y-%m-%d %H:%M:%S}'.format(pd.Timestamp(date))
+        dates = []
+        if os.path.exists('{}.dates.txt'.format(name)):
+            with open('{}.dates.txt'.format(name)) as fp:
+                dates = fp.read().split('\n')
+        if date_key in dates:
+            return ()
+
+        if not os.path.exists('{}.sum.npy'.format(name)):
+            np.save('{}.geo.npy'.format(name), grid)
+            with open('{}.prj'.format(name), 'w') as fp:
+                fp.write(wkt)
+            acc_sum = np.lib.format.open_memmap(
+                '{}.sum.npy'.format(name), mode='w+', dtype=np.float64,
+                shape=shape)
+            acc_count = np.lib.format.open_memmap(
+                '{}.count.npy'.format(name), mode='w+', dtype=np.int32,
+                shape=shape)
+            acc_max = np.lib.format.open_memmap(
+                '{}.max.npy'.format(name), mode='w+', dtype=np.float32,
+                shape=shape)
+            acc_max[:] = -np.inf
+        else:
+            acc_sum = np.load('{}.sum.npy'.format(name), mmap_mode='r+')
+            acc_count = np.load('{}.count.npy'.format(name), mmap_mode='r+')
+            acc_max = np.load('{}.max.npy'.format(name), mmap_mode='r+')
+
+        valid = np.isfinite(data)
+        if ndv is not None:
+            valid &= data != ndv
+        acc_sum[valid] += data[valid]
+        acc_count[valid] += 1
+        np.maximum(acc_max, np.where(valid, data, -np.inf), out=acc_max)
+
+        acc_sum.flush()
+        acc_count.flush()
+        acc_max.flush()
+        del acc_sum, acc_count, acc_max
+
+        with open('{}.dates.txt'.format(name), 'a') as fp:
+            fp.write('{}\n'.format(date_key))
+    return ()
+
+
+def Save_as_aggregate(conf):
+    """
+    This function saves the aggregates of conf['output']['aggregate'] as
+    GeoTIFFs "{var}.{res}.{prod}_{stat}.{freq}-{%Y.%m.%d}.tif", one per
+    period and statistic, in the "aggregate.{freq}" folder of the output
+    and of every region, in the projection of the accumulated dates. Pixels
+    without valid dates are nodata. The running accumulators are kept, so a
+    later download completes the periods.
+
+    Keyword arguments:
+    conf -- dictionary, download configuration
+    """
+    aggregate = conf['output'].get('aggregate')
+    if not aggregate:
+        return ()
+    freq = aggregate['freq']
+
+    folders = [conf['folder']['l']]
+    for region in conf['output'].get('regions') or []:
+        folders.append(os.path.join(conf['folder']['l'], region['name']))
+
+    for folder in folders:
+        path = Get_aggregate_path(folder, freq)
+        for name_sum in sorted(glob.glob(os.path.join(
+                path, '.accumulators', '*.sum.npy'))):
+            name = name_sum[:-len('.sum.npy')]
+            period = pd.Timestamp(os.path.basename(name).replace('.', '-'))
+
+            with File_lock(name):
+                geo = np.load('{}.geo.npy'.format(name))
+                projection = "WGS84"
+                if os.path.exists('{}.prj'.format(name)):
+                    with open('{}.prj'.format(name)) as fp:
+                        projection = fp.read()
+                acc_sum = np.load('{}.sum.npy'.format(name), mmap_mode='r')
+                acc_count = np.load('{}.count.npy'.format(name), mmap_mode='r')
+                acc_max = np.load('{}.max.npy'.format(name), mmap_mode='r')
+
+                ndv = geo[6]
+                valid = acc_count > 0
+                for stat in aggregate['how']:
+                    if stat == 'sum':
+                        data = np.where(valid, acc_sum, ndv)
+                    elif stat == 'mean':
+                        data = np.where(valid, acc_sum / np.maximum(acc_count, 1),
+                                        ndv)
+                    elif stat == 'max':
+                        data = np.where(valid, acc_max, ndv)
+                    else:
+                        data = np.where(valid, acc_count, ndv)
+
+                    name_out = os.path.join(
+                        path, '{v}.{r}.{p}_{s}.{f}-{d:%Y.%m.%d}.tif'.format(
+                            v=conf['product']['variable'],
+                            r=conf['product']['resolution'],
+                            p=conf['product']['name'],
+                            s=stat, f=freq, d=period))
+                    Save_as_tiff(name=name_out, data=data.astype(np.float32),
+                                 geo=list(geo[:6]), projection=projection,
+                                 ndv=ndv, profile=conf['output']['tiff'])
+                del acc_sum, acc_count, acc_max
+    return ()
+
+
+POINT_INDICES = {}
+
+
+def Get_point_index(points, geo, shape) -> tuple:
+    """
+    This function returns the pixel of every station in a north up raster.
+    The pixels are cached per stations and grid, every date of a product
+    reuses them.
+
+    Keyword arguments:
+    points -- list of stations, [{'name':, 'lon':, 'lat':}, ...]
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    shape -- (ysize, xsize), size of the raster
+
+    Returns:
+    rows -- [array], row of every station
+    cols -- [array], column of every station
+    inside -- [array], True if the station is in the raster
+    """
+    lon = tuple(point['lon'] for point in points)
+    lat = tuple(point['lat'] for point in points)
+    key = (lon, lat, tuple(geo), tuple(shape))
+    if key in POINT_INDICES.keys():
+        return POINT_INDICES[key]
+
+    rows = np.floor((np.asarray(lat) - geo[3]) / geo[5]).astype(int)
+    cols = np.floor((np.asarray(lon) - geo[0]) / geo[1]).astype(int)
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    rows = np.where(inside, rows, 0)
+    cols = np.where(inside, cols, 0)
+
+    POINT_INDICES[key] = (rows, cols, inside)
+    return rows, cols, inside
+
+
+def Get_point_read(conf):
+    """
+    This function returns the stations to read, [[lon, lat], ...], when the
+    station values are the only output of the download, so the templates
+    read the station pixels only, see Open_tiff_array. It returns None for
+    the other outputs, which need the whole window.
+
+    Keyword arguments:
+    conf -- dictionary, download configuration
+    """
+    output = conf['output']
+    if not output.get('points') or output.get('tiff') is not None:
+        return None
+    for key in ['nc', 'regions', 'zonal', 'aggregate', 'grid']:
+        if output.get(key):
+            return None
+    return [[point['lon'], point['lat']] for point in output['points']]
+
+
+def Save_as_csv_rows(namecsv, table, keys):
+    """
+    This function adds rows to a csv table. Rows are appended, so a date
+    costs the same in a long run, rows of a rerun too; Sort_csv_rows drops
+    the replaced rows and sorts the table once at the end of the download.
+    A table with other columns is rewritten with the new rows replacing the
+    old ones, sorted by keys. Parallel writers wait for the "namecsv.lock"
+    file.
+
+    Keyword arguments:
+    namecsv -- string, complete path of the output file with .csv extension
+    table -- pandas.DataFrame, rows to add
+    keys -- list of the columns that identify a row
+    """
+    with File_lock(namecsv):
+        if not os.path.exists(namecsv):
+            table.to_csv(namecsv, index=False)
+            return ()
+
+        header = pd.read_csv(namecsv, nrows=0).columns.tolist()
+        if header == table.columns.tolist():
+            table.to_csv(namecsv, mode='a', index=False, header=False)
+            return ()
+
+        # other columns, rewrite the table
+        table_old = pd.read_csv(namecsv, dtype={key: str for key in keys})
+        index_old = table_old.set_index(keys).index
+        index_new = table.astype({key: str for key in keys}).set_index(
+            keys).index
+        table_old = table_old[~index_old.isin(index_new)]
+        table = pd.concat([table_old, table.astype({key: str for key in keys})],
+                          ignore_index=True, sort=False)
+        table = table.sort_values(keys, kind='stable')
+
+        namecsv_tmp = '{n}.{p}'.format(n=namecsv, p=os.getpid())
+        table.to_csv(namecsv_tmp, index=False)
+        os.replace(namecsv_tmp, namecsv)
+    return ()
+
+
+def Sort_csv_rows(namecsv, keys):
+    """
+    This function drops the rows of a csv table that are replaced by later
+    rows of the same keys, and sorts the table by keys. The table is only
+    rewritten if it changes.
+
+    Keyword arguments:
+    namecsv -- string, complete path of the csv file
+    keys -- list of the columns that identify a row
+    """
+    with File_lock(namecsv):
+        if not os.path.exists(namecsv):
+            return ()
+
+        table = pd.read_csv(namecsv, dtype={key: str for key in keys})
+        table_end = table.drop_duplicates(keys, keep='last').sort_values(
+            keys, kind='stable')
+        if table_end.index.equals(table.index):
+            return ()
+
+        namecsv_tmp = '{n}.{p}'.format(n=namecsv, p=os.getpid())
+        table_end.to_csv(namecsv_tmp, index=False)
+        os.replace(namecsv_tmp, namecsv)
+    return ()
+
+
+CSV_KEYS = {
+    'zonal': ['date', 'zone'],
+    'points': ['date']
+}
+
+
+def Get_csv_path(conf, mode):
+    """
+    This function returns the path of the csv table of an output mode,
+    "{var}.{res}.{prod}.{mode}.csv" in folder['l']
+
+    Keyword arguments:
+    conf -- dictionary, download configuration
+    mode -- string, output mode of CSV_KEYS
+    """
+    return os.path.join(conf['folder']['l'], '{v}.{r}.{p}.{m}.csv'.format(
+        v=conf['product']['variable'],
+        r=conf['product']['resolution'],
+        p=conf['product']['name'],
+        m=mode))
+
+
+def Save_as_csv_tables(conf):
+    """
+    This function sorts the csv tables of the download at its end, see
+    Sort_csv_rows
+
+    Keyword arguments:
+    conf -- dictionary, download configuration
+    """
+    for mode, keys in CSV_KEYS.items():
+        if conf['output'].get(mode):
+            Sort_csv_rows(Get_csv_path(conf, mode), keys)
+    return ()
+
+
+def Save_as_point_values(namecsv, data, geo, date, points, ndv=None):
+    """
+    This function adds the values of the stations of one date to a csv
+    table, one row per date and one column per station, NaN for nodata or
+    stations outside of data. A date that is in the table already is
+    replaced at the end of the download, see Save_as_csv_rows.
+
+    Keyword arguments:
+    namecsv -- string, complete path of the output file with .csv extension
+    data -- [array], 2D data of the date
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    date -- pandas.Timestamp or datetime, date of data
+    points -- list of stations, [{'name':, 'lon':, 'lat':}, ...]
+    ndv -- number, nodata value of data
+    """
+    rows, cols, inside = Get_point_index(points, geo, data.shape)
+
+    values = data[rows, cols].astype(np.float64)
+    values[~inside] = np.nan
+    if ndv is not None:
+        values[values == ndv] = np.nan
+
+    table = pd.DataFrame([values], columns=[point['name'] for point in points])
+    table.insert(0, 'date', pd.Timestamp(date).strftime('%Y-%m-%d %H:%M:%S'))
+
+    Save_as_csv_rows(namecsv, table, CSV_KEYS['points'])
+    return ()
+
 
-        # Set the data variable
-        if Startdate != '':
-            for i in range(len(Dates)):
-                preco[i, :, :] = DataCube[i, :, :] * 1. / np.float(Scaling_factor)
-        else:
-            preco[:, :] = DataCube[:, :] * 1. / np.float(Scaling_factor)
+def Save_as_output(name, data, geo, projection, ndv, date, conf):
+    """
+    This function saves the converted array of one date with the output
+    modes of the download configuration, conf['output']:
+    'grid' -- target grid of Get_target_grid, data is warped to the grid
+              first, regions, zones and stations are in its projection
+    'tiff' -- GeoTIFF creation profile of name, None to skip the GeoTIFF
+    'dtype' -- "float32", or "native" for the integer storage of
+               Get_output_profile
+    'nc' -- True or dict of Save_as_NC_slice options, appends the date to
+            the netcdf cube "{var}.{res}.{prod}.nc" in folder['l']
+    'regions' -- list of named regions, each region is cut from data, masked
+                 by its polygon, and saved in the "{name}" sub folder of
+                 folder['l'], instead of name
+    'zonal' -- zones of Get_zone_labels, True for the regions, appends the
+               zonal statistics of the date to "{var}.{res}.{prod}.zonal.csv"
+               in folder['l']
+    'points' -- list of stations, appends the station values of the date to
+                "{var}.{res}.{prod}.points.csv" in folder['l']
+    'aggregate' -- {'freq':, 'how':, 'keep':}, adds the date to the running
+                   accumulators of its period, see Update_aggregate, the
+                   date itself is saved only if 'keep'
 
-        nco.close()
+    Keyword arguments:
+    name -- string, complete path of the GeoTIFF
+    data -- [array], 2D data of the date
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    projection -- integer, the EPSG code
+    ndv -- number, nodata value of data
+    date -- pandas.Timestamp, date of data
+    conf -- dictionary, download configuration
+    """
+    output = conf['output']
+    folder = conf['folder']['l']
+
+    if output.get('grid'):
+        data, geo, projection = Warp_to_target_grid(data, geo, projection,
+                                                    ndv, output['grid'])
+
+    if output.get('zonal'):
+        zones = output['regions'] if output['zonal'] is True else output['zonal']
+        Save_as_zonal_stats(Get_csv_path(conf, 'zonal'), data, geo, date,
+                            zones, ndv=ndv)
+
+    if output.get('points'):
+        Save_as_point_values(Get_csv_path(conf, 'points'), data, geo, date,
+                             output['points'], ndv=ndv)
+
+    targets = []
+    if output.get('regions'):
+        wrap = Get_spatial_reference(projection).IsGeographic() == 1
+        for region in output['regions']:
+            window, geo_region = Get_region_window(geo, data.shape, region,
+                                                   wrap)
+            data_region = data[window[0][0]:window[0][1],
+                               window[1][0]:window[1][1]]
+
+            mask = Get_region_mask(region, geo_region, data_region.shape)
+            if mask is not None:
+                data_region = np.where(mask, data_region,
+                                       np.asarray(ndv, dtype=data.dtype))
+
+            folder_region = os.path.join(folder, region['name'])
+            if not os.path.exists(folder_region):
+                os.makedirs(folder_region, exist_ok=True)
+            targets.append([
+                os.path.join(folder_region, os.path.basename(name)),
+                data_region, geo_region, folder_region])
+    else:
+        targets.append([name, data, geo, folder])
+
+    for name_out, data_out, geo_out, folder_out in targets:
+        if output.get('aggregate'):
+            Update_aggregate(folder_out, data_out, geo_out, date, ndv,
+                             output['aggregate']['freq'], projection)
+            if not output['aggregate']['keep']:
+                continue
+
+        if output['tiff'] is not None:
+            Save_as_tiff(name=name_out, data=data_out, geo=geo_out,
+                         projection=projection, ndv=ndv,
+                         profile=Get_output_profile(ndv, conf))
+
+        if output['nc']:
+            kwargs = output['nc'] if isinstance(output['nc'], dict) else {}
+            namenc = os.path.join(folder_out, '{v}.{r}.{p}.nc'.format(
+                v=conf['product']['variable'],
+                r=conf['product']['resolution'],
+                p=conf['product']['name']))
+
+            Save_as_NC_slice(namenc, data_out, geo_out, date,
+                             Var=conf['product']['variable'], ndv=ndv,
+                             projection=projection, **kwargs)
     return ()
 
 
@@ -823,6 +2566,50 @@ def Convert_dict_to_array(River_dict, Array_dict, Reference_data):
 
 
 # raster_conversions
+def Run_gdal_function(function, output_name, input_name, **kwargs):
+    """
+    This function runs a GDAL utility (gdal.Translate, gdal.Warp) in process,
+    instead of starting the gdal_translate or gdalwarp executable
+
+    Keyword Arguments:
+    function -- gdal.Translate or gdal.Warp
+    output_name -- string, output file name, "/vsimem/" for in-memory files
+    input_name -- string, list of strings or gdal dataset
+    kwargs -- keyword arguments of gdal.TranslateOptions or gdal.WarpOptions
+    """
+    gdal.ErrorReset()
+    try:
+        dst_ds = function(output_name, input_name, **kwargs)
+    except RuntimeError as err:
+        raise IHEGDALError(function.__name__, output_name, str(err)) from None
+
+    if dst_ds is None:
+        raise IHEGDALError(function.__name__, output_name,
+                           gdal.GetLastErrorMsg()) from None
+
+    # flush to disk
+    dst_ds = None
+    return output_name
+
+
+def Get_memory_path(filename, part=''):
+    """
+    This function returns an in-memory ("/vsimem/") file name for a
+    temporary file, unique per process. Remove it with gdal.Unlink.
+
+    Keyword Arguments:
+    filename -- string, name of the temporary file on disk
+    part -- string, extra name part
+    """
+    name, ext = os.path.splitext(os.path.basename(filename))
+    if part != '':
+        name = '{n}_{p}'.format(n=name, p=part)
+    if ext == '':
+        ext = '.tif'
+
+    return '/vsimem/{pid}/{n}{e}'.format(pid=os.getpid(), n=name, e=ext)
+
+
 def Run_command_window(argument):
     """
     This function runs the argument in the command window without showing cmd window
@@ -877,15 +2664,114 @@ def Open_array_info(filename=''):
     return (geo_out, proj, size_X, size_Y)
 
 
-def Open_tiff_array(filename, band=1) -> np.ndarray:
+def Get_tiff_window(ds, window=None, bbox=None) -> tuple:
+    """
+    Get the pixel window of a raster, from pixel indices or from a bbox.
+    The window is clipped to the raster size, the same as numpy slicing.
+
+    Keyword Arguments:
+    ds -- gdal file (gdal.Open(filename))
+    window -- [y_id, x_id], [[ystart, yend], [xstart, xend]]
+        pixel indices, as used by data[y_id[0]:y_id[1], x_id[0]:x_id[1]]
+    bbox -- {'w':, 's':, 'e':, 'n':}
+        spatial range, in the coordinates of the raster
+
+    Returns:
+    (xoff, yoff, xsize, ysize) -- tuple, arguments of ReadAsArray
+    """
+    size_X = ds.RasterXSize
+    size_Y = ds.RasterYSize
+
+    if window is None and bbox is None:
+        return 0, 0, size_X, size_Y
+
+    if window is not None:
+        y_id, x_id = window
+    else:
+        geo = ds.GetGeoTransform()
+        y_edge = [(bbox['n'] - geo[3]) / geo[5],
+                  (bbox['s'] - geo[3]) / geo[5]]
+        x_edge = [(bbox['w'] - geo[0]) / geo[1],
+                  (bbox['e'] - geo[0]) / geo[1]]
+        y_id = [np.floor(np.min(y_edge)), np.ceil(np.max(y_edge))]
+        x_id = [np.floor(np.min(x_edge)), np.ceil(np.max(x_edge))]
+
+    y_s = int(np.clip(y_id[0], 0, size_Y))
+    y_e = int(np.clip(y_id[1], y_s, size_Y))
+    x_s = int(np.clip(x_id[0], 0, size_X))
+    x_e = int(np.clip(x_id[1], x_s, size_X))
+
+    return x_s, y_s, x_e - x_s, y_e - y_s
+
+
+def Read_band_points(ds_band, geo, xoff, yoff, xsize, ysize, points):
+    """
+    Read the station pixels of a window of a north up raster band. Only the
+    raster blocks that hold a station are decoded, the station pixels and
+    their neighbours are read from them; the other pixels of the window are
+    the nodata value of the band, or 0.
+
+    Keyword Arguments:
+    ds_band -- gdal band
+    geo -- geotransform of the raster
+    xoff, yoff, xsize, ysize -- window, see Get_tiff_window
+    points -- [[lon, lat], ...], stations in the coordinates of the raster
+
+    Returns:
+    data -- [array], window of the band
+    """
+    rows, cols, inside = Get_point_index(
+        [{'lon': lon, 'lat': lat} for lon, lat in points], geo,
+        (ds_band.YSize, ds_band.XSize))
+    inside &= (rows >= yoff) & (rows < yoff + ysize) & \
+        (cols >= xoff) & (cols < xoff + xsize)
+    rows = rows[inside]
+    cols = cols[inside]
+
+    ndv = ds_band.GetNoDataValue()
+    dtype = gdal_array.GDALTypeCodeToNumericTypeCode(ds_band.DataType)
+    data = np.full((ysize, xsize), 0 if ndv is None else ndv, dtype=dtype)
+
+    # stations of a block, read with one pixel around them
+    block_x, block_y = ds_band.GetBlockSize()
+    blocks = (rows // block_y) * (ds_band.XSize // block_x + 1) + \
+        cols // block_x
+    for block in np.unique(blocks):
+        is_block = blocks == block
+        y_s = max(rows[is_block].min() - 1, yoff)
+        y_e = min(rows[is_block].max() + 2, yoff + ysize)
+        x_s = max(cols[is_block].min() - 1, xoff)
+        x_e = min(cols[is_block].max() + 2, xoff + xsize)
+
+        data[y_s - yoff:y_e - yoff, x_s - xoff:x_e - xoff] = \
+            ds_band.ReadAsArray(x_s, y_s, x_e - x_s, y_e - y_s)
+    return data
+
+
+def Open_tiff_array(filename, band=1, window=None, bbox=None,
+                    dtype=np.float32, points=None) -> np.ndarray:
     """
     Opening a tiff array.
 
+    Only the pixels inside window or bbox are read and post-processed,
+    when one of them is given. A float dtype converts the valid range and
+    nodata to NaN and applies scale and offset in place, an integer dtype
+    or None returns the stored values.
+
     Keyword Arguments:
     filename -- 'C:/file/to/path/file.tif' or a gdal file (gdal.Open(filename))
         string that defines the input tiff file or gdal file
     band -- integer
         Defines the band of the tiff that must be opened.
+    window -- [y_id, x_id]
+        Defines the pixel indices to read, [[ystart, yend], [xstart, xend]].
+    bbox -- {'w':, 's':, 'e':, 'n':}
+        Defines the spatial range to read.
+    dtype -- numpy dtype
+        Defines the data type of the array, None for the stored data type.
+    points -- [[lon, lat], ...]
+        Defines the stations to read, see Read_band_points, only their
+        pixels of the window are valid.
     """
     data = np.ndarray
 
@@ -907,6 +2793,7 @@ def Open_tiff_array(filename, band=1) -> np.ndarray:
                 ds_band = ds.GetRasterBand(band)
                 ds_band_ndv = None
                 ds_band_scale = None
+                ds_band_offset = None
                 ds_band_unit = None
 
                 if ds_band is None:
@@ -914,9 +2801,16 @@ def Open_tiff_array(filename, band=1) -> np.ndarray:
                 else:
                     ds_band_ndv = ds_band.GetNoDataValue()
                     ds_band_scale = ds_band.GetScale()
+                    ds_band_offset = ds_band.GetOffset()
                     ds_band_unit = ds_band.GetUnitType()
 
-                    data = ds_band.ReadAsArray()
+                    xoff, yoff, xsize, ysize = Get_tiff_window(ds, window, bbox)
+                    if points is None:
+                        data = ds_band.ReadAsArray(xoff, yoff, xsize, ysize)
+                    else:
+                        data = Read_band_points(ds_band, ds.GetGeoTransform(),
+                                                xoff, yoff, xsize, ysize,
+                                                points)
 
                     # Check data type
                     if isinstance(data, np.ma.MaskedArray):
@@ -924,53 +2818,31 @@ def Open_tiff_array(filename, band=1) -> np.ndarray:
                     else:
                         data = np.asarray(data)
 
-                    # convert to float
-                    data = data.astype(np.float32)
-
-                    if np.logical_or(isinstance(ds_band_ndv, str),
-                                     isinstance(ds_band_scale, str)):
-                        ds_band_ndv = float(ds_band_ndv)
-                        ds_band_scale = float(ds_band_scale)
-
-                    # Set range
-                    if ds_range is not None:
-                        if len(ds_range) > 1:
-                            # print('Set valid_range {}'.format(ds_range))
-                            # print('  Before min {} mean {} max {}'.format(
-                            #     np.min(data), np.mean(data), np.max(data)
-                            # ))
-                            data = np.where(
-                                np.logical_or(
+                    if dtype is not None:
+                        data = data.astype(dtype, copy=False)
+
+                    if data.dtype.kind == 'f':
+                        if np.logical_or(isinstance(ds_band_ndv, str),
+                                         isinstance(ds_band_scale, str)):
+                            ds_band_ndv = float(ds_band_ndv)
+                            ds_band_scale = float(ds_band_scale)
+
+                        # Set range
+                        if ds_range is not None:
+                            if len(ds_range) > 1:
+                                data[np.logical_or(
                                     data < np.min(ds_range),
-                                    data > np.max(ds_range)),
-                                np.nan, data)
-                            # print('  After nanmin {} nanmean {} nanmax {}'.format(
-                            #     np.nanmin(data), np.nanmean(data), np.nanmax(data)
-                            # ))
-
-                    # Set NVD
-                    if ds_band_ndv is not None:
-                        # print('Set total {} pixel with NVD({}) to np.nan'.format(
-                        #     np.count_nonzero(data == ds_band_ndv), ds_band_ndv
-                        # ))
-                        # print('  Before min {} mean {} max {}'.format(
-                        #     np.min(data), np.mean(data), np.max(data)
-                        # ))
-                        data = np.where(data == ds_band_ndv, np.nan, data)
-                        # print('  After nanmin {} nanmean {} nanmax {}'.format(
-                        #     np.nanmin(data), np.nanmean(data), np.nanmax(data)
-                        # ))
-
-                    # Set scale
-                    if ds_band_scale is not None:
-                        # print('Multiply scale {}'.format(ds_band_scale))
-                        # print('  Before min {} mean{} max {}'.format(
-                        #     np.min(data), np.mean(data), np.max(data)
-                        # ))
-                        data = data * ds_band_scale
-                        # print('  After nanmin {} nanmean {} nanmax {}'.format(
-                        #     np.nanmin(data), np.nanmean(data), np.nanmax(data)
-                        # ))
+                                    data > np.max(ds_range))] = np.nan
+
+                        # Set NVD
+                        if ds_band_ndv is not None:
+                            data[data == ds_band_ndv] = np.nan
+
+                        # Set scale and offset
+                        if ds_band_scale is not None and ds_band_scale != 1.0:
+                            data *= ds_band_scale
+                        if ds_band_offset is not None and ds_band_offset != 0.0:
+                            data += ds_band_offset
 
             except RuntimeError as err:
                 print('No band %i found' % band)
@@ -1083,7 +2955,7 @@ def Open_nc_array(NC_filename, Var=None, Startdate='', Enddate=''):
     return (Data)
 
 
-def Open_bil_array(bil_filename, band=1):
+def Open_bil_array(bil_filename, band=1, window=None, bbox=None, points=None):
     """
     Opening a bil array.
 
@@ -1092,6 +2964,12 @@ def Open_bil_array(bil_filename, band=1):
         string that defines the input tiff file or gdal file
     band -- integer
         Defines the band of the tiff that must be opened.
+    window -- [y_id, x_id]
+        Defines the pixel indices to read, [[ystart, yend], [xstart, xend]].
+    bbox -- {'w':, 's':, 'e':, 'n':}
+        Defines the spatial range to read.
+    points -- [[lon, lat], ...]
+        Defines the stations to read, see Read_band_points.
     """
     gdal.GetDriverByName('EHdr').Register()
     ds = gdal.Open(bil_filename)
@@ -1101,7 +2979,12 @@ def Open_bil_array(bil_filename, band=1):
     ds_band_scale = ds_band.GetScale()
     ds_band_unit = ds_band.GetUnitType()
 
-    data = ds_band.ReadAsArray()
+    xoff, yoff, xsize, ysize = Get_tiff_window(ds, window, bbox)
+    if points is None:
+        data = ds_band.ReadAsArray(xoff, yoff, xsize, ysize)
+    else:
+        data = Read_band_points(ds_band, ds.GetGeoTransform(),
+                                xoff, yoff, xsize, ysize, points)
 
     # Check data type
     if isinstance(data, np.ma.MaskedArray):
@@ -1267,89 +3150,190 @@ def Open_nc_dict(input_netcdf, group_name, startdate='', enddate=''):
 
 
 def Merge_Dataset_GDAL(input_names, output_name):
-    GDALWARP_PATH = 'gdalwarp.exe'
-
-    input_name = ''
-    for file in input_names:
-        input_name += '"{f}" '.format(f=file)
-
-    FullCmd = '{exe} ' \
-              '{file_i} ' \
-              '"{file_o}"'.format(
-        exe=GDALWARP_PATH,
-        file_i=input_name,
-        file_o=output_name.replace('"', '""'))
-    # FullCmd = ' '.join([GDALWARP_PATH,
-    #                     '-overwrite -s_srs '
-    #                     '"+proj=sinu '
-    #                     '+lon_0=0 '
-    #                     '+x_0=0 '
-    #                     '+y_0=0 '
-    #                     '+a=6371007.181 '
-    #                     '+b=6371007.181 '
-    #                     '+units=m +no_defs"',
-    #                     '-t_srs EPSG:%s'
-    #                     ' -of GTiff' % (epsg_to), input_name, output_name])
-    Run_command_window(FullCmd)
+    """
+    Merge the input files into one file by using gdal.Warp.
+
+    Keyword Arguments:
+    input_names -- [input data], list of input filenames of the tiff files
+    output_name -- output data, output filename of the merged file
+    """
+    Run_gdal_function(gdal.Warp, output_name, list(input_names))
 
     return output_name
 
-def Merge_and_reproject_Dataset_GDAL(input_names, output_name, epsg_to):
-    GDALWARP_PATH = 'gdalwarp.exe'
 
-    input_name = ''
-    for file in input_names:
-        input_name += '"{f}" '.format(f=file)
+def Mosaic_tiles(input_names, output_name, latlim, lonlim, ndv=-9999,
+                 valid_range=None, profile='tiled', block_rows=1024):
+    """
+    Merge tiles on one pixel grid into one GeoTIFF, clipped to the extent of
+    the user (latlim, lonlim). Every tile is read and written block by block
+    into the output file, no mosaic array is created, so memory stays
+    bounded for any number of tiles. Where tiles overlap the first valid
+    value is kept.
 
-    FullCmd = ' '.join([GDALWARP_PATH,
-                    '-overwrite -multi -wm 80% -co TILED=YES -co BIGTIFF=YES -co COMPRESS=DEFLATE -co NUM_THREADS=ALL_CPUS ',
-                    '-t_srs EPSG:%s'
-                    ' -of GTiff' % (epsg_to), input_name, output_name])
-    
-    Run_command_window(FullCmd)
+    Keyword Arguments:
+    input_names -- [input data], list of input filenames of the tiles
+    output_name -- output data, output filename of the merged file
+    latlim -- [ymin, ymax]
+    lonlim -- [xmin, xmax]
+    ndv -- number, nodata value of the output
+    valid_range -- [min, max], values outside the range are set to nodata
+    profile -- string or dictionary, creation profile, see Get_tiff_profile
+    block_rows -- integer, number of rows read and written per block
+
+    Returns:
+    geo_out -- geotransform of the output file
+    """
+    # pixel grid of the first tile
+    geo, proj, size_X, size_Y = Open_array_info(input_names[0])
+    pixel_x, pixel_y = geo[1], geo[5]
+
+    # extent of the tiles, clipped to the extent of the user
+    lon_w, lon_e, lat_s, lat_n = np.inf, -np.inf, np.inf, -np.inf
+    for input_name in input_names:
+        geo_in, proj_in, size_X, size_Y = Open_array_info(input_name)
+        lon_w = min(lon_w, geo_in[0])
+        lon_e = max(lon_e, geo_in[0] + size_X * geo_in[1])
+        lat_s = min(lat_s, geo_in[3] + size_Y * geo_in[5])
+        lat_n = max(lat_n, geo_in[3])
+    lon_w, lon_e = max(lon_w, lonlim[0]), min(lon_e, lonlim[1])
+    lat_s, lat_n = max(lat_s, latlim[0]), min(lat_n, latlim[1])
+
+    # snap to the pixel grid, full pixels
+    eps = 1e-6
+    Start_x = int(np.floor((lon_w - geo[0]) / pixel_x + eps))
+    End_x = int(np.ceil((lon_e - geo[0]) / pixel_x - eps))
+    Start_y = int(np.floor((lat_n - geo[3]) / pixel_y + eps))
+    End_y = int(np.ceil((lat_s - geo[3]) / pixel_y - eps))
+    size_X_out = max(End_x - Start_x, 1)
+    size_Y_out = max(End_y - Start_y, 1)
+    geo_out = [geo[0] + Start_x * pixel_x, pixel_x, 0.0,
+               geo[3] + Start_y * pixel_y, 0.0, pixel_y]
+
+    # create the output, a cog is built from a temporary tiled file
+    conf = Get_tiff_profile(profile)
+    is_cog = conf['cog']
+    if is_cog:
+        conf['cog'] = False
+        conf['tiled'] = True
+        tiff_name = '{}.tmp.tif'.format(output_name)
+    else:
+        tiff_name = output_name
+
+    driver = gdal.GetDriverByName("GTiff")
+    dst_ds = driver.Create(tiff_name, size_X_out, size_Y_out, 1,
+                           gdal.GDT_Float32,
+                           Get_tiff_options(conf, np.float32))
+    if dst_ds is None:
+        raise IHEGDALError('Create', tiff_name,
+                           gdal.GetLastErrorMsg()) from None
+    dst_ds.SetGeoTransform(geo_out)
+    dst_ds.SetProjection(proj)
+    dst_band = dst_ds.GetRasterBand(1)
+    dst_band.SetNoDataValue(ndv)
+    dst_band.Fill(ndv)
+
+    for input_name in input_names:
+        src_ds = gdal.Open(input_name)
+        src_band = src_ds.GetRasterBand(1)
+        src_ndv = src_band.GetNoDataValue()
+        geo_in = src_ds.GetGeoTransform()
+
+        # position of the tile in the output
+        Off_x = int(np.round((geo_in[0] - geo_out[0]) / pixel_x))
+        Off_y = int(np.round((geo_in[3] - geo_out[3]) / pixel_y))
+        x_s = max(Off_x, 0)
+        x_e = min(Off_x + src_ds.RasterXSize, size_X_out)
+        y_s = max(Off_y, 0)
+        y_e = min(Off_y + src_ds.RasterYSize, size_Y_out)
+
+        for row_s in range(y_s, y_e, block_rows):
+            rows = min(block_rows, y_e - row_s)
+            if x_e <= x_s or rows <= 0:
+                break
+
+            data = src_band.ReadAsArray(x_s - Off_x, row_s - Off_y,
+                                        x_e - x_s, rows).astype(np.float32)
+            mask = np.isnan(data)
+            if src_ndv is not None:
+                mask |= data == src_ndv
+            if valid_range is not None:
+                mask |= data < np.min(valid_range)
+                mask |= data > np.max(valid_range)
+            data[mask] = ndv
+
+            data_out = dst_band.ReadAsArray(x_s, row_s, x_e - x_s, rows)
+            data_out = np.where(data_out == ndv, data, data_out)
+            dst_band.WriteArray(data_out, x_s, row_s)
+        src_ds = None
+
+    dst_band = None
+    dst_ds = None
+
+    if is_cog:
+        src_ds = gdal.Open(tiff_name, gdal.GA_Update)
+        try:
+            Save_as_COG(output_name, src_ds, profile)
+        finally:
+            src_ds = None
+            gdal.GetDriverByName("GTiff").Delete(tiff_name)
+
+    return geo_out
+
+
+def Merge_and_reproject_Dataset_GDAL(input_names, output_name, epsg_to,
+                                     latlim=None, lonlim=None):
+    """
+    Merge the input files into one file and reproject it by using gdal.Warp.
+    With latlim and lonlim the output is clipped while it is warped, gdal
+    writes it chunk by chunk, so no full mosaic is created.
+
+    Keyword Arguments:
+    input_names -- [input data], list of input filenames of the tiff files
+    output_name -- output data, output filename of the merged file
+    epsg_to -- integer, the EPSG code of the output dataset
+    latlim -- [ymin, ymax], in the output projection
+    lonlim -- [xmin, xmax], in the output projection
+    """
+    if latlim is None or lonlim is None:
+        outputBounds = None
+    else:
+        outputBounds = [lonlim[0], latlim[0], lonlim[1], latlim[1]]
+
+    Run_gdal_function(gdal.Warp, output_name, list(input_names),
+                      options=['-overwrite', '-wm', '80%'],
+                      outputBounds=outputBounds,
+                      format='GTiff',
+                      dstSRS='EPSG:{}'.format(epsg_to),
+                      multithread=True,
+                      creationOptions=['TILED=YES',
+                                       'BIGTIFF=YES',
+                                       'COMPRESS=DEFLATE',
+                                       'NUM_THREADS=ALL_CPUS'])
 
     return output_name
 
-def Clip_Dataset_GDAL(input_name, output_name, latlim, lonlim):
+
+def Clip_Dataset_GDAL(input_name, output_name, latlim, lonlim,
+                      dtype=np.float32):
     """
     Clip the data to the defined extend of the user (latlim, lonlim)
-     by using the gdal_translate executable of gdal.
+     by using gdal.Translate.
 
     Keyword Arguments:
     input_name -- input data, input directory and filename of the tiff file
     output_name -- output data, output filename of the clipped file
     latlim -- [ymin, ymax]
     lonlim -- [xmin, xmax]
+    dtype -- numpy dtype of the clipped file, None for the input data type
     """
-    # Get environmental variable
-    # WA_env_paths = os.environ["GDAL_DRIVER"].split(';')
-    # GDAL_env_path = WA_env_paths[0]
-    # GDAL_TRANSLATE_PATH = os.path.join(GDAL_env_path, 'gdal_translate.exe')
-    GDAL_TRANSLATE_PATH = 'gdal_translate.exe'
-
-    # find path to the executable
-    FullCmd = '{exe} ' \
-              '-projwin {lon_w} {lat_n} {lon_e} {lat_s} ' \
-              '-ot Float32 ' \
-              '-of GTiff ' \
-              '"{file_i}" ' \
-              '"{file_o}"'.format(
-                  exe=GDAL_TRANSLATE_PATH,
-                  lon_w=lonlim[0],
-                  lat_n=latlim[1],
-                  lon_e=lonlim[1],
-                  lat_s=latlim[0],
-                  file_i=input_name.replace('"', '""'),
-                  file_o=output_name.replace('"', '""'))
-    # FullCmd = ' '.join([
-    #     GDAL_TRANSLATE_PATH,
-    #     '-projwin %s %s %s %s -of GTiff "%s" "%s"' % (
-    #         lonlim[0], latlim[1], lonlim[1], latlim[0],
-    #         input_name,
-    #         output_name
-    #     )
-    # ])
-    Run_command_window(FullCmd)
+    kwargs = {}
+    if dtype is not None:
+        kwargs['outputType'] = gdal_array.NumericTypeCodeToGDALTypeCode(
+            np.dtype(dtype).type)
+    Run_gdal_function(gdal.Translate, output_name, input_name,
+                      projWin=[lonlim[0], latlim[1], lonlim[1], latlim[0]],
+                      format='GTiff', **kwargs)
 
     return ()
 
@@ -1399,6 +3383,427 @@ def Clip_Data(input_file, latlim, lonlim):
     return data, Geo_out
 
 
+# Cached warp plans of Get_warp_plan, the oldest plans are dropped first
+# when the plans hold more than WARP_PLANS_BYTES, e.g. 32 bytes per target
+# pixel for Bilinear
+WARP_PLANS = {}
+WARP_PLANS_BYTES = 512 * 1024 ** 2
+
+
+def Transform_points(x, y, epsg_from, epsg_to):
+    """
+    This function transforms coordinates from one EPSG code to another
+
+    Keyword arguments:
+    x, y -- [array], coordinates in epsg_from
+    epsg_from -- integer, the EPSG code of x and y
+    epsg_to -- integer, the EPSG code of the output
+    """
+    if int(epsg_from) == int(epsg_to):
+        return x, y
+
+    try:
+        from pyproj import Transformer
+        transformer = Transformer.from_crs(int(epsg_from), int(epsg_to),
+                                           always_xy=True)
+        return transformer.transform(x, y)
+    except ImportError:
+        inProj = Proj(init='epsg:%d' % int(epsg_from))
+        outProj = Proj(init='epsg:%d' % int(epsg_to))
+        return transform(inProj, outProj, x, y)
+
+
+def Get_warp_pixels(geo_from, epsg_from, shape_from, geo_to, epsg_to):
+    """
+    This function yields, per block of rows, the fractional column and row
+    in the geo_to grid of the pixel centres of the geo_from grid
+
+    Keyword arguments:
+    geo_from -- geotransform of the pixels
+    epsg_from -- integer, the EPSG code of geo_from
+    shape_from -- (rows, columns) of the pixels
+    geo_to -- geotransform of the grid
+    epsg_to -- integer, the EPSG code of geo_to
+    """
+    rows, cols = int(shape_from[0]), int(shape_from[1])
+    block_rows = max(1, 2 ** 20 // max(cols, 1))
+    x = geo_from[0] + (np.arange(cols) + 0.5) * geo_from[1]
+
+    for row_s in range(0, rows, block_rows):
+        row_e = min(row_s + block_rows, rows)
+        y = geo_from[3] + (np.arange(row_s, row_e) + 0.5) * geo_from[5]
+        xx, yy = np.meshgrid(x, y)
+        xx, yy = Transform_points(xx.ravel(), yy.ravel(), epsg_from, epsg_to)
+
+        col_f = (np.asarray(xx) - geo_to[0]) / geo_to[1]
+        row_f = (np.asarray(yy) - geo_to[3]) / geo_to[5]
+        yield row_s * cols, row_e * cols, col_f, row_f
+
+
+def Get_warp_boxes(geo_from, epsg_from, shape_from, geo_to, epsg_to):
+    """
+    This function yields, per block of rows, the fractional column and row
+    ranges in the geo_to grid of the pixels of the geo_from grid, spanned by
+    the upper left and lower right pixel corners, as GDAL does for average
+
+    Keyword arguments:
+    geo_from -- geotransform of the pixels
+    epsg_from -- integer, the EPSG code of geo_from
+    shape_from -- (rows, columns) of the pixels
+    geo_to -- geotransform of the grid
+    epsg_to -- integer, the EPSG code of geo_to
+    """
+    rows, cols = int(shape_from[0]), int(shape_from[1])
+    block_rows = max(1, 2 ** 20 // max(cols + 1, 1))
+    x = geo_from[0] + np.arange(cols + 1) * geo_from[1]
+
+    for row_s in range(0, rows, block_rows):
+        row_e = min(row_s + block_rows, rows)
+        y = geo_from[3] + np.arange(row_s, row_e + 1) * geo_from[5]
+        xx, yy = np.meshgrid(x, y)
+        xx, yy = Transform_points(xx.ravel(), yy.ravel(), epsg_from, epsg_to)
+
+        col_f = ((np.asarray(xx) - geo_to[0]) / geo_to[1]).reshape(
+            row_e - row_s + 1, cols + 1)
+        row_f = ((np.asarray(yy) - geo_to[3]) / geo_to[5]).reshape(
+            row_e - row_s + 1, cols + 1)
+        col_min = np.minimum(col_f[:-1, :-1], col_f[1:, 1:]).ravel()
+        col_max = np.maximum(col_f[:-1, :-1], col_f[1:, 1:]).ravel()
+        row_min = np.minimum(row_f[:-1, :-1], row_f[1:, 1:]).ravel()
+        row_max = np.maximum(row_f[:-1, :-1], row_f[1:, 1:]).ravel()
+        yield row_s * cols, row_e * cols, col_min, col_max, row_min, row_max
+
+
+def Get_warp_overlaps(v_min, v_max, size):
+    """
+    This function returns the first and last + 1 pixel of fractional ranges
+    along one axis of a grid, clipped to the grid, at least one pixel if the
+    range is inside of the grid, as GDAL does for average
+
+    Keyword arguments:
+    v_min, v_max -- [array], fractional ranges
+    size -- integer, number of pixels along the axis
+    """
+    i_min = np.maximum(np.floor(v_min + 1e-10), 0).astype(np.int64)
+    i_max = np.minimum(np.ceil(v_max - 1e-10), size).astype(np.int64)
+    i_max = np.where((i_min == i_max) & (i_max < size), i_max + 1, i_max)
+    return i_min, i_max
+
+
+def Get_warp_plan(geo_from, epsg_from, shape_from,
+                  geo_to, epsg_to, shape_to, method=1) -> dict:
+    """
+    This function returns the warp plan from one grid to another. The plan
+    holds the resampling index maps and weights, it is computed once and
+    cached on (source grid, target grid, method), so a time series sharing
+    one grid is warped with a gather or weighted sum per slice. Bilinear
+    uses the source pixels around the target pixel centre, neighbours
+    outside of the source are left out and the weights of the others are
+    normalised, as GDAL does. Average weights the source pixels by their
+    overlap with the target pixel, as gdal.GRA_Average.
+
+    Keyword arguments:
+    geo_from, geo_to -- geotransforms of the source and target grid
+    epsg_from, epsg_to -- integers, the EPSG codes of the grids
+    shape_from, shape_to -- (rows, columns) of the grids
+    method -- 1 = Nearest Neighbour, 2 = Bilinear, 4 = average
+    """
+    key = (tuple(float(v) for v in geo_from), int(epsg_from),
+           tuple(int(v) for v in shape_from),
+           tuple(float(v) for v in geo_to), int(epsg_to),
+           tuple(int(v) for v in shape_to), int(method))
+    if key in WARP_PLANS:
+        return WARP_PLANS[key]
+
+    rows_from, cols_from = key[2]
+    rows_to, cols_to = key[5]
+    size_from = rows_from * cols_from
+    size_to = rows_to * cols_to
+    index_type = np.int32 if size_from < 2 ** 31 and size_to < 2 ** 31 \
+        else np.int64
+
+    plan = {
+        'method': int(method),
+        'shape_from': key[2],
+        'shape_to': key[5]
+    }
+
+    if method == 1:
+        # nearest source pixel of every target pixel
+        index = np.full(size_to, -1, dtype=index_type)
+        for p_s, p_e, col_f, row_f in Get_warp_pixels(
+                geo_to, epsg_to, key[5], geo_from, epsg_from):
+            col = np.floor(col_f)
+            row = np.floor(row_f)
+            inside = (col >= 0) & (col < cols_from) & \
+                (row >= 0) & (row < rows_from)
+            index[p_s:p_e][inside] = (row[inside] * cols_from +
+                                      col[inside]).astype(index_type)
+        plan['index'] = index
+
+    if method == 2:
+        # four neighbours and bilinear weights of every target pixel
+        indices = np.full((4, size_to), -1, dtype=index_type)
+        weights = np.zeros((4, size_to), dtype=np.float32)
+        for p_s, p_e, col_f, row_f in Get_warp_pixels(
+                geo_to, epsg_to, key[5], geo_from, epsg_from):
+            inside = (col_f >= 0) & (col_f < cols_from) & \
+                (row_f >= 0) & (row_f < rows_from)
+            col_f = col_f[inside] - 0.5
+            row_f = row_f[inside] - 0.5
+            col = np.floor(col_f)
+            row = np.floor(row_f)
+            dx = col_f - col
+            dy = row_f - row
+
+            neighbours = [(row, col, (1 - dx) * (1 - dy)),
+                          (row, col + 1, dx * (1 - dy)),
+                          (row + 1, col, (1 - dx) * dy),
+                          (row + 1, col + 1, dx * dy)]
+            for i, (n_row, n_col, n_weight) in enumerate(neighbours):
+                n_inside = (n_row >= 0) & (n_row < rows_from) & \
+                    (n_col >= 0) & (n_col < cols_from)
+                indices[i, p_s:p_e][inside] = np.where(
+                    n_inside, n_row * cols_from + n_col, -1).astype(index_type)
+                weights[i, p_s:p_e][inside] = np.where(n_inside, n_weight, 0.0)
+        plan['indices'] = indices
+        plan['weights'] = weights
+
+    if method == 4:
+        # source pixels of every target pixel, weighted by their overlap
+        # with the target pixel in the source grid, averaged with bincount
+        index_to, index_from, weight = [], [], []
+        for p_s, p_e, col_min, col_max, row_min, row_max in Get_warp_boxes(
+                geo_to, epsg_to, key[5], geo_from, epsg_from):
+            col_s, col_e = Get_warp_overlaps(col_min, col_max, cols_from)
+            row_s, row_e = Get_warp_overlaps(row_min, row_max, rows_from)
+            inside = np.flatnonzero((col_s < col_e) & (row_s < row_e))
+            ncols = (col_e - col_s)[inside]
+            count = ncols * (row_e - row_s)[inside]
+
+            # one entry per overlapping source pixel
+            entry = np.repeat(np.arange(len(inside)), count)
+            k = np.arange(int(count.sum())) - np.repeat(
+                np.cumsum(count) - count, count)
+            col = col_s[inside][entry] + k % ncols[entry]
+            row = row_s[inside][entry] + k // ncols[entry]
+
+            pixel = inside[entry]
+            weight_x = np.minimum(col + 1, col_max[pixel]) - \
+                np.maximum(col, col_min[pixel])
+            weight_y = np.minimum(row + 1, row_max[pixel]) - \
+                np.maximum(row, row_min[pixel])
+
+            index_to.append((p_s + pixel).astype(index_type))
+            index_from.append((row * cols_from + col).astype(index_type))
+            weight.append(np.maximum(weight_x * weight_y,
+                                     1e-10).astype(np.float32))
+        plan['index_to'] = np.concatenate(index_to)
+        plan['index_from'] = np.concatenate(index_from)
+        plan['weight'] = np.concatenate(weight)
+
+    plan['nbytes'] = sum(value.nbytes for value in plan.values()
+                         if isinstance(value, np.ndarray))
+    if plan['nbytes'] <= WARP_PLANS_BYTES:
+        while len(WARP_PLANS) > 0 and plan['nbytes'] + sum(
+                cached['nbytes'] for cached in WARP_PLANS.values()) > \
+                WARP_PLANS_BYTES:
+            WARP_PLANS.pop(next(iter(WARP_PLANS)))
+        WARP_PLANS[key] = plan
+    return plan
+
+
+def Get_warp_coverage(plan) -> np.ndarray:
+    """
+    This function returns the target pixels of a warp plan that have a
+    source pixel, whether valid or not
+
+    Keyword arguments:
+    plan -- dictionary, warp plan of Get_warp_plan
+    """
+    if plan['method'] == 2:
+        covered = (plan['indices'] >= 0).any(axis=0)
+    elif plan['method'] == 4:
+        size_to = plan['shape_to'][0] * plan['shape_to'][1]
+        covered = np.bincount(plan['index_to'], minlength=size_to) > 0
+    else:
+        covered = plan['index'] >= 0
+    return covered.reshape(plan['shape_to'])
+
+
+def Apply_warp_plan(plan, data, ndv=None) -> np.ndarray:
+    """
+    This function warps an array with a warp plan from Get_warp_plan. Nodata
+    and np.nan source pixels are skipped, target pixels without valid source
+    pixel are np.nan.
+
+    Keyword arguments:
+    plan -- dictionary, warp plan
+    data -- [array], 2D array on the source grid of the plan
+    ndv -- number, nodata value of data
+    """
+    src = np.array(data, dtype=np.float64).ravel()
+    if ndv is not None:
+        src[src == ndv] = np.nan
+    size_to = plan['shape_to'][0] * plan['shape_to'][1]
+
+    if plan['method'] == 1:
+        data_end = np.full(size_to, np.nan)
+        inside = plan['index'] >= 0
+        data_end[inside] = src[plan['index'][inside]]
+
+    if plan['method'] == 2:
+        values = src[np.maximum(plan['indices'], 0)]
+        weights = np.where((plan['indices'] >= 0) & ~np.isnan(values),
+                           plan['weights'], 0.0)
+        values[np.isnan(values)] = 0.0
+        weights_sum = weights.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data_end = (values * weights).sum(axis=0) / weights_sum
+        data_end[weights_sum == 0] = np.nan
+
+    if plan['method'] == 4:
+        values = src[plan['index_from']]
+        valid = ~np.isnan(values)
+        index_to = plan['index_to'][valid]
+        weight = plan['weight'][valid]
+        data_sum = np.bincount(index_to, weights=values[valid] * weight,
+                               minlength=size_to)
+        weight_sum = np.bincount(index_to, weights=weight, minlength=size_to)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            data_end = data_sum / weight_sum
+        data_end[weight_sum == 0] = np.nan
+
+    return data_end.reshape(plan['shape_to'])
+
+
+TARGET_GRIDS = {}
+
+
+def Get_target_grid(grid) -> dict:
+    """
+    This function returns the target grid of the output. A reference raster
+    is opened once and cached.
+
+    Keyword arguments:
+    grid -- string, path to a reference raster, or dictionary,
+            {'geo':, 'shape':, 'epsg':, 'method':}, geotransform,
+            (rows, columns), EPSG code (4326) and warp method (1) of
+            Get_warp_plan, the reference raster may be given as 'file'
+
+    Returns:
+    grid -- dictionary, {'geo':, 'shape':, 'epsg':, 'method':}
+    """
+    if isinstance(grid, str):
+        grid = {'file': grid}
+
+    conf = {'geo': None, 'shape': None, 'epsg': 4326, 'method': 1}
+    conf.update(grid)
+
+    if conf.get('file') is not None:
+        if conf['file'] not in TARGET_GRIDS.keys():
+            dest = gdal.Open(conf['file'])
+            if dest is None:
+                raise IHEFileError(conf['file']) from None
+            TARGET_GRIDS[conf['file']] = {
+                'geo': list(dest.GetGeoTransform()),
+                'shape': (dest.RasterYSize, dest.RasterXSize),
+                'epsg': Get_epsg(dest)
+            }
+            dest = None
+        conf.update(TARGET_GRIDS[conf['file']])
+
+    for key in ['geo', 'shape']:
+        if conf[key] is None:
+            raise IHEKeyError(key, list(grid.keys())) from None
+    return conf
+
+
+def Warp_to_target_grid(data, geo, projection, ndv, grid) -> tuple:
+    """
+    This function warps one converted array to the target grid with a
+    cached warp plan, so every date of a product reuses the plan.
+
+    Keyword arguments:
+    data -- [array], 2D data
+    geo -- [minimum lon, pixelsize, rotation, maximum lat, rotation,
+            pixelsize], (geospatial dataset)
+    projection -- "WGS84" or integer, the EPSG code of data
+    ndv -- number, nodata value of data
+    grid -- target grid, see Get_target_grid
+
+    Returns:
+    data -- [array], float32 data on the target grid, nodata is ndv
+    geo -- geotransform of the target grid
+    epsg -- integer, the EPSG code of the target grid
+    """
+    grid = Get_target_grid(grid)
+    if projection in ['', 'WGS84']:
+        epsg_from = 4326
+    else:
+        epsg_from = int(projection)
+
+    plan = Get_warp_plan(geo, epsg_from, data.shape,
+                         grid['geo'], grid['epsg'], grid['shape'],
+                         grid['method'])
+    data_end = Apply_warp_plan(plan, data, ndv)
+
+    if ndv is not None:
+        data_end[np.isnan(data_end)] = ndv
+    return data_end.astype(np.float32), list(grid['geo']), grid['epsg']
+
+
+def Reproject_with_warp_plan(g, dest, epsg_from, epsg_to, method=1):
+    """
+    This function reprojects a gdal dataset into the grid of a gdal dataset
+    with a cached warp plan. Lanczos and rotated grids are reprojected by
+    gdal.ReprojectImage. As with gdal.ReprojectImage, target pixels outside
+    of the source keep the values of dest, 0 for a new MEM dataset, and
+    target pixels of nodata source pixels are the source nodata value.
+
+    Keyword arguments:
+    g -- gdal dataset, source
+    dest -- gdal dataset, target, e.g. a MEM dataset
+    epsg_from -- integer, the EPSG code of g
+    epsg_to -- integer, the EPSG code of dest
+    method -- 1,2,3,4 = Nearest Neighbour, Bilinear, lanzcos, average
+    """
+    geo_from = g.GetGeoTransform()
+    geo_to = dest.GetGeoTransform()
+
+    if method in [1, 2, 4] and geo_from[2] == geo_from[4] == 0 and \
+            geo_to[2] == geo_to[4] == 0:
+        plan = Get_warp_plan(geo_from, epsg_from,
+                             (g.RasterYSize, g.RasterXSize),
+                             geo_to, epsg_to,
+                             (dest.RasterYSize, dest.RasterXSize), method)
+
+        band = g.GetRasterBand(1)
+        ndv = band.GetNoDataValue()
+        data = Apply_warp_plan(plan, band.ReadAsArray(), ndv)
+        if ndv is not None:
+            data[np.isnan(data)] = ndv
+
+        band_to = dest.GetRasterBand(1)
+        covered = Get_warp_coverage(plan)
+        data = np.where(covered, data, band_to.ReadAsArray())
+        band_to.WriteArray(data)
+    else:
+        resample = {
+            1: gdal.GRA_NearestNeighbour,
+            2: gdal.GRA_Bilinear,
+            3: gdal.GRA_Lanczos,
+            4: gdal.GRA_Average
+        }
+        osng = osr.SpatialReference()
+        osng.ImportFromEPSG(int(epsg_to))
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(int(epsg_from))
+        gdal.ReprojectImage(g, dest, wgs84.ExportToWkt(), osng.ExportToWkt(),
+                            resample[method])
+    return dest
+
+
 def reproject_dataset_epsg(dataset, pixel_spacing, epsg_to, method=2):
     """
     A sample function to reproject and resample a GDAL dataset from within
@@ -1449,8 +3854,6 @@ def reproject_dataset_epsg(dataset, pixel_spacing, epsg_to, method=2):
     # 2) Define the UK OSNG, see <http://spatialreference.org/ref/epsg/27700/>
     osng = osr.SpatialReference()
     osng.ImportFromEPSG(epsg_to)
-    wgs84 = osr.SpatialReference()
-    wgs84.ImportFromEPSG(epsg_from)
 
     inProj = Proj(init='epsg:%d' % epsg_from)
     outProj = Proj(init='epsg:%d' % epsg_to)
@@ -1487,25 +3890,14 @@ def reproject_dataset_epsg(dataset, pixel_spacing, epsg_to, method=2):
     dest.SetGeoTransform(new_geo)
     dest.SetProjection(osng.ExportToWkt())
 
-    # Perform the projection/resampling
-    if method == 1:
-        gdal.ReprojectImage(g, dest, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_NearestNeighbour)
-    if method == 2:
-        gdal.ReprojectImage(g, dest, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_Bilinear)
-    if method == 3:
-        gdal.ReprojectImage(g, dest, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_Lanczos)
-    if method == 4:
-        gdal.ReprojectImage(g, dest, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_Average)
+    # Perform the projection/resampling, with the cached warp plan
+    Reproject_with_warp_plan(g, dest, epsg_from, epsg_to, method)
     return dest, ulx, lry, lrx, uly, epsg_to
 
 
 def reproject_MODIS(input_name, output_name, epsg_to):
     '''
-    Reproject the merged data file by using gdalwarp. The input projection must be the MODIS projection.
+    Reproject the merged data file by using gdal.Warp. The input projection must be the MODIS projection.
     The output projection can be defined by the user.
 
     Keywords arguments:
@@ -1514,43 +3906,13 @@ def reproject_MODIS(input_name, output_name, epsg_to):
     epsg_to -- integer
         The EPSG code of the output dataset
     '''
-    # Define the output name
-    # name_out = ''.join(input_name.split(".")[:-1]) + '_reprojected.tif'
-
-    # Get environmental variable
-    # WA_env_paths = os.environ["GDAL_DRIVER"].split(';')
-    # GDAL_env_path = WA_env_paths[0]
-    # GDALWARP_PATH = os.path.join(GDAL_env_path, 'gdalwarp.exe')
-    GDALWARP_PATH = 'gdalwarp.exe'
-
-    # find path to the executable
-    FullCmd = '{exe} ' \
-              '-overwrite ' \
-              '-s_srs "+proj=sinu ' \
-              '+lon_0=0 +x_0=0 +y_0=0 ' \
-              '+a=6371007.181 +b=6371007.181 ' \
-              '+units=m ' \
-              '+no_defs" ' \
-              '-t_srs EPSG:{epsg} ' \
-              '-of GTiff ' \
-              '"{file_i}" ' \
-              '"{file_o}"'.format(
-                  exe=GDALWARP_PATH,
-                  epsg=epsg_to,
-                  file_i=input_name.replace('"', '""'),
-                  file_o=output_name.replace('"', '""'))
-    # FullCmd = ' '.join([GDALWARP_PATH,
-    #                     '-overwrite -s_srs '
-    #                     '"+proj=sinu '
-    #                     '+lon_0=0 '
-    #                     '+x_0=0 '
-    #                     '+y_0=0 '
-    #                     '+a=6371007.181 '
-    #                     '+b=6371007.181 '
-    #                     '+units=m +no_defs"',
-    #                     '-t_srs EPSG:%s'
-    #                     ' -of GTiff' % (epsg_to), input_name, output_name])
-    Run_command_window(FullCmd)
+    Run_gdal_function(gdal.Warp, output_name, input_name,
+                      options=['-overwrite'],
+                      srcSRS='+proj=sinu +lon_0=0 +x_0=0 +y_0=0 '
+                             '+a=6371007.181 +b=6371007.181 '
+                             '+units=m +no_defs',
+                      dstSRS='EPSG:{}'.format(epsg_to),
+                      format='GTiff')
 
     return output_name
 
@@ -1603,8 +3965,6 @@ def reproject_dataset_example(dataset, dataset_example, method=1):
     # Set the EPSG codes
     osng = osr.SpatialReference()
     osng.ImportFromEPSG(epsg_to)
-    wgs84 = osr.SpatialReference()
-    wgs84.ImportFromEPSG(epsg_from)
 
     # Get shape and geo transform from example
     geo_land = gland.GetGeoTransform()
@@ -1617,19 +3977,8 @@ def reproject_dataset_example(dataset, dataset_example, method=1):
     dest1.SetGeoTransform(geo_land)
     dest1.SetProjection(osng.ExportToWkt())
 
-    # Perform the projection/resampling
-    if method == 1:
-        gdal.ReprojectImage(g, dest1, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_NearestNeighbour)
-    if method == 2:
-        gdal.ReprojectImage(g, dest1, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_Bilinear)
-    if method == 3:
-        gdal.ReprojectImage(g, dest1, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_Lanczos)
-    if method == 4:
-        gdal.ReprojectImage(g, dest1, wgs84.ExportToWkt(), osng.ExportToWkt(),
-                            gdal.GRA_Average)
+    # Perform the projection/resampling, with the cached warp plan
+    Reproject_with_warp_plan(g, dest1, epsg_from, epsg_to, method)
     return (dest1)
 
 
@@ -1726,51 +4075,159 @@ def Get_epsg(g, extension='tiff'):
     return (epsg_to)
 
 
-def gap_filling(dataset, NoDataValue, method=1):
+def gap_filling_tile(data, mask, window, method=1, halo=64):
+    """
+    This function fills the no data gaps of one tile. The tile is read with
+    a halo around it. Nearest neighbour is exact if the nearest valid pixel
+    is within the halo. Linear interpolation is approximate: it triangulates
+    the valid pixels of the halo only, so near tile edges the triangles, and
+    the filled values, may differ from those of the full raster.
+
+    Keyword arguments:
+    data -- [array], tile with halo
+    mask -- [array], True for the valid pixels of data
+    window -- [y start, y end, x start, x end], tile in data
+    method -- 1: nearest neighbour, 2: linear interpolation
+    halo -- number, halo size in pixels, np.inf if data is the full raster
+
+    Returns:
+    filled tile, mask of the filled or valid pixels of the tile
+    """
+    y_s, y_e, x_s, x_e = window
+    data_end = np.array(data[y_s:y_e, x_s:x_e], dtype=np.float64)
+    gaps = ~mask[y_s:y_e, x_s:x_e]
+    resolved = ~gaps
+
+    if not gaps.any():
+        return data_end, resolved
+    if not mask.any():
+        # no valid pixel in the halo, or nothing to fill with
+        if np.isinf(halo):
+            resolved[:] = True
+        return data_end, resolved
+
+    if method == 1:
+        # nearest valid pixel by distance transform
+        distance, indices = scipy.ndimage.distance_transform_edt(
+            ~mask, return_indices=True)
+        fill = gaps & (distance[y_s:y_e, x_s:x_e] <= halo)
+        y_id = indices[0][y_s:y_e, x_s:x_e][fill]
+        x_id = indices[1][y_s:y_e, x_s:x_e][fill]
+        data_end[fill] = data[y_id, x_id]
+        resolved |= fill
+
+    if method == 2:
+        # only the valid pixels within the halo of a gap are nodes
+        nodes = mask & (scipy.ndimage.distance_transform_edt(mask) <= halo)
+        yy, xx = np.nonzero(nodes)
+        gy, gx = np.nonzero(gaps)
+
+        values = np.full(gy.shape, np.nan)
+        if len(yy) > 2:
+            try:
+                interp0 = scipy.interpolate.LinearNDInterpolator(
+                    np.column_stack((xx, yy)), data[yy, xx])
+                values = interp0(gx + x_s, gy + y_s)
+            except RuntimeError:
+                # QhullError, e.g. all nodes on one line
+                pass
+        data_end[gaps] = values
+        # pixels outside the convex hull of the full raster stay np.nan
+        if np.isinf(halo):
+            resolved[:] = True
+        else:
+            resolved[gaps] = ~np.isnan(values)
+
+    return data_end, resolved
+
+
+def gap_filling(dataset, NoDataValue, method=1, tile_size=None, halo=64,
+                cores=1):
     """
-    This function fills the no data gaps in a numpy array
+    This function fills the no data gaps in a numpy array. Nearest neighbour
+    uses a distance transform. With tile_size the raster is filled per tile
+    with a halo, so memory stays bounded and tiles run in parallel; tiles
+    with gaps further than the halo from a valid pixel are filled again with
+    a doubled halo. Tiled nearest neighbour equals the untiled fill, tiled
+    linear interpolation approximates it, see gap_filling_tile; use
+    tile_size None for the exact linear fill.
 
     Keyword arguments:
     dataset -- 'C:/'  path to the source data (dataset that must be filled)
     NoDataValue -- Value that must be filled
+    method -- 1: nearest neighbour, 2: linear interpolation
+    tile_size -- integer, tile size in pixels, None for the whole raster
+    halo -- integer, halo size in pixels around each tile
+    cores -- integer, number of parallel jobs of joblib
     """
     try:
         if dataset.split('.')[-1] == 'tif':
             # Open the numpy array
             data = Open_tiff_array(dataset)
-            Save_as_tiff = 1
+            is_save = 1
         else:
             data = dataset
-            Save_as_tiff = 0
+            is_save = 0
     except:
         data = dataset
-        Save_as_tiff = 0
+        is_save = 0
 
     # fill the no data values
-    if NoDataValue is np.nan:
+    if np.isnan(NoDataValue):
         mask = ~(np.isnan(data))
     else:
         mask = ~(data == NoDataValue)
-    xx, yy = np.meshgrid(np.arange(data.shape[1]), np.arange(data.shape[0]))
-    xym = np.vstack((np.ravel(xx[mask]), np.ravel(yy[mask]))).T
-    data0 = np.ravel(data[:, :][mask])
 
-    if method == 1:
-        interp0 = scipy.interpolate.NearestNDInterpolator(xym, data0)
-        data_end = interp0(np.ravel(xx), np.ravel(yy)).reshape(xx.shape)
+    size_Y, size_X = data.shape
+    halo = max(int(halo), 1)
+    if tile_size is None:
+        tile_size = max(size_Y, size_X)
+    tile_size = int(tile_size)
+
+    windows = [(y_s, min(y_s + tile_size, size_Y),
+                x_s, min(x_s + tile_size, size_X))
+               for y_s in range(0, size_Y, tile_size)
+               for x_s in range(0, size_X, tile_size)]
+
+    data_end = np.array(data, dtype=np.float64)
+    while len(windows) > 0:
+        args = []
+        for y_s, y_e, x_s, x_e in windows:
+            py_s, py_e = max(y_s - halo, 0), min(y_e + halo, size_Y)
+            px_s, px_e = max(x_s - halo, 0), min(x_e + halo, size_X)
+            if (py_e - py_s, px_e - px_s) == (size_Y, size_X):
+                tile_halo = np.inf
+            else:
+                tile_halo = halo
+            args.append((data[py_s:py_e, px_s:px_e],
+                         mask[py_s:py_e, px_s:px_e],
+                         [y_s - py_s, y_e - py_s, x_s - px_s, x_e - px_s],
+                         method, tile_halo))
+
+        if cores == 1 or len(args) == 1:
+            results = [gap_filling_tile(*arg) for arg in args]
+        else:
+            results = Parallel(n_jobs=cores)(
+                delayed(gap_filling_tile)(*arg) for arg in args)
 
-    if method == 2:
-        interp0 = scipy.interpolate.LinearNDInterpolator(xym, data0)
-        data_end = interp0(np.ravel(xx), np.ravel(yy)).reshape(xx.shape)
+        windows_left = []
+        for (y_s, y_e, x_s, x_e), (tile, resolved) in zip(windows, results):
+            data_end[y_s:y_e, x_s:x_e][resolved] = tile[resolved]
+            if not resolved.all():
+                windows_left.append((y_s, y_e, x_s, x_e))
+
+        windows = windows_left
+        halo = halo * 2
 
-    if Save_as_tiff == 1:
+    if is_save == 1:
         EndProduct = dataset[:-4] + '_GF.tif'
 
         # collect the geoinformation
         geo_out, proj, size_X, size_Y = Open_array_info(dataset)
 
         # Save the filled array as geotiff
-        Save_as_tiff(name=EndProduct, data=data_end, geo=geo_out, projection=proj)
+        Save_as_tiff(name=EndProduct, data=data_end, geo=geo_out,
+                     projection=proj, ndv=NoDataValue)
 
     else:
         EndProduct = data_end
@@ -1778,96 +4235,194 @@ def gap_filling(dataset, NoDataValue, method=1):
     return (EndProduct)
 
 
-def Get3Darray_time_series_monthly(Data_Path, Startdate, Enddate, Example_data=None):
+def Get_example_tiff(Example_data, cache_dir):
     """
-    This function creates a datacube
+    This function returns the path of the example GeoTIFF, a netcdf or gdal
+    example dataset is saved as "example.tif" in cache_dir, so parallel
+    workers can open it.
+
+    Keyword arguments:
+    Example_data -- 'C:/....../.tif', 'C:/....../.nc' or a gdal dataset
+    cache_dir -- string, directory of the cache
+    """
+    if isinstance(Example_data, str):
+        Example_data = os.path.abspath(Example_data)
+        if os.path.splitext(Example_data)[-1] == '.tif':
+            return Example_data
+
+    example_tiff = os.path.join(cache_dir, 'example.tif')
+
+    # if netCDF
+    if isinstance(Example_data, str) and \
+            os.path.splitext(Example_data)[-1] == '.nc':
+        geo_out, projection, size_X, size_Y, size_Z, Time = Open_nc_info(
+            Example_data)
+        if projection == 4326:
+            projection = ''
+        data = Open_nc_array(Example_data, "Landuse")
+        Save_as_tiff(name=example_tiff, data=data, geo=geo_out,
+                     projection=projection)
+
+    # use the input parameter as it is already an example file
+    else:
+        driver = gdal.GetDriverByName("GTiff")
+        dst_ds = driver.CreateCopy(example_tiff, Example_data, 0)
+        dst_ds = None
+    return example_tiff
+
+
+def Get_time_series_slice(file_name_path, example_tiff, cube_name, index,
+                          method=4):
+    """
+    This function reads one date of a datacube, reprojected to the example
+    file, and writes it as float32 into its time step of the cube file.
+
+    Keyword arguments:
+    file_name_path -- string, absolute path to the tiff of the date
+    example_tiff -- string, absolute path to the example tiff, or None
+    cube_name -- string, absolute path to the .npy cube
+    index -- integer, time step of the date in the cube
+    method -- 1,2,3,4 resample method of reproject_dataset_example
+    """
+    if example_tiff is None:
+        Array_one_date = Open_tiff_array(file_name_path)
+    else:
+        dest = reproject_dataset_example(file_name_path, example_tiff,
+                                         method=method)
+        Array_one_date = dest.GetRasterBand(1).ReadAsArray()
+        dest = None
+
+    # the time steps of the workers do not overlap
+    dataTot = np.load(cube_name, mmap_mode='r+')
+    dataTot[index, :, :] = Array_one_date
+    dataTot.flush()
+    del dataTot
+    return index
+
+
+def Get3Darray_time_series(Data_Path, Dates, File_name_format,
+                           Example_data=None, cache_dir=None, cores=1,
+                           method=4):
+    """
+    This function creates a datacube as a memory-mapped float32 array. The
+    "cube_*.npy" file in cache_dir is preallocated, the dates are read, and
+    reprojected to the example file, in parallel and written straight into
+    their time steps, so the cube is never held in memory and every pixel
+    is stored once. The cube caches the slices: the "cube_*.json" file holds
+    the modification time of the source of every time step, only dates
+    without slice or with a newer source are read again. The cube is opened
+    copy-on-write. Only absolute paths are used, the working directory is
+    unchanged.
 
     Keyword arguments:
     Data_Path -- 'product/monthly'
         str: Path to the dataset
-    Startdate -- 'YYYY-mm-dd'
-        str: startdate of the 3D array
-    Enddate -- 'YYYY-mm-dd'
-        str: enddate of the 3D array
+    Dates -- pandas.DatetimeIndex
+        dates of the 3D array
+    File_name_format -- 'monthly_{:%Y.%m.%d}.tif'
+        str: end of the file name of a date, formatted with the date
     Example_data: -- 'C:/....../.tif'
         str: Path to an example tiff file (all arrays will be reprojected to this example)
+    cache_dir -- str: directory of the cube, default Data_Path/cache
+    cores -- integer, number of parallel jobs of joblib
+    method -- 1,2,3,4 resample method of reproject_dataset_example
     """
+    Data_Path = os.path.abspath(Data_Path)
+    if cache_dir is None:
+        cache_dir = os.path.join(Data_Path, 'cache')
+    cache_dir = os.path.abspath(cache_dir)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    # example grid, part of the cache key
+    if Example_data is None:
+        example_tiff = None
+        example_key = 'native'
+    else:
+        example_tiff = Get_example_tiff(Example_data, cache_dir)
+        example_key = '{}'.format(Open_array_info(example_tiff))
 
-    # Get a list of dates that needs to be reprojected
-    Dates = pd.date_range(Startdate, Enddate, freq='MS')
-
-    # Change Working directory
-    os.chdir(Data_Path)
-    i = 0
-
-    # Loop over the months
+    file_names = []
     for Date in Dates:
-
-        # Create the end monthly file name
-        End_tiff_file_name = 'monthly_%d.%02d.01.tif' % (Date.year, Date.month)
-
         # Search for this file in directory
-        file_name = glob.glob('*%s' % End_tiff_file_name)
+        End_tiff_file_name = File_name_format.format(Date)
+        file_name = sorted(glob.glob(
+            os.path.join(Data_Path, '*%s' % End_tiff_file_name)))
+        if len(file_name) == 0:
+            raise IHEFileError(os.path.join(Data_Path, End_tiff_file_name))
 
         # Select the first file that is found
-        file_name_path = os.path.join(Data_Path, file_name[0])
-
-        # Check if an example file is selected
-        if Example_data is not None:
-
-            # If it is the first day set the example gland file
-            if Date == Dates[0]:
-
-                # Check the format to read general info
-
-                # if Tiff
-                if os.path.splitext(Example_data)[-1] == '.tif':
-                    geo_out, proj, size_X, size_Y = Open_array_info(Example_data)
-                    dataTot = np.zeros([len(Dates), size_Y, size_X])
-
-                # if netCDF
-                if os.path.splitext(Example_data)[-1] == '.nc':
-                    geo_out, projection, size_X, size_Y, size_Z, Time = Open_nc_info(
-                        Example_data)
-                    dataTot = np.zeros([len(Dates), size_Y, size_X])
-
-                    # Create memory file for reprojection
-                    data = Open_nc_array(Example_data, "Landuse")
-                    driver = gdal.GetDriverByName("MEM")
-                    gland = driver.Create('', int(size_X), int(size_Y), 1,
-                                          gdal.GDT_Float32)
-                    srse = osr.SpatialReference()
-                    if projection == '' or projection == 4326:
-                        srse.SetWellKnownGeogCS("WGS84")
-                    else:
-                        srse.SetWellKnownGeogCS(projection)
-                    gland.SetProjection(srse.ExportToWkt())
-                    gland.GetRasterBand(1).SetNoDataValue(-9999)
-                    gland.SetGeoTransform(geo_out)
-                    gland.GetRasterBand(1).WriteArray(data)
+        file_names.append(file_name[0])
+    file_times = [os.path.getmtime(file_name_path)
+                  for file_name_path in file_names]
+
+    key = hashlib.md5('{f}|{e}|{m}'.format(
+        f='|'.join(file_names), e=example_key, m=method).encode()).hexdigest()
+    cube_name = os.path.join(cache_dir, 'cube_{k}.npy'.format(k=key))
+    times_name = os.path.join(cache_dir, 'cube_{k}.json'.format(k=key))
+
+    with File_lock(cube_name):
+        cube_times = [None] * len(file_names)
+        if os.path.exists(cube_name) and os.path.exists(times_name):
+            with open(times_name, 'r') as fp:
+                cube_times = json.load(fp)
+        else:
+            # preallocate the cube on the grid of the example or first date
+            info = Open_array_info(
+                file_names[0] if example_tiff is None else example_tiff)
+            cube_tmp = '{n}.{p}.npy'.format(n=cube_name[:-4], p=os.getpid())
+            dataTot = np.lib.format.open_memmap(
+                cube_tmp, mode='w+', dtype=np.float32,
+                shape=(len(file_names), info[3], info[2]))
+            del dataTot
+            os.replace(cube_tmp, cube_name)
+
+        # reproject the dates without slice, or with a newer source
+        indices = [i for i in range(len(file_names))
+                   if cube_times[i] != file_times[i]]
+        if cores == 1 or len(indices) < 2:
+            for i in indices:
+                Get_time_series_slice(file_names[i], example_tiff, cube_name,
+                                      i, method)
+        else:
+            Parallel(n_jobs=cores)(
+                delayed(Get_time_series_slice)(file_names[i], example_tiff,
+                                               cube_name, i, method)
+                for i in indices)
 
-                # use the input parameter as it is already an example file
-                else:
-                    gland = Example_data
+        if len(indices) > 0 or not os.path.exists(times_name):
+            times_tmp = '{n}.{p}'.format(n=times_name, p=os.getpid())
+            with open(times_tmp, 'w') as fp:
+                json.dump(file_times, fp)
+            os.replace(times_tmp, times_name)
 
-            # reproject dataset
-            dest = reproject_dataset_example(file_name_path, gland, method=4)
-            Array_one_date = dest.GetRasterBand(1).ReadAsArray()
+    return (np.load(cube_name, mmap_mode='c'))
 
-        # if there is no example dataset defined
-        else:
 
-            # Get the properties from the first file
-            if Date is Dates[0]:
-                geo_out, proj, size_X, size_Y = Open_array_info(file_name_path)
-                dataTot = np.zeros([len(Dates), size_Y, size_X])
-            Array_one_date = Open_tiff_array(file_name_path)
+def Get3Darray_time_series_monthly(Data_Path, Startdate, Enddate,
+                                   Example_data=None, cache_dir=None, cores=1):
+    """
+    This function creates a datacube, see Get3Darray_time_series
 
-        # Create the 3D array
-        dataTot[i, :, :] = Array_one_date
-        i += 1
+    Keyword arguments:
+    Data_Path -- 'product/monthly'
+        str: Path to the dataset
+    Startdate -- 'YYYY-mm-dd'
+        str: startdate of the 3D array
+    Enddate -- 'YYYY-mm-dd'
+        str: enddate of the 3D array
+    Example_data: -- 'C:/....../.tif'
+        str: Path to an example tiff file (all arrays will be reprojected to this example)
+    cache_dir -- str: directory of the cached slices, default Data_Path/cache
+    cores -- integer, number of parallel jobs of joblib
+    """
+    # Get a list of dates that needs to be reprojected
+    Dates = pd.date_range(Startdate, Enddate, freq='MS')
 
-    return (dataTot)
+    return (Get3Darray_time_series(Data_Path, Dates, 'monthly_{:%Y.%m}.01.tif',
+                                   Example_data=Example_data,
+                                   cache_dir=cache_dir, cores=cores,
+                                   method=4))
 
 
 def Vector_to_Raster(Dir, shapefile_name, reference_raster_data_name):
@@ -1932,22 +4487,71 @@ def Vector_to_Raster(Dir, shapefile_name, reference_raster_data_name):
     return (Raster_Basin)
 
 
-def Moving_average(dataset, Moving_front, Moving_back):
+def Moving_average_chunk(dataset, dataset_out, Moving_front, Moving_back):
+    """
+    This function applies the moving averages over a chunk of a 3D matrix
+    with cumulative sums, each window sum is the difference of two sums.
+    NaN values are skipped, as in np.nanmean.
+
+    Keyword Arguments:
+    dataset -- 3D matrix [time, ysize, xsize], chunk of the input
+    dataset_out -- 3D matrix [time, ysize, xsize], chunk of the output
+    Moving_front -- Amount of time steps that must be considered in the front of the current month
+    Moving_back -- Amount of time steps that must be considered in the back of the current month
+    """
+    data = np.array(dataset, dtype=np.float64)
+    valid = ~np.isnan(data)
+    data[~valid] = 0.0
+
+    # cumulative sums with a leading zero time step
+    shape = (data.shape[0] + 1,) + data.shape[1:]
+    data_sum = np.zeros(shape, dtype=np.float64)
+    np.cumsum(data, axis=0, out=data_sum[1:])
+    data_count = np.zeros(shape, dtype=np.int32)
+    np.cumsum(valid, axis=0, out=data_count[1:])
+
+    window = Moving_back + Moving_front + 1
+    count = data_count[window:] - data_count[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dataset_out[...] = (data_sum[window:] - data_sum[:-window]) / count
+    return dataset_out
+
+
+def Moving_average(dataset, Moving_front, Moving_back, dtype=np.float64,
+                   chunk_size=2 ** 22, cores=1):
     """
     This function applies the moving averages over a 3D matrix called dataset.
+    The matrix is processed in spatial chunks of rows, in parallel threads.
 
     Keyword Arguments:
     dataset -- 3D matrix [time, ysize, xsize]
     Moving_front -- Amount of time steps that must be considered in the front of the current month
     Moving_back -- Amount of time steps that must be considered in the back of the current month
+    dtype -- numpy dtype, output data type, e.g. np.float32
+    chunk_size -- integer, number of values [time, ysize, xsize] per chunk
+    cores -- integer, number of parallel jobs of joblib
     """
-
-    dataset_out = np.zeros((int(np.shape(dataset)[0]) - Moving_back - Moving_front,
-                            int(np.shape(dataset)[1]), int(np.shape(dataset)[2])))
-
-    for i in range(Moving_back, (int(np.shape(dataset)[0]) - Moving_front)):
-        dataset_out[i - Moving_back, :, :] = np.nanmean(
-            dataset[i - Moving_back: i + 1 + Moving_front, :, :], 0)
+    size_T, size_Y, size_X = (int(size) for size in np.shape(dataset))
+    dataset_out = np.zeros((max(size_T - Moving_back - Moving_front, 0),
+                            size_Y, size_X), dtype=dtype)
+    if dataset_out.shape[0] == 0:
+        return (dataset_out)
+
+    rows = max(1, int(chunk_size) // max(size_T * size_X, 1))
+    chunks = [slice(y_s, min(y_s + rows, size_Y))
+              for y_s in range(0, size_Y, rows)]
+
+    if cores == 1 or len(chunks) == 1:
+        for chunk in chunks:
+            Moving_average_chunk(dataset[:, chunk, :],
+                                 dataset_out[:, chunk, :],
+                                 Moving_front, Moving_back)
+    else:
+        Parallel(n_jobs=cores, prefer='threads')(
+            delayed(Moving_average_chunk)(dataset[:, chunk, :],
+                                          dataset_out[:, chunk, :],
+                                          Moving_front, Moving_back)
+            for chunk in chunks)
 
     return (dataset_out)
 
@@ -1976,32 +4580,18 @@ def Get_ordinal(Startdate, Enddate, freq='MS'):
 
 def Create_Buffer(Data_In, Buffer_area):
     '''
-    This function creates a 3D array which is used to apply the moving window
+    This function creates a buffer around the pixels larger than zero, a
+    block of 2 times Buffer_area + 1 will be 1 if there is such a pixel in
+    the middle. The square dilation is separable, a running maximum over the
+    rows followed by one over the columns, so the cost does not grow with
+    Buffer_area.
     '''
-
-    # Buffer_area = 2 # A block of 2 times Buffer_area + 1 will be 1 if there is the pixel in the middle is 1
-    Data_Out = np.empty((len(Data_In), len(Data_In[1])))
-    Data_Out[:, :] = Data_In
-    for ypixel in range(0, Buffer_area + 1):
-
-        for xpixel in range(1, Buffer_area + 1):
-
-            if ypixel == 0:
-                for xpixel in range(1, Buffer_area + 1):
-                    Data_Out[:, 0:-xpixel] += Data_In[:, xpixel:]
-                    Data_Out[:, xpixel:] += Data_In[:, :-xpixel]
-
-                for ypixel in range(1, Buffer_area + 1):
-                    Data_Out[ypixel:, :] += Data_In[:-ypixel, :]
-                    Data_Out[0:-ypixel, :] += Data_In[ypixel:, :]
-
-            else:
-                Data_Out[0:-xpixel, ypixel:] += Data_In[xpixel:, :-ypixel]
-                Data_Out[xpixel:, ypixel:] += Data_In[:-xpixel, :-ypixel]
-                Data_Out[0:-xpixel, 0:-ypixel] += Data_In[xpixel:, ypixel:]
-                Data_Out[xpixel:, 0:-ypixel] += Data_In[:-xpixel, ypixel:]
-
-    Data_Out[Data_Out > 0.1] = 1
-    Data_Out[Data_Out <= 0.1] = 0
-
-    return (Data_Out)
+    Data_Out = np.asarray(Data_In) > 0
+    if Buffer_area > 0:
+        size = 2 * int(Buffer_area) + 1
+        Data_Out = scipy.ndimage.maximum_filter1d(
+            Data_Out.view(np.uint8), size, axis=1, mode='constant', cval=0)
+        scipy.ndimage.maximum_filter1d(
+            Data_Out, size, axis=0, mode='constant', cval=0, output=Data_Out)
+
+    return (Data_Out.astype(np.float64))
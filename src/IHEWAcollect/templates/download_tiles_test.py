@@ -1,118 +1,261 @@
-import numpy as np
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import json
 import os
 import re
+import time
+
+import numpy as np
+import requests
+
+LISTINGS = {}
+LISTINGS_TTL = 3600
+LISTINGS_HREF = re.compile(r'href=["\']?([^"\'\s>]+\.hdf)["\'\s>]', re.IGNORECASE)
+
+MODIS_TILES_TXT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'USGS', 'sn_gring_10deg.txt')
+MODIS_TILES_NPY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'USGS', 'sn_bound_10deg.npy')
+MODIS_TILES = None
+MODIS_RADIUS = 6371007.181
+MODIS_TILE_SIZE = 2.0 * np.pi * MODIS_RADIUS / 36.0
+
+
+def Get_listing_dir(conf) -> str:
+    """Get directory of the cached tile indices
+
+    The indices are kept in the shared raw-download cache, if one is set,
+    else in the remote folder of the workspace.
+
+    Args:
+        conf (dict): Configuration of the download, see Download.
+
+    Returns:
+        str: Directory of the cached tile indices.
+    """
+    if conf['cache'] is None:
+        return os.path.join(conf['folder']['r'], 'listings')
+    return os.path.join(conf['cache']['path'], 'listings')
+
+
+def Get_listing(url, file='', save_list=False, ttl=None,
+                listing_dir=None) -> dict:
+    """Get tile index of a directory
+
+    The directory page is fetched once and parsed into a tile to filename
+    index, {'h10v05': 'MOD16A2GF.A2020001.h10v05.061.2020009012345.hdf'}.
+    The index and the page are cached in memory and in listing_dir for ttl
+    seconds, so all tiles and all workers of a date share one request. A
+    page without tiles is not cached. The page is saved on hits too.
+
+    Args:
+        url (str): Url of the directory.
+        file (str): File to save the page, if save_list.
+        save_list (bool): Is to save the page.
+        ttl (int): Seconds the index is valid, LISTINGS_TTL if None.
+        listing_dir (str): Directory of the cached indices, see
+            Get_listing_dir, in memory only if None.
+
+    Returns:
+        dict: Tile index.
+    """
+    if ttl is None:
+        ttl = LISTINGS_TTL
+    now = time.time()
+
+    cache = '{}.json'.format(hashlib.sha1(url.encode('utf-8')).hexdigest())
+    if listing_dir is not None:
+        cache = os.path.join(listing_dir, cache)
+    listing = None
+
+    # cached by this process
+    if cache in LISTINGS.keys():
+        listing_time, listing = LISTINGS[cache]
+        if now - listing_time >= ttl:
+            listing = None
+
+    # cached by another worker
+    if listing is None and listing_dir is not None and \
+            os.path.exists(cache) and \
+            now - os.path.getmtime(cache) < ttl:
+        try:
+            with open(cache, 'r') as fp:
+                listing = json.load(fp)
+        except ValueError:
+            pass
+        else:
+            LISTINGS[cache] = (os.path.getmtime(cache), listing)
+
+    if listing is None:
+        # Connect to server
+        conn = requests.get(url)
+
+        index = {}
+        for href in LISTINGS_HREF.findall(conn.text):
+            fname = href.split('/')[-1]
+            parts = fname.split('.')
+            if len(parts) > 4:
+                index[parts[-4]] = fname
+        listing = {'index': index, 'text': conn.text}
+
+        if conn.ok and len(index) > 0:
+            if listing_dir is not None:
+                os.makedirs(listing_dir, exist_ok=True)
+                cache_tmp = '{}.{}'.format(cache, os.getpid())
+                with open(cache_tmp, 'w') as fp:
+                    json.dump(listing, fp)
+                os.replace(cache_tmp, cache)
+            LISTINGS[cache] = (now, listing)
+
+    if save_list:
+        # Scan available data on the server
+        with open(file, 'w') as fp:
+            fp.write(listing['text'])
+    return listing['index']
+
 
 def start_download_tiles(date, file,
                          url_server, url_dir, username, password,
-                         latlim, lonlim, fname_r, file_r, save_list, output_folder) -> tuple:
+                         latlim, lonlim, fname_r, file_r, save_list, listing_dir) -> tuple:
     """Get tile name
     """
     url = '{sr}{dr}'.format(sr=url_server, dr=url_dir)
     # print('url: "{f}"'.format(f=url))
 
-    # latmin = int(np.floor((90.0 - latlim[1]) / 10.))
-    # latmax = int(np.ceil((90.0 - latlim[0]) / 10.))
-    # lonmin = int(np.floor((180.0 + lonlim[0]) / 10.)-1)
-    # lonmax = int(np.ceil((180.0 + lonlim[1]) / 10.))
-
-    # if(latmin==latmax): latmax = latmin+1
-    # if(lonmin==lonmax): lonmax = lonmin+1
-
     # Define which MODIS tiles are required
-    TilesVertical, TilesHorizontal = Get_tiles_from_txt(output_folder, "", latlim, lonlim)
-    # print('Tiles :',TilesVertical, TilesHorizontal)
-
-    lat_steps = range(int(TilesVertical[0]), int(TilesVertical[1])+1, 1)
-    lon_steps = range(int(TilesHorizontal[0]), int(TilesHorizontal[1])+1, 1)
+    tiles = Get_tiles(latlim, lonlim)
 
-    # lat_steps = range(latmin, latmax, 1)
-    # lon_steps = range(lonmin, lonmax, 1)
-    # print(lat_steps, lon_steps)
+    # One request for all tiles of the date
+    index = Get_listing(url, file, save_list, listing_dir=listing_dir)
 
     fnames = []
     files = []
     lonlat = []
-    for lon_step in lon_steps:
+    for lon_step, lat_step in tiles:
         string_long = 'h{:02d}'.format(lon_step)
-        for lat_step in lat_steps:
-            string_lat = 'v{:02d}'.format(lat_step)
-            lonlat.append([lon_step * 10.0 - 180.0, 90.0 - lat_step * 10.0])
+        string_lat = 'v{:02d}'.format(lat_step)
+        lonlat.append([lon_step * 10.0 - 180.0, 90.0 - lat_step * 10.0])
 
-            ctime = start_download_scan(url, file, username, password,
-                                        string_lat, string_long, save_list)
+        ctime = ''
+        tile = '{lon}{lat}'.format(lat=string_lat, lon=string_long)
+        if tile in index.keys():
+            ctime = index[tile].split('.')[-2]
 
-            if ctime != '':
-                fnames.append(fname_r.format(dtime=date, ctime=ctime,
-                                             lat=string_lat, lon=string_long))
-                files.append(file_r.format(dtime=date, ctime=ctime,
-                                           lat=string_lat, lon=string_long))
+        if ctime != '':
+            fnames.append(fname_r.format(dtime=date, ctime=ctime,
+                                         lat=string_lat, lon=string_long))
+            files.append(file_r.format(dtime=date, ctime=ctime,
+                                       lat=string_lat, lon=string_long))
 
     return fnames, files, lonlat
 
-def start_download_scan(url, file, username, password, lat, lon, save_list) -> tuple:
+def start_download_scan(url, file, username, password, lat, lon, save_list,
+                        listing_dir=None) -> tuple:
     """Scan tile name
     """
     ctime = ''
 
-    #Connect to server
-    conn = requests.get(url)
-    soup = BeautifulSoup(conn.content, "html.parser")
-    # if __this.conf['is_save_list']:
-    if (save_list):
-        # Scan available data on the server
-        # Curl or Menually to CSR-v3.1.html
-        with open(file, 'w') as fp:
-            conn = requests.get(url)
-            fp.write(conn.text)
-
-    # # Scan available data on local drive
-    # conn = open(file, 'r', encoding='UTF8')
-    # soup = BeautifulSoup(conn, "html.parser")
-
-    for ele in soup.findAll('a', attrs={'href': re.compile('(?i)(hdf)$')}):
-        # print('{lon}{lat}'.format(lat=lat, lon=lon) == ele['href'].split('.')[-4],
-        #       ele)
-        if '{lon}{lat}'.format(lat=lat, lon=lon) == ele['href'].split('.')[-4]:
-            ctime = ele['href'].split('.')[-2]
-    
+    index = Get_listing(url, file, save_list, listing_dir=listing_dir)
+
+    tile = '{lon}{lat}'.format(lat=lat, lon=lon)
+    if tile in index.keys():
+        ctime = index[tile].split('.')[-2]
+
     return ctime
 
-def Get_tiles_from_txt(output_folder, hdf_library, latlim, lonlim):
+def Build_tiles_index(file_txt=MODIS_TILES_TXT, file_npy=MODIS_TILES_NPY) -> np.ndarray:
+    """Build MODIS tile index
 
-    import urllib
-
-    # Download list (txt file on the internet) which includes the lat and lon information of the MODIS tiles
-    nameDownloadtext = 'https://modis-land.gsfc.nasa.gov/pdf/sn_gring_10deg.txt'
-    file_nametext = os.path.join(output_folder, nameDownloadtext.split('/')[-1])
-    if hdf_library == None:
-        Path_to_txt_file = ""
-    else:
-        Path_to_txt_file = hdf_library
-        file_nametext = os.path.join(Path_to_txt_file, nameDownloadtext.split('/')[-1])
-    if not os.path.exists(file_nametext):
-        try:
-            try:
-                urllib.urlretrieve(nameDownloadtext, file_nametext)
-            except:
-                data = urllib.request.urlopen(nameDownloadtext).read()
-                with open(file_nametext, "wb") as fp:
-                    fp.write(data)
-        except:
-            from requests.packages.urllib3.exceptions import InsecureRequestWarning
-            requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-            with open(file_nametext, "wb") as fp:
-                data = requests.get(nameDownloadtext, verify=False)
-                fp.write(data.content)
-
-    # Open text file with tiles which is downloaded before
-    tiletext=np.genfromtxt(file_nametext,skip_header=7,skip_footer=1,usecols=(0,1,2,3,4,5,6,7,8,9))
-    tiletext2=tiletext[tiletext[:,2]>=-900,:]
-
-    # This function converts the values in the text file into horizontal and vertical number of the tiles which must be downloaded to cover the extent defined by the user
-    TilesVertical, TilesHorizontal = Tiles_to_download(tiletext2=tiletext2,lonlim1=lonlim,latlim1=latlim)
+    The land tiles of sn_gring_10deg.txt are saved as rows of
+    [v, h, lat min, lat max, lon min, lon max], the lat/lon bounds of the
+    tile corners.
+
+    Args:
+        file_txt (str): Path of sn_gring_10deg.txt.
+        file_npy (str): Path of the index.
+
+    Returns:
+        numpy.ndarray: Tile index.
+    """
+    tiletext = np.genfromtxt(file_txt, skip_header=7, skip_footer=1,
+                             usecols=(0, 1, 2, 3, 4, 5, 6, 7, 8, 9))
+    tiletext = tiletext[tiletext[:, 2] >= -900, :]
+
+    index = np.empty([len(tiletext), 6])
+    index[:, 0] = tiletext[:, 0]
+    index[:, 1] = tiletext[:, 1]
+    index[:, 2] = np.min(tiletext[:, [3, 5, 7, 9]], axis=1)
+    index[:, 3] = np.max(tiletext[:, [3, 5, 7, 9]], axis=1)
+    index[:, 4] = np.min(tiletext[:, [2, 4, 6, 8]], axis=1)
+    index[:, 5] = np.max(tiletext[:, [2, 4, 6, 8]], axis=1)
+
+    np.save(file_npy, index)
+    return index
+
+
+def Get_tiles(latlim, lonlim, tiles=None) -> list:
+    """Get MODIS tiles of a bbox
 
+    The tiles are the land tiles of the packaged index, whose sinusoidal
+    extent intersects the bbox. The bbox is [lat s, lat n] x [lon w, lon e]
+    on the sphere; at a latitude its sinusoidal x range is
+    R * lon * cos(lat), so over the latitudes shared with a tile the bbox
+    covers x from R * w * cos(lat) to R * e * cos(lat), with the cos(lat)
+    that widens the range.
+
+    Args:
+        latlim (list): [ymin, ymax].
+        lonlim (list): [xmin, xmax].
+        tiles (numpy.ndarray): Tile index, the packaged index if None.
+
+    Returns:
+        list: [[h, v], ...], intersecting tiles.
+    """
+    global MODIS_TILES
+    if tiles is None:
+        if MODIS_TILES is None:
+            if os.path.exists(MODIS_TILES_NPY):
+                MODIS_TILES = np.load(MODIS_TILES_NPY)
+            else:
+                MODIS_TILES = Build_tiles_index()
+        tiles = MODIS_TILES
+
+    v = tiles[:, 0]
+    h = tiles[:, 1]
+
+    # latitudes of the tile rows, exact in the sinusoidal projection
+    tile_lat_n = 90.0 - v * 10.0
+    tile_lat_s = tile_lat_n - 10.0
+    lat_s = np.maximum(tile_lat_s, latlim[0])
+    lat_n = np.minimum(tile_lat_n, latlim[1])
+    is_lat = lat_s < lat_n
+
+    # cos(lat) range over the shared latitudes
+    cos_s = np.cos(np.radians(lat_s))
+    cos_n = np.cos(np.radians(lat_n))
+    cos_max = np.where(np.logical_and(lat_s <= 0.0, lat_n >= 0.0), 1.0,
+                       np.maximum(cos_s, cos_n))
+    cos_min = np.minimum(cos_s, cos_n)
+
+    lon_w = np.radians(lonlim[0]) * MODIS_RADIUS
+    lon_e = np.radians(lonlim[1]) * MODIS_RADIUS
+    x_w = lon_w * np.where(lon_w < 0.0, cos_max, cos_min)
+    x_e = lon_e * np.where(lon_e > 0.0, cos_max, cos_min)
+
+    tile_x_w = (h - 18.0) * MODIS_TILE_SIZE
+    tile_x_e = tile_x_w + MODIS_TILE_SIZE
+    is_lon = np.logical_and(tile_x_w < x_e, tile_x_e > x_w)
+
+    is_tile = np.logical_and(is_lat, is_lon)
+    return [[int(h_i), int(v_i)] for h_i, v_i in zip(h[is_tile], v[is_tile])]
+
+
+def Get_tiles_from_txt(output_folder, hdf_library, latlim, lonlim):
+    """Get MODIS tile ranges of a bbox
+
+    The ranges of the tiles of ``Get_tiles``, from the packaged index, so
+    no text file is downloaded or parsed.
+    """
+    TilesVertical, TilesHorizontal = Tiles_to_download(tiletext2=None,lonlim1=lonlim,latlim1=latlim)
     return(TilesVertical, TilesHorizontal)
 
 def Tiles_to_download(tiletext2,lonlim1,latlim1):
@@ -120,32 +263,13 @@ def Tiles_to_download(tiletext2,lonlim1,latlim1):
     Defines the MODIS tiles that must be downloaded in order to cover the latitude and longitude limits
 
     Keywords arguments:
-    tiletext2 -- 'C:/file/to/path/' to path of the txt file with all the MODIS tiles extents
+    tiletext2 -- rows of [v, h, ...] of the MODIS tiles, see Build_tiles_index, the packaged index if None
     lonlim1 -- [ymin, ymax] (longitude limits of the chunk or whole image)
     latlim1 -- [ymin, ymax] (latitude limits of the chunk or whole image)
     '''
-    # calculate min and max longitude and latitude
-    # lat down    lat up      lon left     lon right
-    tiletextExtremes = np.empty([len(tiletext2),6])
-    tiletextExtremes[:,0] = tiletext2[:,0]
-    tiletextExtremes[:,1] = tiletext2[:,1]
-    tiletextExtremes[:,2] = np.minimum(tiletext2[:,3], tiletext2[:,9])
-    tiletextExtremes[:,3] = np.maximum(tiletext2[:,5], tiletext2[:,7])
-    tiletextExtremes[:,4] = np.minimum(tiletext2[:,2], tiletext2[:,4])
-    tiletextExtremes[:,5] = np.maximum(tiletext2[:,6], tiletext2[:,8])
-
-    # Define the upper left tile
-    latlimtiles1UL = tiletextExtremes[np.logical_and(tiletextExtremes[:,2] <= latlim1[1], tiletextExtremes[:,3] >= latlim1[1])]#tiletext2[:,3]>=latlim[0],tiletext2[:,4]>=latlim[0],tiletext2[:,5]>=latlim[0],tiletext2[:,6]>=latlim[0],tiletext2[:,7]>=latlim[0]))]
-    latlimtilesUL = latlimtiles1UL[np.logical_and(latlimtiles1UL[:,4] <= lonlim1[0], latlimtiles1UL[:,5] >= lonlim1[0])]
-
-    # Define the lower right tile
-    latlimtiles1LR = tiletextExtremes[np.logical_and(tiletextExtremes[:,2] <= latlim1[0], tiletextExtremes[:,3] >= latlim1[0])]#tiletext2[:,3]>=latlim[0],tiletext2[:,4]>=latlim[0],tiletext2[:,5]>=latlim[0],tiletext2[:,6]>=latlim[0],tiletext2[:,7]>=latlim[0]))]
-    latlimtilesLR = latlimtiles1LR[np.logical_and(latlimtiles1LR[:,4]<=lonlim1[1],latlimtiles1LR[:,5]>=lonlim1[1])]
-
-    # Define the total tile
-    TotalTiles = np.vstack([latlimtilesUL, latlimtilesLR])
+    TotalTiles = np.array(Get_tiles(latlim1, lonlim1, tiletext2), dtype=int).reshape(-1, 2)
 
     # Find the minimum horizontal and vertical tile value and the maximum horizontal and vertical tile value
-    TilesVertical = [TotalTiles[:,0].min(), TotalTiles[:,0].max()]
-    TilesHorizontal = [TotalTiles[:,1].min(), TotalTiles[:,1].max()]
-    return(TilesVertical, TilesHorizontal)
\ No newline at end of file
+    TilesVertical = [int(TotalTiles[:,1].min()), int(TotalTiles[:,1].max())]
+    TilesHorizontal = [int(TotalTiles[:,0].min()), int(TotalTiles[:,0].max())]
+    return(TilesVertical, TilesHorizontal)
@@ -5,9 +5,11 @@
 **Examples:**
 ::
 
-    from IHEWAcollect.templates.gis import GIS
+    from IHEWAcollect.templates.gis import GIS, GridSpec
 
     gis = GIS(workspace=path, is_print=True)
+    grid = GridSpec.from_product(product['data'])
+    y_id, x_id = grid.get_index(latlim, lonlim)
 """
 import inspect
 import os
@@ -36,6 +38,211 @@ except ImportError:
         IHEKeyError, IHEFileError
 
 
+class GridSpec(object):
+    """GridSpec class
+
+    Regular lat/lon grid of a product variable, built from the catalog
+    ``lat``, ``lon`` and ``dem`` entries. It converts bboxes to pixel
+    windows snapped to the pixel edges, for one bbox or for many bboxes at
+    once. Windows of one bbox are cached. Longitudes outside of the grid are
+    shifted into the grid range, so bboxes given in [0, 360] for a
+    [-180, 180] grid, or the other way around, give the same window.
+    Windows are clipped to the grid, a bbox crossing the east edge of the
+    grid (the antimeridian) is cut at the edge; download it as two regions
+    instead.
+
+    Args:
+        lat (dict): Latitude range, {'s':, 'n':, 'r':}.
+        lon (dict): Longitude range, {'w':, 'e':, 'r':}.
+        dem (dict): Grid size, {'w':, 'h':}, from lat and lon if None.
+        orient (str): First row at the 'n' north (GTiff) or 's' south.
+        transpose (bool): Array axes are [lon, lat] instead of [lat, lon].
+        wrap (bool): Longitudes are shifted into the grid, False for the
+          x, y of projected grids.
+
+    :Example:
+
+        >>> from IHEWAcollect.templates.gis import GridSpec
+        >>> grid = GridSpec(lat={'s': -50.0, 'n': 50.0, 'r': 0.05},
+        ...                 lon={'w': -180.0, 'e': 180.0, 'r': 0.05})
+        >>> grid.get_index([-1.0, 1.0], [30.0, 31.0])
+        (array([ 980, 1020]), array([4200, 4220]))
+        >>> grid.get_latlon([980, 1020], [4200, 4220])
+        (array([-1.,  1.]), array([30., 31.]))
+    """
+    # GridSpec objects of from_product and from_geo
+    grids = {}
+
+    def __init__(self, lat, lon, dem=None, orient='n', transpose=False,
+                 wrap=True):
+        """Class instantiation
+        """
+        self.lat_s = float(lat['s'])
+        self.lat_n = float(lat['n'])
+        self.lat_r = abs(float(lat['r']))
+        self.lon_w = float(lon['w'])
+        self.lon_e = float(lon['e'])
+        self.lon_r = abs(float(lon['r']))
+
+        if dem is None:
+            self.size_y = int(np.round((self.lat_n - self.lat_s) / self.lat_r))
+            self.size_x = int(np.round((self.lon_e - self.lon_w) / self.lon_r))
+        else:
+            self.size_y = int(dem['h'])
+            self.size_x = int(dem['w'])
+
+        if orient not in ['n', 's']:
+            raise IHEKeyError(orient, ['n', 's']) from None
+        self.orient = orient
+        self.transpose = transpose
+        self.wrap = wrap
+
+        self.__index = {}
+
+    @classmethod
+    def from_product(cls, data, orient='n', transpose=False, lon=None):
+        """Get GridSpec of a product
+
+        The GridSpec is created once per grid and shared by all callers.
+
+        Args:
+            data (dict): Product variable, conf['product']['data'].
+            orient (str): First row at the 'n' north (GTiff) or 's' south.
+            transpose (bool): Array axes are [lon, lat].
+            lon (dict): Longitude range, replaces data['lon'].
+
+        Returns:
+            :obj:`GridSpec`: Grid of the product.
+        """
+        lat = data['lat']
+        if lon is None:
+            lon = data['lon']
+        dem = data.get('dem', None)
+
+        key = (lat['s'], lat['n'], lat['r'], lon['w'], lon['e'], lon['r'],
+               None if dem is None else (dem['w'], dem['h']),
+               orient, transpose)
+        if key not in cls.grids:
+            cls.grids[key] = cls(lat, lon, dem, orient, transpose)
+        return cls.grids[key]
+
+    @classmethod
+    def from_geo(cls, geo, shape, wrap=True):
+        """Get GridSpec of a north up raster
+
+        The GridSpec is created once per grid and shared by all callers.
+
+        Args:
+            geo (list): [minimum lon, pixelsize, rotation, maximum lat,
+              rotation, pixelsize], (geospatial dataset).
+            shape (tuple): (ysize, xsize), size of the raster.
+            wrap (bool): Longitudes are shifted into the grid, False for
+              projected rasters.
+
+        Returns:
+            :obj:`GridSpec`: Grid of the raster.
+        """
+        key = ('geo', tuple(float(i) for i in geo),
+               tuple(int(i) for i in shape), wrap)
+        if key not in cls.grids:
+            cls.grids[key] = cls(
+                lat={'s': geo[3] + shape[0] * geo[5], 'n': geo[3],
+                     'r': geo[5]},
+                lon={'w': geo[0], 'e': geo[0] + shape[1] * geo[1],
+                     'r': geo[1]},
+                dem={'w': shape[1], 'h': shape[0]}, wrap=wrap)
+        return cls.grids[key]
+
+    def get_indices(self, latlims, lonlims) -> tuple:
+        """Get pixel windows of many bboxes
+
+        Args:
+            latlims (list): [[ymin, ymax], ...].
+            lonlims (list): [[xmin, xmax], ...].
+
+        Returns:
+            tuple: (y_id, x_id), arrays of [start, end] indices, shape (n, 2).
+        """
+        eps = 1e-6
+        lat = np.asarray(latlims, dtype=np.float64).reshape(-1, 2)
+        lon = np.asarray(lonlims, dtype=np.float64).reshape(-1, 2)
+
+        # shift longitudes outside of the grid into it, east after west
+        lon_w, lon_e = lon[:, 0], lon[:, 1]
+        if self.wrap:
+            lon_width = lon[:, 1] - lon[:, 0]
+            lon_width = np.where(lon_width >= 360.0, 360.0,
+                                 np.mod(lon_width, 360.0))
+            lon_w_shift = self.lon_w + np.mod(lon[:, 0] - self.lon_w, 360.0)
+            lon_w_shift = np.where(np.isclose(lon_w_shift - 360.0, self.lon_w),
+                                   self.lon_w, lon_w_shift)
+
+            is_shift = (lon_e <= lon_w) | (lon_e <= self.lon_w) | \
+                (lon_w >= self.lon_e)
+            lon_w = np.where(is_shift, lon_w_shift, lon_w)
+            lon_e = np.where(is_shift, lon_w_shift + lon_width, lon_e)
+
+        if self.orient == 'n':
+            rows = np.stack([
+                np.floor((self.lat_n - lat[:, 1]) / self.lat_r + eps),
+                np.ceil((self.lat_n - lat[:, 0]) / self.lat_r - eps)], axis=1)
+        else:
+            rows = np.stack([
+                np.floor((lat[:, 0] - self.lat_s) / self.lat_r + eps),
+                np.ceil((lat[:, 1] - self.lat_s) / self.lat_r - eps)], axis=1)
+        cols = np.stack([
+            np.floor((lon_w - self.lon_w) / self.lon_r + eps),
+            np.ceil((lon_e - self.lon_w) / self.lon_r - eps)], axis=1)
+
+        rows = np.clip(rows, 0, self.size_y).astype(int)
+        cols = np.clip(cols, 0, self.size_x).astype(int)
+
+        if self.transpose:
+            return cols, rows
+        return rows, cols
+
+    def get_index(self, latlim, lonlim) -> tuple:
+        """Get pixel window of a bbox
+
+        Args:
+            latlim (list): [ymin, ymax].
+            lonlim (list): [xmin, xmax].
+
+        Returns:
+            tuple: (y_id, x_id), [start, end] indices of the array axes.
+        """
+        key = (float(latlim[0]), float(latlim[1]),
+               float(lonlim[0]), float(lonlim[1]))
+        if key not in self.__index:
+            y_id, x_id = self.get_indices([latlim], [lonlim])
+            self.__index[key] = (y_id[0], x_id[0])
+
+        y_id, x_id = self.__index[key]
+        return y_id.copy(), x_id.copy()
+
+    def get_latlon(self, y_id, x_id) -> tuple:
+        """Get bbox of a pixel window
+
+        Args:
+            y_id (list): [start, end] indices of the first array axis.
+            x_id (list): [start, end] indices of the second array axis.
+
+        Returns:
+            tuple: (latlim, lonlim), pixel edges of the window.
+        """
+        if self.transpose:
+            rows, cols = np.asarray(x_id), np.asarray(y_id)
+        else:
+            rows, cols = np.asarray(y_id), np.asarray(x_id)
+
+        lonlim = cols * self.lon_r + self.lon_w
+        if self.orient == 'n':
+            latlim = self.lat_n - rows[::-1] * self.lat_r
+        else:
+            latlim = self.lat_s + rows * self.lat_r
+        return latlim.astype(np.float64), lonlim.astype(np.float64)
+
+
 class GIS(object):
     """This GIS class
 
@@ -157,8 +364,8 @@ class GIS(object):
                                    fun, prt, ext)
 
     def get_latlon_lim(self, arg_bbox):
-        prod_lat = self.product['data']['lat']
-        prod_lon = self.product['data']['lon']
+        prod_lat = self.__conf['product']['data']['lat']
+        prod_lon = self.__conf['product']['data']['lon']
         # prod_dem = self.product['data']['dem']
 
         # from osgeo import osr
@@ -204,22 +411,20 @@ class GIS(object):
         return arg_lat, arg_lon
 
     def get_latlon_index(self, arg_lat, arg_lon) -> tuple:
-        # prod_lat = self.product['data']['lat']
-        # prod_lon = self.product['data']['lon']
-        # prod_dem = self.product['data']['dem']
+        """Get pixel window
 
-        y_id = np.int16(
-            np.array([
-                3000 - np.ceil((arg_lat[1] + 60) * 20),
-                3000 - np.floor((arg_lat[0] + 60) * 20)
-            ]))
+        This function get the pixel window of a bbox on the product grid,
+        north up, see ``GridSpec``.
 
-        x_id = np.int16(
-            np.array([
-                np.floor((arg_lon[0]) * 20) + 3600,
-                np.ceil((arg_lon[1]) * 20) + 3600
-            ]))
-        return y_id, x_id
+        Args:
+            arg_lat (list): [ymin, ymax].
+            arg_lon (list): [xmin, xmax].
+
+        Returns:
+            tuple: (y_id, x_id), [start, end] indices.
+        """
+        grid = GridSpec.from_product(self.__conf['product']['data'])
+        return grid.get_index(arg_lat, arg_lon)
 
     def check_continent(self, arg_lat, arg_lon) -> list:
         """Check area located in continent or continents, based on HydroSHEDS
@@ -271,15 +476,42 @@ class GIS(object):
         # continents = []
         return continent_list
 
-    def load_file(self, file, band=1) -> np.ndarray:
+    def get_window(self, ds, window=None, bbox=None) -> tuple:
+        """Get pixel window
+
+        This function get the pixel window of a raster, from pixel indices or
+        from a bbox. The window is clipped to the raster size.
+
+        Args:
+            ds (:obj:`gdal.Dataset`): Opened gdal file.
+            window (list): Pixel indices, [y_id, x_id],
+                [[ystart, yend], [xstart, xend]].
+            bbox (dict): Spatial range, {'w':, 's':, 'e':, 'n':}.
+
+        Returns:
+            tuple: (xoff, yoff, xsize, ysize), arguments of ReadAsArray.
+        """
+        # collect imports GridSpec of this module
+        try:
+            from .collect import Get_tiff_window
+        except ImportError:
+            from IHEWAcollect.templates.collect import Get_tiff_window
+
+        return Get_tiff_window(ds, window, bbox)
+
+    def load_file(self, file, band=1, window=None, bbox=None) -> np.ndarray:
         """Get tif band data
 
-        This function get tif band as numpy.ndarray.
+        This function get tif band as numpy.ndarray. Only the pixels inside
+        window or bbox are read, when one of them is given.
 
         Args:
             file (str): 'C:/file/to/path/file.tif' or a gdal file (gdal.Open(file))
                 string that defines the input tif file or gdal file.
             band (int): Defines the band of the tif that must be opened.
+            window (list): Pixel indices, [y_id, x_id],
+                [[ystart, yend], [xstart, xend]].
+            bbox (dict): Spatial range, {'w':, 's':, 'e':, 'n':}.
 
         Returns:
             :obj:`numpy.ndarray`: Band data.
@@ -304,7 +536,8 @@ class GIS(object):
                         ds_band_scale = ds_band.GetScale()
                         # ds_band_unit = ds_band.GetUnitType()
 
-                        data = ds_band.ReadAsArray()
+                        xoff, yoff, xsize, ysize = self.get_window(ds, window, bbox)
+                        data = ds_band.ReadAsArray(xoff, yoff, xsize, ysize)
 
                         # Check data type
                         if isinstance(data, np.ma.MaskedArray):
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Running accumulators of templates.collect.Update_aggregate.
+"""
+# General modules
+import os
+
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Get_aggregate_path, \
+    Get_aggregate_period, Update_aggregate
+
+GEO = [30.0, 0.5, 0, 10.0, 0, -0.5]
+
+
+def _load(folder, period, stat):
+    return np.load(os.path.join(Get_aggregate_path(folder, 'month'),
+                                '.accumulators',
+                                '{p}.{s}.npy'.format(p=period, s=stat)))
+
+
+def test_Get_aggregate_period():
+    assert str(Get_aggregate_period('2020-02-25', 'dekad').date()) == \
+        '2020-02-21'
+    assert str(Get_aggregate_period('2020-02-25', 'month').date()) == \
+        '2020-02-01'
+    assert str(Get_aggregate_period('2020-02-25', 'year').date()) == \
+        '2020-01-01'
+
+
+def test_Update_aggregate(tmp_path):
+    folder = str(tmp_path)
+    data = np.array([[1.0, -9999.0], [np.nan, 4.0]], dtype=np.float32)
+    data_2 = np.array([[2.0, -9999.0], [np.nan, 8.0]], dtype=np.float32)
+
+    Update_aggregate(folder, data, GEO, '2020-01-01', -9999, 'month')
+    Update_aggregate(folder, data_2, GEO, '2020-01-02', -9999, 'month')
+    # rerun of a date
+    Update_aggregate(folder, data_2, GEO, '2020-01-02', -9999, 'month')
+    Update_aggregate(folder, data, GEO, '2020-02-01', -9999, 'month')
+
+    assert _load(folder, '2020.01.01', 'sum').tolist() == [[3.0, 0.0],
+                                                          [0.0, 12.0]]
+    assert _load(folder, '2020.01.01', 'count').tolist() == [[2, 0], [0, 2]]
+    assert _load(folder, '2020.01.01', 'max')[1, 1] == 8.0
+    assert _load(folder, '2020.02.01', 'count').tolist() == [[1, 0], [0, 1]]
+
+
+def test_Update_aggregate_grid(tmp_path):
+    folder = str(tmp_path)
+    data = np.ones((2, 2), dtype=np.float32)
+
+    Update_aggregate(folder, data, GEO, '2020-01-01', -9999, 'month')
+    # another bbox resets the accumulators of the period
+    Update_aggregate(folder, np.ones((3, 2), dtype=np.float32), GEO,
+                     '2020-01-02', -9999, 'month')
+    assert _load(folder, '2020.01.01', 'count').tolist() == [[1, 1]] * 3
+
+    Update_aggregate(folder, np.ones((3, 2), dtype=np.float32),
+                     [31.0] + GEO[1:], '2020-01-01', -9999, 'month')
+    assert _load(folder, '2020.01.01', 'count').tolist() == [[1, 1]] * 3
+    assert _load(folder, '2020.01.01', 'geo')[0] == 31.0
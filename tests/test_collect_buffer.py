@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Square buffers of templates.collect.Create_Buffer.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Create_Buffer
+
+
+def _buffer(Data_In, Buffer_area):
+    size_Y, size_X = Data_In.shape
+    Data_Out = np.zeros((size_Y, size_X))
+    for y, x in zip(*np.nonzero(Data_In > 0)):
+        Data_Out[max(y - Buffer_area, 0):y + Buffer_area + 1,
+                 max(x - Buffer_area, 0):x + Buffer_area + 1] = 1
+    return Data_Out
+
+
+def test_Create_Buffer():
+    rng = np.random.default_rng(0)
+    Data_In = np.where(rng.random((20, 30)) > 0.95, 2.5, 0.0)
+    Data_In[0, 0] = 1.0
+    Data_In[19, 29] = 1.0
+    Data_In[10, 10] = -1.0
+
+    for Buffer_area in [0, 1, 3]:
+        result = Create_Buffer(Data_In, Buffer_area)
+        assert result.dtype == np.float64
+        np.testing.assert_array_equal(result, _buffer(Data_In, Buffer_area))
+
+
+def test_Create_Buffer_block():
+    Data_In = np.zeros((7, 7))
+    Data_In[3, 3] = 1
+
+    result = Create_Buffer(Data_In, 2)
+    assert result.sum() == 25
+    assert (result[1:6, 1:6] == 1).all()
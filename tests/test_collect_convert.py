@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Nodata and scale conversion of templates.collect.Convert_nodata_scale.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Convert_nodata_scale
+
+
+def test_Convert_nodata_scale():
+    # raw int16 with fill value, valid range, scale factor and multiplier
+    data = np.array([[-32768, 0, 100],
+                     [-5, 20000, 30000]], dtype=np.int16)
+    result = Convert_nodata_scale(data, missing=-32768,
+                                  valid_range=[0, 25000],
+                                  scale=0.01, multiplier=0.5, ndv=-9999)
+
+    assert result.dtype == np.float32
+    assert np.allclose(result, [[-9999, 0.0, 0.5],
+                                [-9999, 100.0, -9999]])
+    assert data[0, 2] == 100
+
+
+def test_Convert_nodata_scale_ndv():
+    # NaN and out of range pixels are written as ndv, not as NaN
+    data = np.array([[np.nan, -1.0], [2.0, 4.0]], dtype=np.float32)
+    result = Convert_nodata_scale(data.copy(), valid_range=[0, np.inf],
+                                  multiplier=2.0, ndv=-9999)
+    assert result.tolist() == [[-9999, -9999], [4.0, 8.0]]
+
+    # without ndv they stay NaN
+    result = Convert_nodata_scale(data.copy(), valid_range=[0, np.inf])
+    assert np.isnan(result[0]).all()
+    assert result[1].tolist() == [2.0, 4.0]
+
+
+def test_Convert_nodata_scale_blocks():
+    # a masked 3D array in blocks of one row, reused as output
+    data = np.ma.masked_equal(
+        np.arange(24, dtype=np.float32).reshape(2, 3, 4), 5)
+    data.set_fill_value(-1)
+    result = Convert_nodata_scale(data, missing=-1, multiplier=10.0,
+                                  ndv=-9999, block_size=4)
+
+    expect = np.arange(24, dtype=np.float32).reshape(2, 3, 4) * 10.0
+    expect[0, 1, 1] = -9999
+    assert np.array_equal(result, expect)
+
+    with pytest.raises(ValueError):
+        Convert_nodata_scale(np.ones(3), dtype=np.int16)
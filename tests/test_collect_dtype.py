@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Storage data type of templates.collect.Get_dtype_policy.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Get_dtype_policy, \
+    Get_output_profile, Pack_integer
+
+
+def _conf(dtype='native', tiff='default', data=None):
+    if data is None:
+        data = {'dtype': {'r': 'int16', 'l': 'float32'},
+                'units': {'m': 0.01}}
+    return {'output': {'tiff': tiff, 'dtype': dtype},
+            'product': {'data': data}}
+
+
+def test_Get_dtype_policy():
+    data = {'dtype': {'r': 'uint16', 'l': 'float32'}, 'units': {'m': 0.1}}
+    assert Get_dtype_policy(data, -9999) == {
+        'dtype': 'int32', 'scale': 0.1, 'offset': 0.0}
+
+    data = {'dtype': {'r': 'float32', 'l': 'int8'}, 'units': {'m': 0.1}}
+    assert Get_dtype_policy(data, -9999) == {
+        'dtype': 'int16', 'scale': 1.0, 'offset': 0.0}
+
+    data = {'dtype': {'r': 'float32', 'l': 'float32'}, 'units': {'m': 1.0}}
+    assert Get_dtype_policy(data, -9999)['dtype'] == 'float32'
+
+    data = {'dtype': {'r': 'int16'}, 'units': {'m': 'x'}}
+    assert Get_dtype_policy(data, -9999)['dtype'] == 'float32'
+
+    # ndv out of the range of the type
+    data = {'dtype': {'r': 'int16'}, 'units': {'m': 1.0}}
+    assert Get_dtype_policy(data, -99999)['dtype'] == 'float32'
+
+
+def test_Get_output_profile():
+    profile = Get_output_profile(-9999, _conf())
+    assert profile['dtype'] == 'int16'
+    assert profile['scale'] == 0.01
+    assert profile['compress'] == 'LZW'
+
+    profile = Get_output_profile(-9999, _conf(tiff='zstd'))
+    assert profile['dtype'] == 'int16'
+    assert profile['compress'] == 'ZSTD'
+
+    assert Get_output_profile(-9999, _conf('float32'))['dtype'] == 'float32'
+    assert Get_output_profile(
+        -9999, _conf(tiff={'dtype': 'uint8'}))['dtype'] == 'uint8'
+
+
+def test_Pack_integer():
+    # a date converted to values out of range of int16 at scale 0.01
+    data = np.array([[1.23, -9999, np.nan],
+                     [400.0, -400.0, 327.67]], dtype=np.float32)
+    packed, count_range, count_round = Pack_integer(data, 'int16', 0.01,
+                                                    ndv=-9999)
+
+    assert packed.dtype == np.int16
+    assert packed.tolist() == [[123, -9999, -9999],
+                               [-9999, -9999, 32767]]
+    assert count_range == 2
+    assert count_round == 0
+
+
+def test_Pack_integer_round():
+    data = np.array([1.0, 1.004, 2.5], dtype=np.float64)
+    packed, count_range, count_round = Pack_integer(data, 'int32', 0.01,
+                                                    offset=1.0, ndv=-9999)
+
+    assert packed.tolist() == [0, 0, 150]
+    assert count_range == 0
+    assert count_round == 1
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Tiled gap filling of templates.collect.gap_filling.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import gap_filling
+
+
+def _data():
+    y, x = np.mgrid[0:96, 0:96]
+    data = np.sin(x / 7.0) * np.cos(y / 5.0)
+    data[np.random.RandomState(0).rand(96, 96) < 0.4] = -9999
+    # a gap wider than the halo
+    data[40:52, 10:30] = -9999
+    return data
+
+
+def test_gap_filling_nearest_tiled():
+    data = _data()
+    data_full = gap_filling(data, -9999, method=1)
+    data_tile = gap_filling(data, -9999, method=1, tile_size=32, halo=4)
+
+    assert not (data_full == -9999).any()
+    assert np.array_equal(data_full, data_tile)
+
+
+def test_gap_filling_linear_tiled():
+    data = _data()
+    valid = data != -9999
+    data_full = gap_filling(data, -9999, method=2)
+    data_tile = gap_filling(data, -9999, method=2, tile_size=32, halo=4)
+
+    # the same pixels are filled, valid pixels are kept
+    assert np.array_equal(np.isnan(data_full), np.isnan(data_tile))
+    assert np.array_equal(data_tile[valid], data[valid])
+
+    # approximate near tile edges, within the range of the valid pixels
+    filled = ~np.isnan(data_tile)
+    assert np.abs(data_full - data_tile)[filled].max() < 0.1
+    assert data_tile[filled].min() >= data[valid].min()
+    assert data_tile[filled].max() <= data[valid].max()
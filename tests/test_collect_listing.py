@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+GRACE listings of templates.collect.Get_listing_intervals.
+"""
+# General modules
+import os
+
+import pandas as pd
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Get_listing_ctime, \
+    Get_listing_intervals, Group_listing_dates
+
+LISTING = '<html><body>\n{}\n</body></html>'
+LINK = '<a href="/CSR/GRD-3_{s}-{e}_GRAC_UTCSR_BA01_0600_LND_v03.tif">f</a>'
+
+
+def _listing(tmp_path, intervals):
+    file = str(tmp_path / 'CSR-v3.2.html')
+    with open(file, 'w') as fp:
+        fp.write(LISTING.format('\n'.join(
+            LINK.format(s=s, e=e) for s, e in intervals)))
+    return Get_listing_intervals(file)
+
+
+def test_Get_listing_intervals():
+    file = os.path.join(os.path.dirname(__file__), '..', 'src',
+                        'IHEWAcollect', 'templates', 'NASA', 'CSR-v3.2.html')
+    dates_s, dates_e = Get_listing_intervals(file)
+
+    assert len(dates_s) == len(dates_e) > 0
+    assert dates_s.is_monotonic_increasing
+    assert (dates_e >= dates_s).all()
+
+
+def test_Get_listing_ctime(tmp_path):
+    # the second file overlaps the long first one
+    intervals = _listing(tmp_path, [('2002095', '2002120'),
+                                    ('2002001', '2002200'),
+                                    ('2002121', '2002151')])
+
+    assert Get_listing_ctime(intervals, pd.Timestamp('2002-01-10')) == [
+        pd.Timestamp('2002-01-01'), pd.Timestamp('2002-07-19')]
+    assert Get_listing_ctime(intervals, pd.Timestamp('2002-04-10')) == [
+        pd.Timestamp('2002-04-05'), pd.Timestamp('2002-04-30')]
+    # after the last start, covered by the first file only
+    assert Get_listing_ctime(intervals, pd.Timestamp('2002-06-15')) == [
+        pd.Timestamp('2002-01-01'), pd.Timestamp('2002-07-19')]
+    assert Get_listing_ctime(intervals, pd.Timestamp('2002-08-01')) == []
+
+
+def test_Group_listing_dates(tmp_path):
+    intervals = _listing(tmp_path, [('2002001', '2002031'),
+                                    ('2002032', '2002059')])
+    dates = pd.date_range('2002-01-30', '2002-03-02', freq='D')
+
+    groups = Group_listing_dates(intervals, dates)
+    assert [len(ids) for ids in groups.values()] == [2, 28, 2]
+    assert list(groups.keys())[-1] == ()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel writers of templates.collect.File_lock.
+"""
+# General modules
+import multiprocessing
+import os
+import time
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import File_lock
+
+
+def _increment(name, count):
+    for i in range(count):
+        with File_lock(name):
+            with open(name, 'r') as fp:
+                value = int(fp.read())
+            time.sleep(0.001)
+            with open(name, 'w') as fp:
+                fp.write('{}'.format(value + 1))
+
+
+def _hold(name, log, seconds):
+    with File_lock(name, timeout=1):
+        time.sleep(seconds)
+        with open(log, 'w') as fp:
+            fp.write('released')
+
+
+def test_File_lock_processes(tmp_path):
+    name = str(tmp_path / 'counter.txt')
+    with open(name, 'w') as fp:
+        fp.write('0')
+
+    procs = [multiprocessing.Process(target=_increment, args=(name, 50))
+             for i in range(2)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+    with open(name, 'r') as fp:
+        assert int(fp.read()) == 100
+    assert not os.path.exists('{}.lock'.format(name))
+
+
+def test_File_lock_held_past_timeout(tmp_path):
+    name = str(tmp_path / 'cube.nc')
+    log = str(tmp_path / 'log.txt')
+
+    proc = multiprocessing.Process(target=_hold, args=(name, log, 3))
+    proc.start()
+    while not os.path.exists('{}.lock'.format(name)):
+        time.sleep(0.01)
+
+    # a live writer keeps its lock, longer than timeout
+    with File_lock(name, timeout=1):
+        assert os.path.exists(log)
+    proc.join()
+
+
+def test_File_lock_stale(tmp_path):
+    name = str(tmp_path / 'cube.nc')
+    lock = '{}.lock'.format(name)
+    with open(lock, 'w'):
+        pass
+    os.utime(lock, (time.time() - 10, time.time() - 10))
+
+    with File_lock(name, timeout=1):
+        assert os.path.exists(lock)
+    assert not os.path.exists(lock)
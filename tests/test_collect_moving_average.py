@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Moving averages of templates.collect.Moving_average.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Moving_average
+
+
+def _nanmean(dataset, Moving_front, Moving_back):
+    size_T = dataset.shape[0] - Moving_back - Moving_front
+    return np.array([
+        np.nanmean(dataset[i:i + Moving_back + Moving_front + 1], axis=0)
+        for i in range(size_T)])
+
+
+def test_Moving_average():
+    rng = np.random.default_rng(0)
+    dataset = rng.random((12, 5, 7))
+    dataset[3, 1, 2] = np.nan
+    dataset[4:7, 0, 0] = np.nan
+
+    expect = _nanmean(dataset, 1, 2)
+    result = Moving_average(dataset, 1, 2)
+    assert result.shape == (9, 5, 7)
+    np.testing.assert_allclose(result, expect)
+
+    # chunks of one row, in threads
+    result = Moving_average(dataset, 1, 2, dtype=np.float32,
+                            chunk_size=1, cores=2)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, expect, rtol=1e-6)
+
+
+def test_Moving_average_nan():
+    dataset = np.ones((6, 2, 2))
+    dataset[:, 1, 1] = np.nan
+
+    with np.errstate(invalid='ignore'):
+        result = Moving_average(dataset, 0, 2)
+    assert result.shape == (4, 2, 2)
+    assert np.isnan(result[:, 1, 1]).all()
+    assert (result[:, 0, 0] == 1.0).all()
+
+
+def test_Moving_average_short():
+    result = Moving_average(np.ones((2, 3, 3)), 1, 1)
+    assert result.shape == (0, 3, 3)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked netcdf cube of templates.collect.Save_as_NC_slice.
+"""
+# General modules
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('osgeo')
+netCDF4 = pytest.importorskip('netCDF4')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Save_as_NC_slice
+
+GEO = [30.0, 0.5, 0, 10.0, 0, -0.5]
+
+
+def _read(namenc, Var='P', order=True):
+    with netCDF4.Dataset(namenc, 'r') as nco:
+        index = np.asarray(nco.variables['time_order'][:])
+        if not order:
+            index = np.arange(len(index))
+        dates = netCDF4.num2date(nco.variables['time'][:],
+                                 nco.variables['time'].units)
+        dates = [pd.Timestamp(str(dates[i])) for i in index]
+        nco.variables[Var].set_auto_mask(False)
+        return dates, np.asarray(nco.variables[Var][:])[index]
+
+
+def test_Save_as_NC_slice_create(tmp_path):
+    namenc = str(tmp_path / 'P.nc')
+    data = np.arange(12, dtype=np.float32).reshape(3, 4)
+    data[0, 0] = np.nan
+    Save_as_NC_slice(namenc, data, GEO, '2020-01-01', 'P')
+
+    with netCDF4.Dataset(namenc, 'r') as nco:
+        assert nco.variables['P'].dimensions == \
+            ('time', 'latitude', 'longitude')
+        assert np.allclose(nco.variables['longitude'][:],
+                           [30.25, 30.75, 31.25, 31.75])
+        assert np.allclose(nco.variables['latitude'][:], [9.75, 9.25, 8.75])
+        assert nco.variables['crs'].grid_mapping_name == 'latitude_longitude'
+
+    dates, cube = _read(namenc)
+    assert dates == [pd.Timestamp('2020-01-01')]
+    assert cube[0, 0, 0] == -9999
+    assert np.array_equal(cube[0].ravel()[1:], data.ravel()[1:])
+
+
+def test_Save_as_NC_slice_order(tmp_path):
+    namenc = str(tmp_path / 'P.nc')
+    data = np.ones((3, 4), dtype=np.float32)
+
+    # appended out of order, in time chunks of 2
+    days = ['2020-01-05', '2020-01-01', '2020-01-04', '2020-01-02',
+            '2020-01-03']
+    for day in days:
+        Save_as_NC_slice(namenc, data * pd.Timestamp(day).day, GEO, day,
+                         'P', chunks=(2, 2, 2))
+
+    dates, cube = _read(namenc)
+    assert dates == list(pd.date_range('2020-01-01', '2020-01-05'))
+    assert np.array_equal(cube[:, 0, 0], [1, 2, 3, 4, 5])
+    assert np.array_equal(cube[:, 2, 3], [1, 2, 3, 4, 5])
+
+    # slices stay in the order of writing
+    dates, cube = _read(namenc, order=False)
+    assert dates == [pd.Timestamp(day) for day in days]
+    assert np.array_equal(cube[:, 0, 0], [5, 1, 4, 2, 3])
+
+
+def test_Save_as_NC_slice_overwrite(tmp_path):
+    namenc = str(tmp_path / 'P.nc')
+    data = np.ones((3, 4), dtype=np.float32)
+    Save_as_NC_slice(namenc, data, GEO, '2020-01-01', 'P')
+    Save_as_NC_slice(namenc, data * 2, GEO, '2020-01-02', 'P')
+    Save_as_NC_slice(namenc, data * 3, GEO, '2020-01-01', 'P')
+
+    dates, cube = _read(namenc)
+    assert dates == [pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-02')]
+    assert np.array_equal(cube[:, 1, 1], [3, 2])
+
+    with pytest.raises(ValueError):
+        Save_as_NC_slice(namenc, np.ones((2, 2)), GEO, '2020-01-03', 'P')
+
+
+def test_Save_as_NC_slice_projected(tmp_path):
+    namenc = str(tmp_path / 'P.nc')
+    geo = [500000.0, 1000.0, 0, 1000000.0, 0, -1000.0]
+    Save_as_NC_slice(namenc, np.ones((3, 4)), geo, '2020-01-01', 'P',
+                     projection=32636)
+
+    with netCDF4.Dataset(namenc, 'r') as nco:
+        assert nco.variables['P'].dimensions == ('time', 'y', 'x')
+        assert nco.variables['x'].standard_name == 'projection_x_coordinate'
+        assert np.allclose(nco.variables['x'][:2], [500500.0, 501500.0])
+        assert 'UTM' in nco.variables['crs'].crs_wkt
+        assert 'grid_mapping_name' not in nco.variables['crs'].ncattrs()
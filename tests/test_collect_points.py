@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Station values of templates.collect.Save_as_point_values.
+"""
+# General modules
+import numpy as np
+import pandas as pd
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.collect import Get_point_index, Get_point_read, \
+    Save_as_point_values, Save_as_zonal_stats, Sort_csv_rows
+
+GEO = [30.0, 0.5, 0, 10.0, 0, -0.5]
+POINTS = [{'name': 'a', 'lon': 30.1, 'lat': 9.9},
+          {'name': 'b', 'lon': 31.3, 'lat': 8.6},
+          {'name': 'c', 'lon': 50.0, 'lat': 8.6}]
+
+
+def test_Get_point_index():
+    rows, cols, inside = Get_point_index(POINTS, GEO, (4, 4))
+
+    assert rows.tolist() == [0, 2, 0]
+    assert cols.tolist() == [0, 2, 0]
+    assert inside.tolist() == [True, True, False]
+
+
+def test_Save_as_point_values_rerun(tmp_path):
+    namecsv = str(tmp_path / 'points.csv')
+    data = np.arange(16, dtype=np.float32).reshape(4, 4)
+    data[2, 2] = -9999
+
+    Save_as_point_values(namecsv, data, GEO, '2020-01-02', POINTS, -9999)
+    Save_as_point_values(namecsv, data, GEO, '2020-01-01', POINTS, -9999)
+    data[0, 0] = 1
+    Save_as_point_values(namecsv, data, GEO, '2020-01-02', POINTS, -9999)
+
+    # appended, replaced and sorted at the end
+    assert pd.read_csv(namecsv).shape[0] == 3
+    Sort_csv_rows(namecsv, ['date'])
+
+    table = pd.read_csv(namecsv)
+    assert table['date'].tolist() == ['2020-01-01 00:00:00',
+                                      '2020-01-02 00:00:00']
+    assert table['a'].tolist() == [0.0, 1.0]
+    assert table['b'].isna().all()
+    assert table['c'].isna().all()
+
+
+def test_Save_as_zonal_stats_rerun(tmp_path):
+    namecsv = str(tmp_path / 'zonal.csv')
+    data = np.ones((4, 4), dtype=np.float32)
+    zones = [{'name': 'all', 'w': 30.0, 's': 8.0, 'e': 32.0, 'n': 10.0}]
+
+    Save_as_zonal_stats(namecsv, data, GEO, '2020-01-01', zones)
+    Save_as_zonal_stats(namecsv, data * 2, GEO, '2020-01-01', zones)
+    Sort_csv_rows(namecsv, ['date', 'zone'])
+
+    table = pd.read_csv(namecsv)
+    assert table.shape[0] == 1
+    assert table['mean'].tolist() == [2.0]
+
+
+def test_Get_point_read():
+    points = [{'name': 'a', 'lon': 30.1, 'lat': 9.9}]
+    output = {'tiff': None, 'nc': False, 'regions': [], 'zonal': None,
+              'points': points, 'aggregate': None, 'grid': None}
+    assert Get_point_read({'output': output}) == [[30.1, 9.9]]
+
+    for key, value in [('tiff', 'default'), ('nc', True),
+                       ('aggregate', {'freq': 'month'}),
+                       ('points', None)]:
+        conf = {'output': dict(output, **{key: value})}
+        assert Get_point_read(conf) is None
+
+
+def test_Open_tiff_array_points(tmp_path):
+    gdal = pytest.importorskip('osgeo.gdal')
+    from IHEWAcollect.templates.collect import Open_tiff_array
+
+    filename = str(tmp_path / 'blocks.tif')
+    data = np.arange(64 * 64, dtype=np.float32).reshape(64, 64)
+    ds = gdal.GetDriverByName('GTiff').Create(
+        filename, 64, 64, 1, gdal.GDT_Float32,
+        ['TILED=YES', 'BLOCKXSIZE=16', 'BLOCKYSIZE=16'])
+    ds.SetGeoTransform([0.0, 1.0, 0, 64.0, 0, -1.0])
+    ds.GetRasterBand(1).SetNoDataValue(-9999)
+    ds.GetRasterBand(1).WriteArray(data)
+    ds = None
+
+    window = [np.array([8, 40]), np.array([4, 60])]
+    points = [[10.5, 50.5], [40.5, 30.5], [100.0, 30.0]]
+    data_window = Open_tiff_array(filename, window=window)
+    data_points = Open_tiff_array(filename, window=window, points=points)
+
+    assert data_points.shape == data_window.shape
+    for lon, lat in points[:2]:
+        row, col = int(64.0 - lat) - 8, int(lon) - 4
+        assert data_points[row, col] == data_window[row, col]
+    assert np.isnan(data_points).sum() > data_points.size // 2
+
+
+def test_Save_as_csv_tables(tmp_path):
+    from IHEWAcollect.templates.collect import Get_csv_path, \
+        Save_as_csv_tables
+
+    conf = {'folder': {'l': str(tmp_path)},
+            'product': {'variable': 'P', 'resolution': 'daily',
+                        'name': 'CHIRPS'},
+            'output': {'points': POINTS, 'zonal': None}}
+    namecsv = Get_csv_path(conf, 'points')
+    assert namecsv == str(tmp_path / 'P.daily.CHIRPS.points.csv')
+
+    data = np.ones((4, 4), dtype=np.float32)
+    for date in ['2020-01-03', '2020-01-01', '2020-01-02']:
+        Save_as_point_values(namecsv, data, GEO, date, POINTS)
+
+    Save_as_csv_tables(conf)
+    table = pd.read_csv(namecsv)
+    assert table['date'].str[:10].tolist() == ['2020-01-01', '2020-01-02',
+                                               '2020-01-03']
+
+    # sorted tables are not rewritten
+    mtime = (tmp_path / 'P.daily.CHIRPS.points.csv').stat().st_mtime_ns
+    Save_as_csv_tables(conf)
+    assert (tmp_path / 'P.daily.CHIRPS.points.csv').stat().st_mtime_ns == \
+        mtime
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Regions and zones of templates.collect.Save_as_output.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.base.exception import IHETypeError
+from IHEWAcollect.templates.collect import Get_region_mask, \
+    Get_region_window, Get_zone_labels, Zonal_statistics
+
+GEO = [30.0, 0.5, 0, 10.0, 0, -0.5]
+
+
+def test_Get_region_window():
+    # snapped to the pixel edges
+    window, geo = Get_region_window(GEO, (20, 40),
+                                    {'w': 30.7, 's': 7.9, 'e': 31.5, 'n': 9.5})
+    assert window == [[1, 5], [1, 3]]
+    assert geo == [30.5, 0.5, 0, 9.5, 0, -0.5]
+
+    # clipped to the raster
+    window, geo = Get_region_window(GEO, (20, 40),
+                                    {'w': 20.0, 's': -5.0, 'e': 31.0, 'n': 9.0})
+    assert window == [[2, 20], [0, 2]]
+    assert geo == [30.0, 0.5, 0, 9.0, 0, -0.5]
+
+    # longitudes in [0, 360]
+    window, _ = Get_region_window([-180.0, 1.0, 0, 90.0, 0, -1.0], (180, 360),
+                                  {'w': 190.0, 's': 0.0, 'e': 200.0, 'n': 10.0})
+    assert window == [[80, 90], [10, 20]]
+
+
+def test_Get_region_window_projected():
+    geo = [500000.0, 1000.0, 0, 3500000.0, 0, -1000.0]
+    window, geo_out = Get_region_window(
+        geo, (100, 100),
+        {'w': 510000.0, 's': 3450000.0, 'e': 520500.0, 'n': 3480000.0},
+        wrap=False)
+    assert window == [[20, 50], [10, 21]]
+    assert geo_out[0] == 510000.0
+    assert geo_out[3] == 3480000.0
+
+
+def test_Zonal_statistics():
+    data = np.array([[1.0, 2.0, -9999.0],
+                     [4.0, np.nan, 6.0]], dtype=np.float32)
+    labels = np.array([[1, 1, 1],
+                       [2, 2, 0]], dtype=np.int32)
+
+    stats = Zonal_statistics(data, labels, 3, ndv=-9999)
+    assert stats['count'].tolist() == [2, 1, 0]
+    assert stats['sum'][:2].tolist() == [3.0, 4.0]
+    assert stats['mean'][:2].tolist() == [1.5, 4.0]
+    assert stats['min'][:2].tolist() == [1.0, 4.0]
+    assert stats['max'][:2].tolist() == [2.0, 4.0]
+    for key in ['mean', 'sum', 'min', 'max']:
+        assert np.isnan(stats[key][2])
+
+
+def test_Get_zone_labels_empty():
+    with pytest.raises(IHETypeError):
+        Get_zone_labels([], GEO, (4, 4))
+
+
+def test_Get_zone_labels_mask():
+    pytest.importorskip('osgeo.ogr')
+
+    # the edges cut the pixels, touched pixels are inside
+    regions = [{'name': 'a',
+                'polygon': [[30.2, 9.8], [31.1, 9.8], [30.2, 8.7]]},
+               {'name': 'b',
+                'polygon': [[31.3, 8.4], [31.8, 8.4], [31.8, 8.1],
+                            [31.3, 8.1]]}]
+    labels, names = Get_zone_labels(regions, GEO, (4, 4))
+    assert names == ['a', 'b']
+    for number, region in enumerate(regions, 1):
+        mask = Get_region_mask(region, GEO, (4, 4))
+        assert np.array_equal(labels == number, mask)
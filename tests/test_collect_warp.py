@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Cached warp plans of templates.collect.Get_warp_plan.
+"""
+# General modules
+import numpy as np
+
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates import collect
+from IHEWAcollect.templates.collect import Apply_warp_plan, \
+    Get_warp_coverage, Get_warp_plan
+
+GEO_FROM = [0.0, 1.0, 0, 2.0, 0, -1.0]
+DATA = np.array([[0.0, 1.0], [2.0, 3.0]])
+
+
+def test_Get_warp_plan_nearest():
+    plan = Get_warp_plan(GEO_FROM, 4326, (2, 2),
+                         [-1.0, 1.0, 0, 2.0, 0, -1.0], 4326, (2, 4), 1)
+    data = Apply_warp_plan(plan, DATA)
+
+    assert np.isnan(data[:, [0, 3]]).all()
+    assert data[:, 1:3].tolist() == DATA.tolist()
+    assert Get_warp_coverage(plan).tolist() == [[False, True, True, False]] * 2
+
+
+def test_Get_warp_plan_bilinear_edges():
+    plan = Get_warp_plan(GEO_FROM, 4326, (2, 2),
+                         [0.0, 0.5, 0, 2.0, 0, -0.5], 4326, (4, 4), 2)
+    data = Apply_warp_plan(plan, DATA)
+
+    # neighbours outside of the source are left out
+    weights = np.array([0.0, 0.25, 0.75, 1.0])
+    assert np.allclose(data, 2.0 * weights[:, None] + weights[None, :])
+    assert Get_warp_coverage(plan).all()
+
+    # nodata source pixels are left out too
+    data = Apply_warp_plan(plan, np.array([[0.0, -9999.0], [2.0, 3.0]]),
+                           ndv=-9999.0)
+    assert np.isnan(data[0, 3])
+    assert data[1, 3] == 3.0
+    assert data[0, 0] == 0.0
+
+
+def test_Get_warp_plan_cache(monkeypatch):
+    monkeypatch.setattr(collect, 'WARP_PLANS', {})
+    # bilinear plans of 100 target pixels hold 4 * 100 * (4 + 4) bytes
+    monkeypatch.setattr(collect, 'WARP_PLANS_BYTES', 2 * 3200)
+
+    for i in range(3):
+        Get_warp_plan(GEO_FROM, 4326, (2, 2),
+                      [0.0, 0.2, 0, 2.0 + i, 0, -0.2], 4326, (10, 10), 2)
+    assert len(collect.WARP_PLANS) == 2
+    assert sum(plan['nbytes'] for plan in collect.WARP_PLANS.values()) == \
+        2 * 3200
+
+    # a plan above the limit is not cached
+    Get_warp_plan(GEO_FROM, 4326, (2, 2),
+                  [0.0, 0.1, 0, 2.0, 0, -0.1], 4326, (20, 20), 2)
+    assert len(collect.WARP_PLANS) == 2
+
+
+def _average(data, geo_from, geo_to, shape_to):
+    # area weighted mean of the overlaps, same projection
+    data_end = np.full(shape_to, np.nan)
+    for row in range(shape_to[0]):
+        for col in range(shape_to[1]):
+            x_s = geo_to[0] + col * geo_to[1]
+            y_n = geo_to[3] + row * geo_to[5]
+            x_e, y_s = x_s + geo_to[1], y_n + geo_to[5]
+            total, weights = 0.0, 0.0
+            for i in range(data.shape[0]):
+                for j in range(data.shape[1]):
+                    p_w = geo_from[0] + j * geo_from[1]
+                    p_n = geo_from[3] + i * geo_from[5]
+                    w = min(x_e, p_w + geo_from[1]) - max(x_s, p_w)
+                    h = min(y_n, p_n) - max(y_s, p_n + geo_from[5])
+                    if w > 0 and h > 0 and not np.isnan(data[i, j]):
+                        total += data[i, j] * w * h
+                        weights += w * h
+            if weights > 0:
+                data_end[row, col] = total / weights
+    return data_end
+
+
+def test_Get_warp_plan_average():
+    data = np.arange(35, dtype=np.float64).reshape(5, 7) ** 1.5
+    data[2, 3] = -9999.0
+    geo_to = [0.25, 1.5, 0, 5.0, 0, -1.5]
+
+    plan = Get_warp_plan([0.0, 1.0, 0, 5.0, 0, -1.0], 4326, (5, 7),
+                         geo_to, 4326, (4, 6), 4)
+    result = Apply_warp_plan(plan, data, ndv=-9999.0)
+
+    expect = _average(np.where(data == -9999.0, np.nan, data),
+                      [0.0, 1.0, 0, 5.0, 0, -1.0], geo_to, (4, 6))
+    assert np.allclose(result, expect, equal_nan=True)
+
+    # the last column is outside of the source
+    assert np.isnan(result[:, 5]).all()
+    assert not np.isnan(result[:, :5]).any()
+    assert Get_warp_coverage(plan)[:, :5].all()
+    assert not Get_warp_coverage(plan)[:, 5].any()
+
+
+def test_Get_warp_plan_average_gdal():
+    gdal = pytest.importorskip('osgeo.gdal')
+    from osgeo import osr
+
+    rng = np.random.default_rng(0)
+    data = rng.random((40, 60)).astype(np.float32)
+    geo_from = [30.0, 0.05, 0, 10.0, 0, -0.05]
+    geo_to = [30.01, 0.07, 0, 9.98, 0, -0.07]
+    shape_to = (25, 38)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    driver = gdal.GetDriverByName('MEM')
+    src = driver.Create('', 60, 40, 1, gdal.GDT_Float32)
+    src.SetGeoTransform(geo_from)
+    src.SetProjection(srs.ExportToWkt())
+    src.GetRasterBand(1).WriteArray(data)
+    dest = driver.Create('', shape_to[1], shape_to[0], 1, gdal.GDT_Float32)
+    dest.SetGeoTransform(geo_to)
+    dest.SetProjection(srs.ExportToWkt())
+    gdal.ReprojectImage(src, dest, srs.ExportToWkt(), srs.ExportToWkt(),
+                        gdal.GRA_Average)
+
+    plan = Get_warp_plan(geo_from, 4326, (40, 60), geo_to, 4326, shape_to, 4)
+    result = Apply_warp_plan(plan, data)
+
+    assert np.allclose(result, dest.GetRasterBand(1).ReadAsArray(),
+                       atol=1e-4)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+MODIS directory listings of templates.download_tiles_test.Get_listing.
+"""
+# General modules
+import os
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates import download_tiles_test
+from IHEWAcollect.templates.download_tiles_test import Get_listing, \
+    Get_listing_dir
+
+LISTING = '<html><body>\n{}\n</body></html>'
+LINK = '<a href="MOD16A2GF.A2020001.{t}.061.2020009012345.hdf">f</a>'
+
+
+class _Response(object):
+    def __init__(self, text):
+        self.text = text
+        self.ok = True
+
+
+def _server(monkeypatch, pages):
+    urls = []
+
+    def get(url):
+        urls.append(url)
+        return _Response(pages[url])
+
+    monkeypatch.setattr(download_tiles_test.requests, 'get', get)
+    monkeypatch.setattr(download_tiles_test, 'LISTINGS', {})
+    return urls
+
+
+def test_Get_listing_dir(tmp_path):
+    conf = {'cache': None, 'folder': {'r': str(tmp_path / 'remote')}}
+    assert Get_listing_dir(conf) == str(tmp_path / 'remote' / 'listings')
+
+    conf['cache'] = {'path': str(tmp_path / 'cache'), 'size': 1024}
+    assert Get_listing_dir(conf) == str(tmp_path / 'cache' / 'listings')
+
+
+def test_Get_listing(tmp_path, monkeypatch):
+    url = 'https://e4ftl01.cr.usgs.gov/MOLT/MOD16A2GF.061/2020.01.01/'
+    page = LISTING.format(LINK.format(t='h10v05') + LINK.format(t='h11v05'))
+    urls = _server(monkeypatch, {url: page})
+    listing_dir = str(tmp_path / 'listings')
+
+    index = Get_listing(url, listing_dir=listing_dir)
+    assert sorted(index.keys()) == ['h10v05', 'h11v05']
+    assert len(os.listdir(listing_dir)) == 1
+
+    # another worker, the page is saved from the cache
+    monkeypatch.setattr(download_tiles_test, 'LISTINGS', {})
+    file = str(tmp_path / 'MOD16A2GF-v061.html')
+    assert Get_listing(url, file, True, listing_dir=listing_dir) == index
+    with open(file, 'r') as fp:
+        assert fp.read() == page
+    assert urls == [url]
+
+    # expired
+    assert Get_listing(url, ttl=0, listing_dir=listing_dir) == index
+    assert urls == [url, url]
+
+
+def test_Get_listing_empty(tmp_path, monkeypatch):
+    url = 'https://e4ftl01.cr.usgs.gov/MOLT/MOD16A2GF.061/2020.01.09/'
+    urls = _server(monkeypatch, {url: LISTING.format('')})
+    listing_dir = str(tmp_path / 'listings')
+
+    assert Get_listing(url, listing_dir=listing_dir) == {}
+    assert Get_listing(url, listing_dir=listing_dir) == {}
+    assert not os.path.exists(listing_dir)
+    assert urls == [url, url]
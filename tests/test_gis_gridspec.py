@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Pixel windows of templates.gis.GridSpec.
+"""
+# General modules
+import numpy as np
+import pytest
+
+pytest.importorskip('osgeo')
+
+# IHEWAcollect Modules
+from IHEWAcollect.templates.gis import GridSpec
+
+LAT = {'s': -50.0, 'n': 50.0, 'r': 0.05}
+LON = {'w': -180.0, 'e': 180.0, 'r': 0.05}
+
+
+def test_GridSpec_north():
+    grid = GridSpec(LAT, LON)
+    y_id, x_id = grid.get_index([-1.0, 1.0], [30.0, 31.0])
+    assert list(y_id) == [980, 1020]
+    assert list(x_id) == [4200, 4220]
+
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
+    assert np.allclose(latlim, [-1.0, 1.0])
+    assert np.allclose(lonlim, [30.0, 31.0])
+
+    # snapped outwards to the pixel edges
+    y_id, x_id = grid.get_index([-0.99, 1.01], [30.01, 30.99])
+    assert list(y_id) == [979, 1020]
+    assert list(x_id) == [4200, 4220]
+
+
+def test_GridSpec_south():
+    grid = GridSpec(LAT, LON, orient='s')
+    y_id, x_id = grid.get_index([-1.0, 1.0], [30.0, 31.0])
+    assert list(y_id) == [980, 1020]
+    assert list(x_id) == [4200, 4220]
+
+    y_id, x_id = grid.get_index([-50.0, -49.0], [30.0, 31.0])
+    assert list(y_id) == [0, 20]
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
+    assert np.allclose(latlim, [-50.0, -49.0])
+
+
+def test_GridSpec_transpose():
+    grid = GridSpec(LAT, LON, transpose=True)
+    y_id, x_id = grid.get_index([40.0, 50.0], [30.0, 31.0])
+    assert list(y_id) == [4200, 4220]
+    assert list(x_id) == [0, 200]
+
+    latlim, lonlim = grid.get_latlon(y_id, x_id)
+    assert np.allclose(latlim, [40.0, 50.0])
+    assert np.allclose(lonlim, [30.0, 31.0])
+
+
+def test_GridSpec_indices():
+    grid = GridSpec(LAT, LON)
+    y_ids, x_ids = grid.get_indices([[-1.0, 1.0], [40.0, 60.0]],
+                                    [[30.0, 31.0], [-200.0, -190.0]])
+    assert y_ids.tolist() == [[980, 1020], [0, 200]]
+    assert x_ids.tolist() == [[4200, 4220], [6800, 7000]]
+
+
+def test_GridSpec_antimeridian():
+    grid = GridSpec(LAT, LON)
+
+    # [0, 360] longitudes are shifted into the grid
+    y_id, x_id = grid.get_index([-1.0, 1.0], [350.0, 360.0])
+    assert list(x_id) == [3400, 3600]
+
+    # a bbox crossing the east edge is cut at the edge
+    y_id, x_id = grid.get_index([-1.0, 1.0], [170.0, 190.0])
+    assert list(x_id) == [7000, 7200]
+    y_id, x_id = grid.get_index([-1.0, 1.0], [170.0, -170.0])
+    assert list(x_id) == [7000, 7200]
+
+
+def test_GridSpec_shifted():
+    # CFSR, [0, 360] grid rolled to start at the antimeridian
+    lon = {'w': -0.1562497827975673, 'e': 359.8432497827976135,
+           'r': 0.3122121739130434559}
+    lon_w = lon['w'] - (lon['e'] - lon['w']) / 2.0
+    grid = GridSpec({'s': -89.9171060869565224, 'n': 89.9171060869565224,
+                     'r': 0.3122121739130434559},
+                    {'w': lon_w, 'e': lon_w + lon['e'] - lon['w'],
+                     'r': lon['r']},
+                    dem={'w': 1152, 'h': 576}, orient='s')
+    y_id, x_id = grid.get_index([-89.9, 89.9], [-180.0, 180.0])
+    assert list(x_id) == [0, 1152]
+    assert list(y_id) == [0, 576]